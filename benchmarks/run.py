@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""Benchmark suite for rolltable: generates synthetic tables of every format
+and measures loading, rolling, inline expansion and output through the same
+`loader` and `core` functions the command line uses.
+
+Results are saved as JSON (by default in benchmarks/results/, named after the
+current commit), and `--compare` prints the ratios against a previous run."""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS_FOLDER = Path(__file__).resolve().parent
+ROOT_FOLDER = BENCHMARKS_FOLDER.parent
+sys.path.insert(0, str(ROOT_FOLDER))
+
+import tablegen  # noqa: E402
+from rolltable import core, loader, tablecache  # noqa: E402
+from rolltable.inliner.inliner import TableInliner  # noqa: E402
+from rolltable.inliner.resolver import resolve_references  # noqa: E402
+
+DEFAULT_SIZES = "10,1000,100000"
+FULL_SIZES = "10,1000,100000,1000000"
+
+
+def measure(function, repeat: int):
+    """Best wall-clock time of `repeat` calls, and the result of the last one"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+
+    return best, result
+
+
+def get_arguments(table_path: Path, table_format: str, count: int, *options):
+    return core.get_parameters(
+        [str(table_path), "-f", table_format, "-c", str(count), *options]
+    )
+
+
+def roll_all(args):
+    return [
+        result
+        for chunk in core.roll_table_chunks(args, TableInliner())
+        for result in chunk
+    ]
+
+
+def bench_table(table_path: Path, table_format: str, count: int, repeat: int):
+    """Load time without and with the table cache, roll throughput, and the
+    cost of writing the results"""
+    args = get_arguments(table_path, table_format, count, "--seed", "1")
+    cases = dict()
+
+    tablecache.enabled = False
+    cases["load"], _ = measure(lambda: core.load_root_table(args), repeat)
+
+    tablecache.enabled = True
+    core.load_root_table(args)
+    cases["load_cached"], _ = measure(lambda: core.load_root_table(args), repeat)
+
+    cases["roll"], results = measure(lambda: roll_all(args), repeat)
+    cases["output"], _ = measure(
+        lambda: core.write_results([results], os.devnull), repeat
+    )
+
+    tally_args = get_arguments(
+        table_path, table_format, count, "--seed", "1", "--tally"
+    )
+    cases["tally"], _ = measure(
+        lambda: core.roll_table(tally_args, TableInliner()), repeat
+    )
+
+    if table_format.replace("-", "_") in loader.MAPPABLE_FORMATS:
+        # The first load builds the index, the measured ones reuse it
+        loader.map_tables = True
+        core.load_root_table(args)
+        cases["load_mapped"], _ = measure(lambda: core.load_root_table(args), repeat)
+        cases["roll_mapped"], _ = measure(lambda: roll_all(args), repeat)
+        loader.map_tables = False
+
+    return cases, count
+
+
+def bench_inline_graph(root_path: Path, count: int, repeat: int):
+    """Reference resolution, and rolls on the root table, where most of the
+    time goes into the inliner"""
+    args = get_arguments(root_path, "list", count, "--seed", "1")
+    table = core.load_root_table(args)
+    root_table_path, base_table_folder = core.get_root_table_location(args)
+
+    cases = dict()
+    cases["resolve"], _ = measure(
+        lambda: resolve_references(
+            TableInliner(), table, base_table_folder, root_table_path
+        ),
+        repeat,
+    )
+    cases["roll"], results = measure(lambda: roll_all(args), repeat)
+    cases["output"], _ = measure(
+        lambda: core.write_results([results], os.devnull), repeat
+    )
+
+    return cases, count
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_FOLDER,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run_suite(args, table_folder: Path):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    formats = args.formats.split(",")
+    results = []
+
+    def record(name, cases, count):
+        for case, seconds in cases.items():
+            entry = {"name": f"{name}/{case}", "seconds": round(seconds, 6)}
+            if case in ("roll", "roll_mapped", "tally", "output") and seconds > 0:
+                entry["results_per_second"] = round(count / seconds)
+            results.append(entry)
+            print(f"{entry['name']:<40} {seconds * 1000:>10.2f} ms", file=sys.stderr)
+
+    for table_format in formats:
+        for size in sizes:
+            table_path = tablegen.write_table(table_folder, table_format, size)
+
+            # Each result of a chance table is a set, with a roll per entry
+            count = (
+                max(1, args.count // size) if table_format == "chance" else args.count
+            )
+            cases, count = bench_table(table_path, table_format, count, args.repeat)
+            record(f"{table_format}/{size}", cases, count)
+
+    for depth, fan_out in args.graphs:
+        root_path = tablegen.write_inline_graph(
+            table_folder, depth, fan_out, args.graph_size
+        )
+        cases, count = bench_inline_graph(root_path, args.inline_count, args.repeat)
+        record(f"inline/{depth}x{fan_out}", cases, count)
+
+    return results
+
+
+def compare(results, baseline_path: Path):
+    baseline = {
+        entry["name"]: entry["seconds"]
+        for entry in json.loads(baseline_path.read_text())["results"]
+    }
+
+    print(f"\nCompared to {baseline_path}:", file=sys.stderr)
+    for entry in results:
+        if entry["name"] not in baseline or not baseline[entry["name"]]:
+            continue
+
+        ratio = entry["seconds"] / baseline[entry["name"]]
+        print(f"{entry['name']:<40} {ratio:>8.2f}x", file=sys.stderr)
+
+
+def parse_graph(value: str):
+    depth, fan_out = value.split("x")
+    return int(depth), int(fan_out)
+
+
+def get_parameters():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_SIZES,
+        help=f"Comma-separated table sizes (default: {DEFAULT_SIZES})",
+    )
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help=f"Same as --sizes {FULL_SIZES}",
+    )
+    parser.add_argument(
+        "--formats",
+        default=",".join(tablegen.TABLE_FORMATS),
+        help="Comma-separated table formats (default: all of them)",
+    )
+    parser.add_argument(
+        "-c", "--count", type=int, default=100000, help="Results rolled per table"
+    )
+    parser.add_argument(
+        "--graphs",
+        type=parse_graph,
+        nargs="*",
+        default=[(2, 2), (4, 3)],
+        help="Inline graphs to roll on, as DEPTHxFAN_OUT (default: 2x2 4x3)",
+    )
+    parser.add_argument(
+        "--graph-size", type=int, default=100, help="Entries per inline graph table"
+    )
+    parser.add_argument(
+        "--inline-count",
+        type=int,
+        default=1000,
+        help="Results rolled on the root of each inline graph",
+    )
+    parser.add_argument(
+        "-r", "--repeat", type=int, default=3, help="Runs per case, the best is kept"
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        help="JSON result file (default: benchmarks/results/<commit>.json)",
+    )
+    parser.add_argument("--compare", help="Previous JSON result file to compare to")
+
+    args = parser.parse_args()
+    if args.full:
+        args.sizes = FULL_SIZES
+    return args
+
+
+def main():
+    args = get_parameters()
+
+    with tempfile.TemporaryDirectory(prefix="rolltable-bench-") as folder:
+        # Keeps the benchmark away from the user's table cache
+        os.environ["ROLLTABLE_CACHE_DIR"] = str(Path(folder) / "cache")
+        results = run_suite(args, Path(folder))
+
+    commit = get_commit()
+    report = {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "parameters": {
+            "sizes": args.sizes,
+            "count": args.count,
+            "inline_count": args.inline_count,
+            "graph_size": args.graph_size,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+
+    output = (
+        Path(args.output)
+        if args.output
+        else BENCHMARKS_FOLDER / "results" / f"{commit}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n")
+    print(f"\nResults saved to {output}", file=sys.stderr)
+
+    if args.compare:
+        compare(results, Path(args.compare))
+
+
+if __name__ == "__main__":
+    main()
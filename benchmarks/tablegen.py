@@ -0,0 +1,130 @@
+"""Synthetic tables for the benchmarks, in every format rolltable reads"""
+
+import json
+from pathlib import Path
+
+TABLE_FORMATS = ("list", "chance", "weighted-list", "numbered-list", "hexflower")
+
+# File extension of each format, as understood by `rolltable --ext`
+EXTENSIONS = {
+    "list": "table",
+    "chance": "chance",
+    "weighted-list": "weighted_list",
+    "numbered-list": "num_list",
+    "hexflower": "hexflower",
+}
+
+
+def entry_text(index: int) -> str:
+    return f"Entry {index} with a few words of description"
+
+
+def write_list_table(table_path: Path, size: int):
+    lines = ["# Synthetic list table"]
+    lines.extend(entry_text(index) for index in range(size))
+    table_path.write_text("\n".join(lines) + "\n")
+
+
+def write_chance_table(table_path: Path, size: int):
+    lines = ["# Synthetic chance table"]
+    lines.extend(f"{entry_text(index)}\t{index % 100 + 1}" for index in range(size))
+    table_path.write_text("\n".join(lines) + "\n")
+
+
+def write_weighted_list_table(table_path: Path, size: int):
+    lines = ["# Synthetic weighted list"]
+    lines.extend(f"{index % 10 + 1}\t{entry_text(index)}" for index in range(size))
+    table_path.write_text("\n".join(lines) + "\n")
+
+
+def write_numbered_list_table(table_path: Path, size: int):
+    lines = ["# Synthetic numbered list"]
+    low = 1
+    for index in range(size):
+        high = low + index % 3
+        lines.append(f"{low}-{high}\t{entry_text(index)}")
+        low = high + 1
+    table_path.write_text("\n".join(lines) + "\n")
+
+
+def write_hexflower_table(table_path: Path, size: int):
+    """A wrapping strip of `size` hexes, each with the 6 neighbours it would
+    have in a grid `width` hexes wide"""
+    width = max(1, int(size**0.5))
+
+    def neighbour(hex_id: int, offset: int) -> int:
+        return (hex_id - 1 + offset) % size + 1
+
+    hexes = [
+        {
+            "id": hex_id,
+            "content": entry_text(hex_id),
+            "neighbours": {
+                "top": neighbour(hex_id, -width),
+                "top_right": neighbour(hex_id, 1 - width),
+                "bottom_right": neighbour(hex_id, 1),
+                "bottom": neighbour(hex_id, width),
+                "bottom_left": neighbour(hex_id, width - 1),
+                "top_left": neighbour(hex_id, -1),
+            },
+        }
+        for hex_id in range(1, size + 1)
+    ]
+
+    flower = {
+        "comment": {"source": "benchmarks/tablegen.py", "description": "Synthetic"},
+        "navigator": {
+            "formula": "2d6",
+            "start": 1,
+            "navigation": {
+                "2": "top_right",
+                "3": "top_right",
+                "4": "bottom_right",
+                "5": "bottom_right",
+                "6": "bottom",
+                "7": "bottom",
+                "8": "bottom_left",
+                "9": "bottom_left",
+                "10": "top_left",
+                "11": "top_left",
+                "12": "top",
+            },
+        },
+        "hex-list": hexes,
+    }
+    table_path.write_text(json.dumps(flower))
+
+
+WRITERS = {
+    "list": write_list_table,
+    "chance": write_chance_table,
+    "weighted-list": write_weighted_list_table,
+    "numbered-list": write_numbered_list_table,
+    "hexflower": write_hexflower_table,
+}
+
+
+def write_table(folder: Path, table_format: str, size: int) -> Path:
+    table_path = folder / f"{table_format}-{size}.{EXTENSIONS[table_format]}"
+    WRITERS[table_format](table_path, size)
+    return table_path
+
+
+def write_inline_graph(folder: Path, depth: int, fan_out: int, size: int) -> Path:
+    """Tree of list tables `depth` levels deep, where every entry of a table
+    rolls once on each of its `fan_out` child tables, along with a dice roll.
+    Returns the root table, whose results each expand fan_out^depth leaves"""
+    graph_folder = folder / f"inline-{depth}x{fan_out}"
+    graph_folder.mkdir(parents=True, exist_ok=True)
+
+    leaf_names = [entry_text(index) for index in range(size)]
+    (graph_folder / f"level-{depth}.table").write_text("\n".join(leaf_names) + "\n")
+
+    for level in range(depth - 1, -1, -1):
+        references = " ".join(f"[[level-{level + 1}.table]]" for _ in range(fan_out))
+        entries = [
+            f"{entry_text(index)} ([[1d6]]): {references}" for index in range(size)
+        ]
+        (graph_folder / f"level-{level}.table").write_text("\n".join(entries) + "\n")
+
+    return graph_folder / "level-0.table"
@@ -0,0 +1,13 @@
+"""Rolls on random tables from Python, e.g.:
+
+from rolltable import Registry
+
+registry = Registry()
+names = registry.roll("tables/names.table", count=3)
+"""
+
+from .__version__ import __version__
+from .diceformula import InvalidFormula
+from .registry import Registry
+
+__all__ = ["Registry", "InvalidFormula", "__version__"]
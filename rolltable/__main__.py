@@ -1,3 +1,14 @@
-import core
+if __package__:
+    from .core import main
+else:
+    # Run as a script (`python rolltable`): the package is imported from the
+    # folder that holds it
+    import sys
+    from pathlib import Path
 
-core.main()
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    from rolltable.core import main
+
+# Worker processes of `--jobs` may import this module again
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+from . import core
+from . import diceformula
+from . import tablecache
+from .inliner.inliner import TableInliner
+
+# Command-line options that only matter to the process reading the roll
+# requests, and are never taken from a roll spec
+SESSION_OPTIONS = (
+    "output",
+    "append",
+    "client",
+    "socket",
+    "no_cache",
+    "mmap",
+    "batch",
+)
+
+# Command-line options with no meaning for a single roll: the measures of
+# `--stats` cover the whole process, so they're enabled for the session
+UNSUPPORTED_OPTIONS = ("stats",)
+
+
+class RollSession:
+    """Rolls any number of roll specs with one inliner, so the tables parsed
+    for a roll are reused by all the following ones.
+
+    A roll spec is a dict of the command-line options from
+    `core.get_parameters`, by destination name (e.g. `dice_formula`)"""
+
+    def __init__(self):
+        self.inliner = TableInliner()
+        self.inliner.watch_tables()
+        self.resolved_tables = set()
+        tablecache.keep_in_memory()
+
+    def get_arguments(self, spec: dict):
+        if "table_filepath" not in spec:
+            raise ValueError("Missing 'table_filepath' in roll spec")
+        if not isinstance(spec["table_filepath"], str):
+            raise ValueError("Option 'table_filepath' must be a string")
+        if spec["table_filepath"] == "-":
+            raise ValueError("Roll specs can't read tables from STDIN")
+
+        # The spec's values aren't parsed as command-line arguments: argparse
+        # exits on errors and prints the help on `-h`, which would end the
+        # whole session. They're checked against the options instead
+        options = core.get_options()
+        args = argparse.Namespace(
+            **{name: option.default for name, option in options.items()}
+        )
+
+        for name, value in spec.items():
+            name = name.replace("-", "_")
+            if name in SESSION_OPTIONS or name == "id":
+                continue
+            if name not in options or name in UNSUPPORTED_OPTIONS:
+                raise ValueError(f"Unknown roll option '{name}'")
+
+            setattr(args, name, get_option_value(options[name], name, value))
+
+        # Counts can be dice formulae, so they're parsed from strings
+        args.count = str(args.count)
+        return args
+
+    def roll(self, spec: dict):
+        args = self.get_arguments(spec)
+
+        # Edited tables are loaded again, and the references are walked again
+        # to find the tables they now reference. Unchanged tables are reused
+        if self.inliner.drop_changed_tables():
+            self.resolved_tables.clear()
+
+        if args.check:
+            return core.check_references(args, self.inliner).describe()
+
+        # References are only walked the first time a table version is rolled
+        try:
+            file_stamp = tablecache.get_file_stamp(Path(args.table_filepath))
+        except OSError:
+            file_stamp = None
+
+        resolve_key = (args.table_filepath, args.format, args.ext, file_stamp)
+        prewarm = resolve_key not in self.resolved_tables
+
+        results = core.roll_table(args, self.inliner, prewarm)
+        self.resolved_tables.add(resolve_key)
+        return results
+
+    def answer(self, request_line: str) -> dict:
+        """Response to one JSON roll spec: the results, or the error message
+        and the exit code `rolltable` would have returned for it"""
+        spec = None
+        try:
+            spec = json.loads(request_line)
+            if not isinstance(spec, dict):
+                raise ValueError("A roll spec must be a JSON object")
+
+            response = {"results": self.roll(spec)}
+        except diceformula.InvalidFormula as exc:
+            response = {"error": f"Invalid dice formula: {str(exc)}", "code": 2}
+        except Exception as exc:
+            response = {
+                "error": f"Error when processing arguments: {str(exc)}",
+                "code": 1,
+            }
+
+        # Lets callers match responses with their specs
+        if isinstance(spec, dict) and "id" in spec:
+            response = {"id": spec["id"], **response}
+
+        return response
+
+
+def get_option_value(action, name: str, value):
+    """Value of an option of a roll spec, checked against the type the command
+    line would have parsed it to"""
+    if value is None:
+        return action.default
+
+    if action.nargs == 0:
+        # Flags, like `exclusive`
+        if not isinstance(value, bool):
+            raise ValueError(f"Option '{name}' must be true or false")
+        return value
+
+    if action.type is int:
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(f"Option '{name}' must be an integer")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        # Numbers stand for themselves in string options, e.g. a count of 3
+        value = str(value)
+    elif not isinstance(value, str):
+        raise ValueError(f"Option '{name}' must be a string")
+
+    if action.choices is not None and value not in action.choices:
+        choices = ", ".join(f"'{choice}'" for choice in action.choices)
+        raise ValueError(f"Option '{name}' must be one of {choices}")
+
+    return value
+
+
+def run_batch(batch_path: str, output=None, append=False) -> bool:
+    """Answers every roll spec line of `batch_path` ('-' for STDIN) with a
+    JSON line, in order. Returns whether every roll succeeded"""
+    session = RollSession()
+    all_succeeded = True
+
+    batch_file = sys.stdin if batch_path == "-" else Path(batch_path).open("r")
+    write_to = Path(output).open("a" if append else "w") if output else sys.stdout
+
+    try:
+        for line in batch_file:
+            if not line.strip():
+                continue
+
+            response = session.answer(line)
+            all_succeeded = all_succeeded and "error" not in response
+
+            write_to.write(json.dumps(response) + "\n")
+            # Another process may be waiting on each answer before sending
+            # its next spec
+            if batch_file is sys.stdin:
+                write_to.flush()
+    finally:
+        if batch_file is not sys.stdin:
+            batch_file.close()
+        if write_to is not sys.stdout:
+            write_to.close()
+
+    return all_succeeded
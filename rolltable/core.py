@@ -1,84 +1,360 @@
 import sys
 import argparse
-import __version__
-import dice.exceptions
-import loader
+import itertools
+import locale
+from collections import Counter
+from .__version__ import __version__
+from . import diceformula
+from . import loader
+from . import rng
+from . import stats
+from . import tablecache
 from pathlib import Path
-from inliner.inliner import TableInliner
-from natsort.natsort import natsorted
+from .inliner.inliner import TableInliner
+from .inliner.resolver import resolve_references
+
+# Buffer size of the output file, results are written a chunk at a time
+WRITE_BUFFER_SIZE = 1 << 20
 
 
 def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        from . import daemon
+
+        daemon.main(sys.argv[2:])
+        return
+
     try:
         args = get_parameters()
 
-        if args.ext:
-            extension = loader.get_absolute_file_path(args.table_filepath).suffix[1:]
-            table = loader.load_table_from_extension(extension, args)
-        else:
-            table = loader.load_table_from_format(args.format, args)
+        if args.no_cache:
+            tablecache.enabled = False
 
-        if args.table_filepath == "-":
-            base_table_folder = Path().cwd()
-        else:
-            base_table_folder = loader.get_absolute_file_path(
-                args.table_filepath
-            ).parent
+        if args.mmap:
+            loader.map_tables = True
 
-        recursive_table_inliner = TableInliner()
+        if args.stats:
+            stats.enable()
 
-        raw_results = table.get_results()
-        processed_results = process_inline_tables(
-            raw_results, recursive_table_inliner, base_table_folder
-        )
+        if args.batch:
+            from . import batch
 
-        if args.sort and isinstance(processed_results, list):
-            processed_results = natsorted(processed_results)
+            sys.exit(0 if batch.run_batch(args.batch, args.output, args.append) else 1)
+        elif args.client:
+            from . import daemon
+
+            results = daemon.request_roll(args)
+        elif args.check:
+            reference_graph = check_references(args, TableInliner())
+            open_writing_device(
+                reference_graph.describe(), args.output, args.append, args.join
+            )
+            sys.exit(0 if reference_graph.is_valid() else 1)
+        elif args.sort or args.tally:
+            results = roll_table(args, TableInliner())
+        else:
+            # Unsorted results are written as they're rolled, so memory use
+            # doesn't grow with the count
+            write_results(
+                roll_table_chunks(args, TableInliner()),
+                args.output,
+                args.append,
+                args.join,
+            )
+            return
 
-        open_writing_device(processed_results, args.output, args.append, args.join)
+        # Tallies are one line per result, whatever the joiner
+        joiner = None if args.tally else args.join
+        open_writing_device(results, args.output, args.append, joiner)
 
-    except dice.exceptions.DiceException as exc:
+    except diceformula.InvalidFormula as exc:
         print(f"Invalid dice formula: {str(exc)}")
         sys.exit(2)
     except Exception as exc:
         print(f"Error when processing arguments: {str(exc)}")
         sys.exit(1)
+    finally:
+        if stats.enabled:
+            print("\n".join(stats.format_report(stats.finish())), file=sys.stderr)
+
+
+def load_root_table(args):
+    if args.ext:
+        extension = loader.get_absolute_file_path(args.table_filepath).suffix[1:]
+        return loader.load_table_from_extension(extension, args)
+
+    return loader.load_table_from_format(args.format, args)
+
+
+def get_root_table_location(args):
+    """Path of the rolled table, and the folder its inline references are relative to"""
+    if args.table_filepath == "-":
+        return "<stdin>", Path().cwd()
+
+    root_table_path = loader.get_absolute_file_path(args.table_filepath)
+    return root_table_path, root_table_path.parent
+
+
+def check_references(args, inliner):
+    table = load_root_table(args)
+    root_table_path, base_table_folder = get_root_table_location(args)
+
+    return resolve_references(inliner, table, base_table_folder, root_table_path)
+
+
+def roll_table(args, inliner, prewarm=True):
+    """Rolls on the table described by the command-line arguments, and returns
+    the results with their inline tables processed. The random generator in
+    use before is used again afterwards, see `rng.restored`"""
+    with rng.restored():
+        if args.tally and not (args.distribution or args.stationary):
+            tally = tally_table(args, inliner, prewarm)
+            return format_tally(tally, args.sort, args.join)
+
+        processed_results = [
+            result
+            for result_chunk in roll_table_chunks(args, inliner, prewarm)
+            for result in result_chunk
+        ]
+
+    if args.sort:
+        from natsort import natsorted
+
+        processed_results = natsorted(processed_results)
+
+    return processed_results
+
+
+def roll_table_chunks(args, inliner, prewarm=True):
+    """Same as `roll_table` without sorting, but the results are rolled and
+    processed a chunk at a time as they're read"""
+    select_rng(args.rng, args.seed)
+
+    table = load_root_table(args)
+    root_table_path, base_table_folder = get_root_table_location(args)
+
+    if args.distribution or args.stationary:
+        return iter([format_distribution(table.get_distribution())])
+
+    return roll_loaded_table_chunks(
+        table,
+        inliner,
+        root_table_path,
+        base_table_folder,
+        args.jobs,
+        args.seed,
+        prewarm,
+    )
+
+
+def select_rng(rng_backend=None, seed=None):
+    """Switches to the random generator `rng_backend` (the `random` module by
+    default), seeded with `seed` if any"""
+    rng_backend = rng_backend or rng.PythonRng.name
+    if seed is not None or rng.get().name != rng_backend:
+        rng.use(rng_backend, seed)
+
+
+def roll_loaded_table_chunks(
+    table,
+    inliner,
+    root_table_path,
+    base_table_folder,
+    jobs: int = 1,
+    seed=None,
+    prewarm=True,
+):
+    """Chunks of results of a table that's already loaded, with its inline
+    tables processed, see `roll_table_chunks`"""
+    # Independent results are rolled in shards with their own seeds, so they
+    # don't depend on the number of jobs
+    use_shards = jobs > 1 or seed is not None
+    if use_shards and table.has_independent_results():
+        from . import parallel
+
+        count = table.get_rolled_count()
+        if jobs > 1:
+            return stats.timed_iter(
+                parallel.roll_in_parallel(
+                    table,
+                    count,
+                    jobs,
+                    base_table_folder,
+                    root_table_path,
+                    seed,
+                ),
+                "wait_workers",
+            )
+
+        if prewarm:
+            resolve_references(inliner, table, base_table_folder, root_table_path)
+        return parallel.roll_shards(table, count, inliner, base_table_folder, seed)
+
+    if prewarm:
+        resolve_references(inliner, table, base_table_folder, root_table_path)
+
+    result_chunks = stats.timed_iter(table.iter_results(), "roll")
+
+    if not table.has_inline_markers():
+        return result_chunks
+
+    return (
+        process_inline_tables(result_chunk, inliner, base_table_folder)
+        for result_chunk in result_chunks
+    )
+
+
+def tally_table(args, inliner, prewarm=True):
+    """Same as `tally_loaded_table`, on the table described by the
+    command-line arguments"""
+    select_rng(args.rng, args.seed)
+
+    table = load_root_table(args)
+    root_table_path, base_table_folder = get_root_table_location(args)
+
+    return tally_loaded_table(
+        table,
+        inliner,
+        root_table_path,
+        base_table_folder,
+        args.jobs,
+        args.seed,
+        prewarm,
+    )
+
+
+def tally_loaded_table(
+    table,
+    inliner,
+    root_table_path,
+    base_table_folder,
+    jobs: int = 1,
+    seed=None,
+    prewarm=True,
+):
+    """Number of times each distinct result of the table is rolled, by
+    result, with sets of results as tuples. When the results are independent
+    draws of the entries, the counts are drawn at once in O(entries) time.
+    Otherwise the results are rolled and counted a chunk at a time, so memory
+    only grows with the number of distinct results"""
+    if not table.has_inline_markers():
+        with stats.phase("roll"):
+            tally = table.roll_tally()
+
+        if tally is not None:
+            stats.count("tallies_sampled")
+            return tally
+
+    tally = Counter()
+    for result_chunk in roll_loaded_table_chunks(
+        table, inliner, root_table_path, base_table_folder, jobs, seed, prewarm
+    ):
+        with stats.phase("tally"):
+            if result_chunk and type(result_chunk[0]) is list:
+                tally.update(map(tuple, result_chunk))
+            else:
+                tally.update(result_chunk)
+
+    return tally
+
+
+def format_tally(tally, sort=False, joiner=None):
+    """Lines of a tally, each with a count and its result, the most rolled
+    first, or in the order of the results when sorting. The results of a set
+    are joined with `joiner`"""
+    counted_results = [
+        ((joiner or ", ").join(result) if type(result) is tuple else result, times)
+        for result, times in tally.items()
+    ]
+
+    if sort:
+        from natsort import natsorted
+
+        counted_results = natsorted(counted_results, key=lambda item: item[0])
+    else:
+        counted_results.sort(key=lambda item: item[1], reverse=True)
+
+    return [f"{times}\t{result}" for result, times in counted_results]
 
 
 def process_inline_tables(results, inliner, base_folder):
     if isinstance(results, str):
         return inliner.roll_inline_tables(results, base_folder)
     else:
-        return [
-            process_inline_tables(result, inliner, base_folder) for result in results
-        ]
+        # References are rolled for all the results at once
+        return inliner.roll_inline_results(results, base_folder)
+
+
+def format_distribution(distribution):
+    return [f"{entry}\t{float(probability):.4%}" for entry, probability in distribution]
 
 
 def open_writing_device(result_array, output=None, append=False, joiner: str = ""):
-    write_to = Path(output).open("a" if append else "w") if output else None
+    write_results([result_array], output, append, joiner)
+
+
+def write_results(result_chunks, output=None, append=False, joiner: str = ""):
+    """Writes chunks of results to the output file or STDOUT, each chunk with
+    a single write. The output is the same as writing all the chunks as one
+    list of results"""
+    result_chunks = iter(result_chunks)
+
+    # Rolling the first chunk before opening the output file means a roll
+    # that fails right away doesn't truncate it. Empty chunks are skipped, as
+    # the first results tell sets of results apart
+    first_chunk = next((chunk for chunk in result_chunks if chunk), [])
+
+    if output:
+        write_to = Path(output).open(
+            "ab" if append else "wb", buffering=WRITE_BUFFER_SIZE
+        )
+        encoding, errors = locale.getpreferredencoding(False), "strict"
+    else:
+        sys.stdout.flush()
+        write_to = sys.stdout.buffer
+        encoding, errors = sys.stdout.encoding, sys.stdout.errors
 
-    print_results(result_array, joiner, write_to)
+    # Sets of results are printed one per line, whereas single results are
+    # either printed one per line or joined on a single line
+    is_set_list = bool(first_chunk) and type(first_chunk[0]) is list
+    has_written = False
 
-    if write_to:
-        write_to.close()
+    try:
+        for result_chunk in itertools.chain([first_chunk], result_chunks):
+            if not result_chunk:
+                continue
+
+            with stats.phase("output"):
+                if is_set_list or not joiner:
+                    text = format_results(result_chunk, joiner)
+                elif has_written:
+                    text = joiner + joiner.join(result_chunk)
+                else:
+                    text = joiner.join(result_chunk)
+
+                write_to.write(text.encode(encoding, errors))
+                has_written = True
+
+        if not has_written or (joiner and not is_set_list):
+            write_to.write(b"\n")
+    finally:
+        if output:
+            write_to.close()
+        else:
+            write_to.flush()
 
 
-def print_results(result_array, joiner: str, write_output=None):
+def format_results(result_array, joiner: str):
     if not result_array:
-        print("", file=write_output)
-        return
+        return "\n"
 
     if type(result_array[0]) is list:
-        for result in result_array:
-            print_results(result, joiner, write_output)
-        return
+        return "".join(format_results(result, joiner) for result in result_array)
 
     if joiner:
-        printed_string = joiner.join(result_array)
-        print(printed_string, file=write_output)
-    else:
-        for result in result_array:
-            print(result, file=write_output)
+        return joiner.join(result_array) + "\n"
+
+    return "\n".join(map(str, result_array)) + "\n"
 
 
 def usage():
@@ -87,20 +363,46 @@ def usage():
     print("then roll a result from this table and prints it")
 
 
-def get_parameters():
+class OptionGroup:
+    """Group of command-line options that also records each option it's
+    given in `options`, by destination name"""
+
+    def __init__(self, group, options: dict):
+        self.group = group
+        self.options = options
+
+    def add_argument(self, *args, **kwargs):
+        action = self.group.add_argument(*args, **kwargs)
+        self.options[action.dest] = action
+        return action
+
+
+def get_options():
+    """Options of the command line, by destination name (e.g. `dice_formula`),
+    as the argparse actions parsing them. `help` and `version` aren't listed"""
+    options = dict()
+    create_parser(options)
+    return options
+
+
+def create_parser(options=None):
+    """Parser of the command line. The options added to it are recorded in
+    `options` when given, see `get_options`"""
+    if options is None:
+        options = dict()
+
     parser = argparse.ArgumentParser(
         prog="rolltable",
         description="""This program loads the random table from
                     a configuration file and rolls a random result from it""",
     )
 
-    parser.add_argument(
-        "-v", "--version", action="version", version=__version__.__version__
-    )
+    parser.add_argument("-v", "--version", action="version", version=__version__)
 
-    input_group = parser.add_argument_group("Input Options")
+    input_group = OptionGroup(parser.add_argument_group("Input Options"), options)
     input_group.add_argument(
         "table_filepath",
+        nargs="?",
         help="Path to random table config file. Can be set to '-' to read the random table content from STDIN.",
     )
     input_group.add_argument(
@@ -134,7 +436,30 @@ def get_parameters():
         help="Get table format from file extension. See `--format` for the list of accepted formats",
     )
 
-    roll_group = parser.add_argument_group("Roll Options")
+    input_group.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="""Don't read or write the cache of parsed tables. The cache is stored in
+                $ROLLTABLE_CACHE_DIR (default: ~/.cache/rolltable), and limited to $ROLLTABLE_CACHE_SIZE bytes""",
+    )
+    input_group.add_argument(
+        "--mmap",
+        action="store_true",
+        help="""Memory-map list and weighted-list tables instead of reading them: only the rolled entries are
+                decoded, through an index of the table lines kept in the cache folder. Done for every table
+                of $ROLLTABLE_MMAP_SIZE bytes or more anyway (default: 256 MiB)""",
+    )
+    input_group.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="""Roll every roll spec of a JSON Lines file instead of a single table. Can be set to '-' to read
+                the roll specs from STDIN. Each spec is a JSON object of the options of this command, by their
+                long name (e.g. {"table_filepath": "names.table", "count": 3, "dice_formula": "2d6"}),
+                and is answered with a JSON line: {"results": [...]} or {"error": "...", "code": 1}.
+                A spec's "id", if any, is copied to its answer. Tables are loaded once for the whole batch""",
+    )
+
+    roll_group = OptionGroup(parser.add_argument_group("Roll Options"), options)
     roll_group.add_argument(
         "-c",
         "--count",
@@ -161,15 +486,76 @@ def get_parameters():
         help="Force roll result between first and last element. No effect if not using a custom formula.",
         action="store_true",
     )
+    roll_group.add_argument(
+        "--seed",
+        type=int,
+        help="""Seed the random rolls, so the same seed and options always give the same results,
+                as long as the tables don't change""",
+    )
+    roll_group.add_argument(
+        "--rng",
+        choices=list(rng.BACKENDS),
+        help="""Random generator used for every roll. 'python' [default] uses the `random` module,
+                'numpy' draws numbers in blocks from a NumPy generator, which is faster for large counts.
+                A seed gives different results with each generator""",
+    )
+    roll_group.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="""Split the rolls over this many processes, each loading the tables once.
+                Results are output in the same order, and a --seed gives the same results with any number of jobs.
+                No effect on exclusive rolls and hex-flower walks, as their results depend on each other""",
+    )
+    roll_group.add_argument(
+        "--distribution",
+        action="store_true",
+        help="""Print the exact probability of each table entry instead of rolling.
+                Inline tables are not expanded, and the count and exclusive options are ignored.
+                For chance tables, also prints the probability of each number of results per set.
+                For hex flowers, prints the long-run frequency of each hex like --stationary,
+                or with --steps the probability of each hex after that many steps (requires NumPy).
+                Supported for the list, chance, weighted-list, numbered-list and hexflower formats""",
+    )
 
-    hexflower_group = parser.add_argument_group("Hex-flower Options")
+    roll_group.add_argument(
+        "--check",
+        action="store_true",
+        help="""Load every table referenced inline from the table, recursively, and print the tables found,
+                the reference cycles, and the missing or invalid tables instead of rolling.
+                Exits with an error code if a table is missing or invalid""",
+    )
+
+    hexflower_group = OptionGroup(
+        parser.add_argument_group("Hex-flower Options"), options
+    )
     hexflower_group.add_argument(
         "--start",
         type=int,
         help="Change the hex number that navigation starts from",
     )
+    hexflower_group.add_argument(
+        "--steps",
+        type=int,
+        help="""Roll the hex reached after this many navigation steps, computed from the flower's
+                transition matrix instead of walking every step (walked without NumPy). Each counted result is an independent sample.
+                With --distribution, prints the probability of each hex after this many steps""",
+    )
+    hexflower_group.add_argument(
+        "--walkers",
+        type=int,
+        help="""Walk this many independent navigators in lockstep from the start hex, drawing every
+                walker's direction for a step at once. Each walker's path is output as its own set of results,
+                so it can be combined with --join to get one line per walker""",
+    )
+    hexflower_group.add_argument(
+        "--stationary",
+        action="store_true",
+        help="""Print the long-run frequency of each hex from the start hex instead of rolling.
+                On other formats, same as --distribution""",
+    )
 
-    output_group = parser.add_argument_group("Output Options")
+    output_group = OptionGroup(parser.add_argument_group("Output Options"), options)
     output_group.add_argument(
         "-o",
         "--output",
@@ -196,5 +582,43 @@ def get_parameters():
         help="Sort the results lexicographically (for strings) and based on expected order (for numbers). No effect when only rolling a single result. See the python package `natsort` for details",
     )
 
-    args = parser.parse_args()
+    output_group.add_argument(
+        "--tally",
+        action="store_true",
+        help="""Print each distinct result once, preceded by the number of times it was rolled, the most
+                rolled first (with --sort, in the order of the results). On list, weighted-list and numbered-list
+                tables without --exclusive or inline rolls, the counts are drawn at once from their multinomial
+                distribution (when NumPy is installed), so huge counts take no more time than small ones""",
+    )
+
+    output_group.add_argument(
+        "--stats",
+        action="store_true",
+        help="""Print to STDERR the time spent in each phase of the run (reading files, parsing tables,
+                parsing dice, rolling, inline expansion, output...) and counters like the number of tables loaded""",
+    )
+
+    daemon_group = OptionGroup(parser.add_argument_group("Daemon Options"), options)
+    daemon_group.add_argument(
+        "--client",
+        action="store_true",
+        help="""Send the roll to a running `rolltable serve` daemon instead of loading the tables in this
+                process. The output options are still applied locally""",
+    )
+    daemon_group.add_argument(
+        "--socket",
+        help="""Unix socket of the roll daemon. Defaults to $ROLLTABLE_SOCKET, or rolltable-$UID.sock in $XDG_RUNTIME_DIR,
+                or a private rolltable-$UID folder of the temporary folder without it""",
+    )
+
+    return parser
+
+
+def get_parameters(argv=None):
+    parser = create_parser()
+    args = parser.parse_args(argv)
+
+    if args.table_filepath is None and not args.batch:
+        parser.error("the following arguments are required: table_filepath")
+
     return args
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+from pathlib import Path
+from . import loader
+from . import tablecache
+from .batch import RollSession, SESSION_OPTIONS
+
+# Seconds a connection can wait for its next request before it's closed.
+# Connections are handled one at a time, so an idle client holds up the others
+CONNECTION_TIMEOUT = 2.0
+
+
+def get_default_socket_path() -> Path:
+    if "ROLLTABLE_SOCKET" in os.environ:
+        return Path(os.environ["ROLLTABLE_SOCKET"])
+
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return Path(os.environ["XDG_RUNTIME_DIR"]) / f"rolltable-{os.getuid()}.sock"
+
+    return get_private_folder() / "rolltable.sock"
+
+
+def get_private_folder() -> Path:
+    """Folder of the temporary folder that only the current user can access,
+    created if needed. Anyone can create files in the temporary folder, so
+    another user could have created it first: it's only used if it's owned by
+    the current user and closed to everyone else"""
+    folder = Path(tempfile.gettempdir()) / f"rolltable-{os.getuid()}"
+
+    try:
+        folder.mkdir(mode=0o700)
+    except FileExistsError:
+        pass
+
+    # Not followed if it's a link, as the link could lead anywhere
+    status = folder.lstat()
+    if not stat.S_ISDIR(status.st_mode) or status.st_uid != os.getuid():
+        raise RuntimeError(f"{folder} isn't a folder owned by the current user")
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        raise RuntimeError(f"{folder} can be accessed by other users")
+
+    return folder
+
+
+class RollServer(socketserver.UnixStreamServer):
+    """Handles one connection at a time, so the resident tables and inliner
+    never need locking. A connection can send any number of requests, and is
+    closed once it has sent nothing for CONNECTION_TIMEOUT seconds"""
+
+    def __init__(self, socket_path: Path):
+        super().__init__(str(socket_path), RollRequestHandler)
+        self.session = RollSession()
+
+
+class RollRequestHandler(socketserver.StreamRequestHandler):
+    # Set on the connection by `setup`, covers both reads and writes
+    timeout = CONNECTION_TIMEOUT
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+
+                response = self.server.session.answer(line.decode())
+                self.wfile.write(json.dumps(response).encode() + b"\n")
+                self.wfile.flush()
+        except socket.timeout:
+            # Idle, or not reading its responses: the next client is served
+            return
+
+
+def serve(socket_path: Path):
+    tablecache.keep_in_memory()
+
+    if socket_path.exists():
+        if is_daemon_running(socket_path):
+            raise RuntimeError(f"A roll daemon is already listening on {socket_path}")
+        socket_path.unlink()
+
+    # Turns a plain `kill` into a clean exit, so the socket file gets removed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    with RollServer(socket_path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def is_daemon_running(socket_path: Path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+            return True
+        except OSError:
+            return False
+
+
+def request_roll(args):
+    """Sends the roll described by the command-line arguments to the daemon,
+    and returns its results"""
+    if args.table_filepath == "-":
+        raise ValueError("The roll daemon can't read tables from STDIN")
+
+    request = {
+        name: value for name, value in vars(args).items() if name not in SESSION_OPTIONS
+    }
+    request["table_filepath"] = str(loader.get_absolute_file_path(args.table_filepath))
+
+    socket_path = Path(args.socket) if args.socket else get_default_socket_path()
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode() + b"\n")
+
+        with client.makefile("rb") as response_stream:
+            response = json.loads(response_stream.readline())
+
+    if "error" in response:
+        print(response["error"])
+        sys.exit(response["code"])
+
+    return response["results"]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog="rolltable serve",
+        description="""Keeps tables loaded in memory and answers roll requests
+                    from `rolltable --client` over a Unix socket""",
+    )
+    parser.add_argument(
+        "--socket",
+        help="""Unix socket to listen on. Defaults to $ROLLTABLE_SOCKET, or rolltable-$UID.sock in $XDG_RUNTIME_DIR,
+                or a private rolltable-$UID folder of the temporary folder without it""",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't read or write the on-disk cache of parsed tables",
+    )
+    parser.add_argument(
+        "--mmap",
+        action="store_true",
+        help="Memory-map every list and weighted-list table, see `rolltable --help`",
+    )
+    args = parser.parse_args(argv)
+
+    if args.no_cache:
+        tablecache.enabled = False
+
+    if args.mmap:
+        loader.map_tables = True
+
+    try:
+        serve(Path(args.socket) if args.socket else get_default_socket_path())
+    except Exception as exc:
+        print(f"Error when starting the roll daemon: {str(exc)}")
+        sys.exit(1)
@@ -0,0 +1,245 @@
+import re
+from . import rng
+from . import stats
+from fractions import Fraction
+from functools import lru_cache
+from math import comb
+
+# Formulas kept compiled. Inline dice rolls are compiled from rolled texts, so
+# the cache is bounded for long-running processes
+COMPILED_FORMULA_CACHE_SIZE = 1 << 12
+
+# Covers the shapes used by the tables and the inliner (`XdY±Z`, `XdYhN`,
+# `XdYlN`, `d%` and the `t` total suffix). Anything else goes through `dice`.
+native_formula_re = re.compile(
+    r"^(?P<amount>\d*)d(?P<sides>\d+|%)"
+    r"(?:(?P<keep>[hl])(?P<keep_count>\d*))?"
+    r"(?P<modifier>[+-]\d+)?"
+    r"t?$"
+)
+
+
+class InvalidFormula(ValueError):
+    """A formula that neither the native evaluator nor `dice` can roll"""
+
+
+constant_formula_re = re.compile(r"^[+-]?\d+$")
+
+
+class ConstantFormula:
+    def __init__(self, value: int):
+        self.value = value
+
+    def roll(self) -> int:
+        return self.value
+
+    def roll_array(self, shape):
+        import numpy
+
+        return numpy.full(shape, self.value, dtype=numpy.int64)
+
+    def distribution(self):
+        return {self.value: Fraction(1)}
+
+    def support(self):
+        return self.value, self.value
+
+
+class NativeFormula:
+    def __init__(
+        self, amount: int, sides: int, keep=None, keep_count: int = 1, modifier=0
+    ):
+        self.amount = amount
+        self.sides = sides
+        self.keep = keep
+        self.keep_count = min(keep_count, amount) if keep else amount
+        self.modifier = modifier
+        self.exact_distribution = None
+
+    def roll(self) -> int:
+        randint = rng.get().randint
+        sides = self.sides
+
+        if self.amount == 1:
+            return randint(1, sides) + self.modifier
+
+        rolls = [randint(1, sides) for _ in range(self.amount)]
+
+        if self.keep == "h":
+            rolls = sorted(rolls)[-self.keep_count :]
+        elif self.keep == "l":
+            rolls = sorted(rolls)[: self.keep_count]
+
+        return sum(rolls) + self.modifier
+
+    def roll_array(self, shape):
+        shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        rolls = (
+            rng.get()
+            .get_numpy_generator()
+            .integers(1, self.sides, size=(*shape, self.amount), endpoint=True)
+        )
+
+        if self.keep:
+            rolls.sort(axis=-1)
+            if self.keep == "h":
+                rolls = rolls[..., self.amount - self.keep_count :]
+            else:
+                rolls = rolls[..., : self.keep_count]
+
+        return rolls.sum(axis=-1) + self.modifier
+
+    def distribution(self):
+        """Exact probability of each total, computed once"""
+        if self.exact_distribution is None:
+            if self.keep is None:
+                counts = dice_sum_counts(self.amount, self.sides)
+            else:
+                counts = kept_dice_sum_counts(
+                    self.amount, self.sides, self.keep_count, self.keep == "h"
+                )
+
+            outcome_count = self.sides**self.amount
+            self.exact_distribution = {
+                total + self.modifier: Fraction(ways, outcome_count)
+                for total, ways in sorted(counts.items())
+            }
+
+        return self.exact_distribution
+
+    def support(self):
+        return self.keep_count + self.modifier, (
+            self.keep_count * self.sides + self.modifier
+        )
+
+
+class DiceFormula:
+    """Fallback for notations the native evaluator doesn't handle: the
+    expression is parsed once by `dice`, then re-evaluated on each roll"""
+
+    def __init__(self, formula: str):
+        # `dice` and its pyparsing grammar are slow to import, so they're only
+        # loaded for the formulae that need them
+        import dice
+        import dice.utilities
+        from pyparsing import ParseBaseException
+
+        self.formula = formula
+        self.dice = dice
+        try:
+            self.elements = list(dice.parse_expression(formula))
+        except ParseBaseException as exc:
+            raise InvalidFormula(str(dice.DiceBaseException.from_other(exc)))
+
+    def __reduce__(self):
+        # Parsed elements and modules can't be pickled, e.g. to send a table
+        # to another process, so the formula is parsed again there
+        return DiceFormula, (self.formula,)
+
+    def roll(self) -> int:
+        try:
+            return int(
+                self.dice.utilities.single(
+                    [element.evaluate(random=rng.get()) for element in self.elements]
+                )
+            )
+        except self.dice.DiceBaseException as exc:
+            raise InvalidFormula(str(exc))
+
+    def roll_array(self, shape):
+        import numpy
+
+        size = int(numpy.prod(shape))
+        rolls = numpy.fromiter(
+            (self.roll() for _ in range(size)), dtype=numpy.int64, count=size
+        )
+        return rolls.reshape(shape)
+
+    def distribution(self):
+        raise ValueError(
+            f"Cannot compute the exact distribution of '{self.formula}'. "
+            "Only constants and XdY±Z formulae (with h/l keep modifiers) are supported"
+        )
+
+    def support(self):
+        try:
+            return int(self.dice.roll_min(self.formula)), int(
+                self.dice.roll_max(self.formula)
+            )
+        except self.dice.DiceBaseException as exc:
+            raise InvalidFormula(str(exc))
+
+
+def dice_sum_counts(amount: int, sides: int):
+    """Number of ways to reach each total when summing `amount` dice"""
+    counts = {0: 1}
+
+    for _ in range(amount):
+        next_counts = {}
+        for total, ways in counts.items():
+            for face in range(1, sides + 1):
+                next_counts[total + face] = next_counts.get(total + face, 0) + ways
+        counts = next_counts
+
+    return counts
+
+
+def kept_dice_sum_counts(amount: int, sides: int, keep_count: int, highest: bool):
+    """Number of ways to reach each total when keeping the `keep_count` highest
+    (or lowest) of `amount` dice.
+
+    Faces are assigned from the kept end first, so the first `keep_count` dice
+    assigned are exactly the kept ones: the state only needs the number of dice
+    still unassigned and the kept total so far"""
+    faces = range(sides, 0, -1) if highest else range(1, sides + 1)
+    states = {(amount, 0): 1}
+
+    for face in faces:
+        next_states = {}
+        for (dice_left, total), ways in states.items():
+            assigned = amount - dice_left
+            for face_count in range(dice_left + 1):
+                kept = max(0, min(face_count, keep_count - assigned))
+                key = (dice_left - face_count, total + kept * face)
+                next_states[key] = next_states.get(key, 0) + ways * comb(
+                    dice_left, face_count
+                )
+        states = next_states
+
+    return {total: ways for (dice_left, total), ways in states.items() if not dice_left}
+
+
+@lru_cache(maxsize=COMPILED_FORMULA_CACHE_SIZE)
+def compile_formula(formula: str):
+    stats.count("dice_formulas_parsed")
+    with stats.phase("dice_parse"):
+        return parse_formula(formula)
+
+
+def parse_formula(formula: str):
+    stripped = formula.strip()
+
+    if constant_formula_re.match(stripped):
+        return ConstantFormula(int(stripped))
+
+    native = native_formula_re.match(stripped)
+    if native is not None:
+        amount = int(native.group("amount")) if native.group("amount") else 1
+        sides = 100 if native.group("sides") == "%" else int(native.group("sides"))
+        keep = native.group("keep")
+        # Like `dice`, a bare h/l drops a single die
+        keep_count = (
+            int(native.group("keep_count"))
+            if native.group("keep_count")
+            else max(amount - 1, 1)
+        )
+        modifier = int(native.group("modifier")) if native.group("modifier") else 0
+
+        if sides > 0 and keep_count > 0:
+            return NativeFormula(amount, sides, keep, keep_count, modifier)
+
+    return DiceFormula(stripped)
+
+
+def roll(formula) -> int:
+    return compile_formula(f"{formula}").roll()
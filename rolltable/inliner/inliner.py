@@ -1,13 +1,17 @@
-import dice
 import re
-import loader
-from table.numberedlist import NumberedListTable
-from table.random import RandomTable
-from table.chance import ChanceTable
-from table.weightedlist import WeightedListTable
-from table.template import OutputTemplate
+from collections import OrderedDict
+from functools import lru_cache
+from itertools import groupby
+from .. import diceformula
+from .. import loader
+from .. import stats
 from pathlib import Path
-from natsort import natsorted
+
+# Compiled templates kept by each inliner, and dice roll markers kept for the
+# process. Their keys are rolled texts, so long-running processes would
+# otherwise keep every text ever rolled
+COMPILED_TEMPLATE_CACHE_SIZE = 1 << 14
+COMPILED_DICE_ROLL_CACHE_SIZE = 1 << 12
 
 
 class InlineTableInfo:
@@ -40,10 +44,21 @@ class InlineTableInfo:
         self.exclusive = exclusive
         self.clamp = clamp
         self.formula = formula if formula is not None else ""
-        self.count = int(dice.roll(count)) if count is not None else 1
+        self.count_formula = diceformula.compile_formula(
+            f"{count}" if count is not None else "1"
+        )
         self.joiner = joiner if joiner is not None else ", "
         self.sort = sort
 
+        # References are grouped by table for every rolled result
+        self.hash = hash(
+            (self.table_path, self.format, self.formula, self.exclusive, self.clamp)
+        )
+
+    def roll_count(self):
+        stats.count("dice_rolls")
+        return self.count_formula.roll()
+
     def __eq__(self, other):
         return (
             self.table_path == other.table_path
@@ -54,36 +69,106 @@ class InlineTableInfo:
         )
 
     def __hash__(self):
-        return hash(
-            (self.table_path, self.format, self.formula, self.exclusive, self.clamp)
-        )
+        return self.hash
 
 
-class TableReferenceCounter:
-    def __init__(self):
-        self.roll_count = 0
-        self.indices = dict()
+class InlineDiceRoll:
+    def __init__(self, roll_formula, count_formula, joiner=None, sort=False):
+        self.roll_formula = roll_formula
+        self.count_formula = count_formula
+        self.joiner = joiner if joiner is not None else ", "
+        self.sort = sort
+
+    def render(self):
+        count = self.count_formula.roll()
+        rolls = [f"{self.roll_formula.roll()}" for _ in range(count)]
+        stats.count("dice_rolls", count + 1)
+
+        if self.sort:
+            from natsort import natsorted
+
+            rolls = natsorted(rolls)
+
+        return self.joiner.join(rolls)
+
+
+class CompiledTemplate:
+    """A string with its `[[...]]` markers parsed once: segments are either
+    literal text, an InlineDiceRoll or an InlineTableInfo"""
+
+    def __init__(self, segments):
+        self.segments = segments
+        self.is_plain = all(isinstance(segment, str) for segment in segments)
 
-    def add_reference(self, index, count: int, joiner=None):
-        self.roll_count = self.roll_count + count
-        self.indices[index] = {
-            "count": count,
-            "joiner": joiner if joiner is not None else ", ",
-        }
+
+class InlineExpansion:
+    """A string whose inline markers are being expanded. Once its markers are
+    rolled, `segments` holds its literal text and its dice rolls, and for each
+    of its table references, either the joined results or, if they have
+    markers of their own, a ReferenceExpansion"""
+
+    __slots__ = ("text", "folder", "segments")
+
+    def __init__(self, text, folder: Path):
+        self.text = text
+        self.folder = folder
+        self.segments = None
+
+    def join(self):
+        """Replaces the text by its expansion, once its references are joined"""
+        if self.segments is not None:
+            self.text = "".join(
+                segment if isinstance(segment, str) else segment.join()
+                for segment in self.segments
+            )
+
+
+class ReferenceExpansion:
+    """The results rolled for a table reference, the ones with markers as
+    their InlineExpansion"""
+
+    __slots__ = ("joiner", "results")
+
+    def __init__(self, joiner: str, results):
+        self.joiner = joiner
+        self.results = results
+
+    def join(self):
+        return self.joiner.join(
+            result if isinstance(result, str) else result.text
+            for result in self.results
+        )
 
 
 def create_table(table_info):
-    table_data = loader.read_table_file(table_info.table_path)
+    return loader.load_cached_table(
+        table_info.table_path,
+        table_info.format,
+        lambda table_data: create_table_from_data(table_info, table_data),
+    )
 
+
+def create_table_from_data(table_info, table_data):
+    # Table formats are imported on first use, to keep the startup light
     if not table_info.format or table_info.format == "list":
+        from ..table.random import RandomTable
+
         return RandomTable(table_data)
     elif table_info.format == "chance":
+        from ..table.chance import ChanceTable
+
         return ChanceTable(table_data)
     elif table_info.format == "weighted-list":
+        from ..table.weightedlist import WeightedListTable
+
         return WeightedListTable(table_data)
     elif table_info.format == "template":
-        return OutputTemplate(table_data, table_info.count)
+        from ..table.template import OutputTemplate
+
+        return OutputTemplate(table_data)
     elif table_info.format == "numbered-list":
+        from ..table.numberedlist import NumberedListTable
+
         return NumberedListTable(table_data)
     else:
         raise ValueError(
@@ -109,14 +194,66 @@ class TableInliner:
 
     inline_element_re = re.compile(r"\[\[(?P<element>[^\[\]]+)]]")
 
+    # Characters of table paths that no dice formula has: letters that aren't
+    # in the `dice` grammar, and path separators. Markers with any of them are
+    # told apart from dice rolls without parsing them as a formula, which
+    # would load `dice` and its grammar
+    non_dice_element_re = re.compile(r"[./_]|[^\W\d_adefhlmorstuvwx]", re.IGNORECASE)
+
+    # Stops self-referencing tables before Python's recursion limit does
+    max_inline_depth = 200
+
     def __init__(self):
         self.loaded_tables = dict()
+        # Least recently used first
+        self.compiled_templates = OrderedDict()
+        # Set by `watch_tables`, for long-running processes
+        self.watcher = None
+
+    def watch_tables(self):
+        """Keeps track of the files of the loaded tables, so the ones that
+        change can be dropped by `drop_changed_tables`"""
+        if self.watcher is None:
+            from .. import watcher
+
+            self.watcher = watcher.create_watcher()
+
+    def drop_changed_tables(self):
+        """Drops the tables whose file changed since they were loaded, so
+        they're loaded again when next rolled, along with the templates
+        compiled in their folders. Returns the changed files"""
+        if self.watcher is None:
+            return set()
+
+        changed_files = self.watcher.get_changed_files()
+        for table_file in changed_files:
+            self.loaded_tables.pop(table_file, None)
+
+        if changed_files:
+            self.drop_compiled_templates(
+                {table_file.parent for table_file in changed_files}
+            )
 
-    def load_inlined_table(self, table_info: InlineTableInfo, count=1):
+        stats.count("tables_invalidated", len(changed_files))
+        return changed_files
+
+    def watch_table_file(self, table_path: Path):
+        """Records the identity of the file of a table, before it's read"""
+        if self.watcher is not None:
+            self.watcher.watch(table_path)
+
+    def get_inlined_table(self, table_info: InlineTableInfo):
         if table_info.table_path not in self.loaded_tables:
+            stats.count("inliner_cache_misses")
+            self.watch_table_file(table_info.table_path)
             self.loaded_tables[table_info.table_path] = create_table(table_info)
+        else:
+            stats.count("inliner_cache_hits")
 
-        table = self.loaded_tables[table_info.table_path]
+        return self.loaded_tables[table_info.table_path]
+
+    def load_inlined_table(self, table_info: InlineTableInfo, count=1):
+        table = self.get_inlined_table(table_info)
         table.set_flag("exclusive", table_info.exclusive)
         table.set_flag("clamp", table_info.clamp)
         table.set_flag("formula", table_info.formula)
@@ -132,45 +269,84 @@ class TableInliner:
         table.set_flag("count", 1)
 
     @staticmethod
-    def insert_inline_dice_roll(string):
-        def roll_inline_dice(match):
-            element = match.group("element")
-            if element is None:
-                return match.group(0)
+    @lru_cache(maxsize=COMPILED_DICE_ROLL_CACHE_SIZE)
+    def compile_inline_dice_roll(extracted_inlined_element):
+        """InlineDiceRoll of a marker, or None if it isn't a dice roll. Cached,
+        as table references are only told apart by failing to parse them"""
+        formula_options = TableInliner.inline_element_option_parser.match(
+            extracted_inlined_element
+        )
+        if formula_options is None:
+            return None
+        if TableInliner.non_dice_element_re.search(formula_options.group("element")):
+            return None
+
+        try:
+            roll_formula = diceformula.compile_formula(formula_options.group("element"))
+            count_formula = diceformula.compile_formula(
+                formula_options.group("roll_count")
+                if formula_options.group("count")
+                else "1"
+            )
+        except diceformula.InvalidFormula:
+            return None
 
-            formula_options = TableInliner.inline_element_option_parser.match(element)
-            if formula_options is None:
-                return match.group(0)
+        return InlineDiceRoll(
+            roll_formula,
+            count_formula,
+            (
+                formula_options.group("inline_joiner")
+                if formula_options.group("joiner")
+                else None
+            ),
+            formula_options.group("sort") is not None,
+        )
 
-            try:
-                base_roll = formula_options.group("element")
+    @staticmethod
+    def compile_template(string, current_table_folder: Path):
+        segments = []
+        position = 0
 
-                count_formula = (
-                    formula_options.group("roll_count")
-                    if formula_options.group("count")
-                    else "1"
-                )
-                count = int(dice.roll(count_formula))
+        for match in TableInliner.inline_element_re.finditer(string):
+            if match.start() > position:
+                segments.append(string[position : match.start()])
 
-                joiner = (
-                    formula_options.group("inline_joiner")
-                    if formula_options.group("joiner")
-                    else ", "
+            element = match.group("element")
+            segment = TableInliner.compile_inline_dice_roll(element)
+            if segment is None:
+                segment = TableInliner.parse_inline_table_info(
+                    element, current_table_folder
                 )
 
-                sort = formula_options.group("sort") is not None
+            segments.append(segment)
+            position = match.end()
+
+        if position < len(string):
+            segments.append(string[position:])
 
-                rolls = [f"{int(dice.roll(base_roll))}" for _ in range(count)]
+        return CompiledTemplate(segments)
 
-                if sort:
-                    rolls = natsorted(rolls)
+    def get_compiled_template(self, string, current_table_folder: Path):
+        key = (string, current_table_folder)
 
-                return joiner.join(rolls)
-            except dice.DiceBaseException:
-                return match.group(0)
+        template = self.compiled_templates.get(key)
+        if template is None:
+            template = self.compile_template(string, current_table_folder)
+            self.compiled_templates[key] = template
+            if len(self.compiled_templates) > COMPILED_TEMPLATE_CACHE_SIZE:
+                self.compiled_templates.popitem(last=False)
+        else:
+            self.compiled_templates.move_to_end(key)
 
-        new_string = TableInliner.inline_element_re.sub(roll_inline_dice, string)
-        return new_string
+        return template
+
+    def drop_compiled_templates(self, table_folders):
+        """Drops the templates compiled from the results of the tables in
+        `table_folders`. Templates only know the folder of their table, so the
+        ones of the other tables of these folders are compiled again too"""
+        for key in list(self.compiled_templates):
+            if key[1] in table_folders:
+                del self.compiled_templates[key]
 
     @staticmethod
     def parse_inline_table_info(extracted_inlined_table, current_table_folder: Path):
@@ -204,57 +380,161 @@ class TableInliner:
         )
 
     def roll_inline_tables(self, rolled_result: str, current_table_folder: Path):
-        inlined_elements = TableInliner.inline_element_re.findall(rolled_result)
-
-        # Step 1: replace inline dice rolls
-        if len(inlined_elements) == 0:
+        if "[[" not in rolled_result:
             return rolled_result
 
-        rolled_result = self.insert_inline_dice_roll(rolled_result)
-        inlined_elements = TableInliner.inline_element_re.findall(rolled_result)
-        if len(inlined_elements) == 0:
-            return rolled_result
+        return self.roll_inline_results([rolled_result], current_table_folder)[0]
+
+    def roll_inline_results(self, results, current_table_folder: Path):
+        """Same as `roll_inline_tables` on each result, or nested list of results.
+        The markers are expanded breadth-first across every result: at each
+        level of nesting, all the references to a table are rolled at once"""
+        expansions = []
+        shaped_results = get_expansions(results, current_table_folder, expansions)
+
+        pending = [expansion for expansion in expansions if is_pending(expansion.text)]
+        if pending:
+            with stats.phase("inline"):
+                self.expand(pending)
+
+        return get_expanded_texts(shaped_results)
+
+    def expand(self, expansions):
+        levels = []
+        while expansions:
+            if len(levels) >= self.max_inline_depth:
+                raise RecursionError(
+                    f"Inline tables nested more than {self.max_inline_depth} levels "
+                    f"deep in '{expansions[0].text}', check the tables for "
+                    "reference cycles"
+                )
 
-        # Step 2: Load inlined tables info
-        parsed_tables = dict()
+            levels.append(expansions)
+            expansions = self.expand_level(expansions)
+
+        stats.record_max("max_inline_depth", len(levels))
+
+        # Results are only complete once the results rolled for their
+        # references are, so levels are joined from the deepest one up
+        for level in reversed(levels):
+            for expansion in level:
+                expansion.join()
+
+    def expand_level(self, expansions):
+        """Rolls the dice and table references of each expansion, and returns
+        the rolled results that have markers of their own"""
+
+        # Step 1: roll inline dice and group table references, in order
+        references = dict()
+        for expansion in expansions:
+            template = self.get_compiled_template(expansion.text, expansion.folder)
+            if template.is_plain:
+                continue
+
+            expansion.segments = list(template.segments)
+            for index, segment in enumerate(template.segments):
+                if isinstance(segment, InlineDiceRoll):
+                    expansion.segments[index] = segment.render()
+                elif isinstance(segment, InlineTableInfo):
+                    references.setdefault(segment, []).append(
+                        (expansion, index, segment, segment.roll_count())
+                    )
 
-        for index, result in enumerate(inlined_elements):
-            table_info = self.parse_inline_table_info(result, current_table_folder)
+            if stats.enabled:
+                stats.count(
+                    "inline_markers_expanded",
+                    sum(not isinstance(segment, str) for segment in template.segments),
+                )
 
-            if table_info not in parsed_tables:
-                parsed_tables[table_info] = TableReferenceCounter()
+        # Step 2: roll every table once, and share its results out
+        next_level = []
+        for table_info, table_references in references.items():
+            table_folder = table_info.table_path.parent
+
+            total_count = sum(count for *_, count in table_references)
+            table = self.load_inlined_table(table_info, total_count)
+            has_markers = table.has_inline_markers()
+
+            for expansion, index, segment, results in self.roll_references(
+                table, total_count, table_references
+            ):
+                if not has_markers:
+                    expansion.segments[index] = segment.joiner.join(results)
+                    continue
+
+                rolled = [
+                    (
+                        InlineExpansion(result, table_folder)
+                        if is_pending(result)
+                        else result
+                    )
+                    for result in results
+                ]
+                expansion.segments[index] = ReferenceExpansion(segment.joiner, rolled)
+                next_level.extend(
+                    item for item in rolled if isinstance(item, InlineExpansion)
+                )
 
-            table_ref_count = parsed_tables[table_info]
-            table_ref_count.add_reference(index, table_info.count, table_info.joiner)
+        return next_level
 
-        # Step 3: Replace inlined tables reference with rolled results
-        for table_info, ref_counter in parsed_tables.items():
-            # Part 1: load the referenced table in cache and roll the needed results
-            table = self.load_inlined_table(table_info, ref_counter.roll_count)
-            results = table.get_results()
+    @staticmethod
+    def roll_references(table, total_count: int, table_references):
+        """Results of each reference to a table, drawn with a single roll for
+        every expansion when the table's results are independent. Otherwise,
+        e.g. for exclusive rolls, each expansion gets its own roll"""
+        bulk_results = None
+        if table.has_independent_results():
+            stats.count("inline_table_rolls")
+            with stats.phase("roll"):
+                bulk_results = table.roll_results(total_count)
+        bulk_position = 0
+
+        # The references of an expansion are next to each other
+        for _, expansion_references in groupby(
+            table_references, key=lambda reference: reference[0]
+        ):
+            expansion_references = list(expansion_references)
+            expansion_count = sum(count for *_, count in expansion_references)
+
+            if bulk_results is not None:
+                results = bulk_results[bulk_position : bulk_position + expansion_count]
+                bulk_position = bulk_position + expansion_count
+            else:
+                stats.count("inline_table_rolls")
+                with stats.phase("roll"):
+                    results = table.roll_results(expansion_count)
+
+            # Sorting applies to all the results of the expansion, as if
+            # they were rolled for it alone
+            if expansion_references[0][2].sort:
+                from natsort import natsorted
 
-            if table_info.sort:
                 results = natsorted(results)
 
-            # Part 2: Replace inline markers with results
-            for index, replacer_info in ref_counter.indices.items():
-                # Get as many results as needed to replace a single marker
-                result_slicer = slice(0, replacer_info["count"])
-                replacer_string = replacer_info["joiner"].join(results[result_slicer])
+            position = 0
+            for expansion, index, segment, count in expansion_references:
+                yield expansion, index, segment, results[position : position + count]
+                position = position + count
 
-                del results[result_slicer]
 
-                # Recursively replace inlined tables
-                while (
-                    replaced_result := self.roll_inline_tables(
-                        replacer_string, table_info.table_path.parent
-                    )
-                ) != replacer_string:
-                    replacer_string = replaced_result
+def is_pending(result):
+    """Whether a rolled result has inline markers to expand"""
+    return isinstance(result, str) and "[[" in result
 
-                # Replace the targeted marker with the new string
-                rolled_result = rolled_result.replace(
-                    f"[[{inlined_elements[index]}]]", replacer_string, 1
-                )
 
-        return rolled_result
+def get_expansions(results, folder: Path, expansions):
+    """`results` with each string replaced by its InlineExpansion, which are
+    also added to `expansions`"""
+    if isinstance(results, str):
+        expansion = InlineExpansion(results, folder)
+        expansions.append(expansion)
+        return expansion
+
+    return [get_expansions(result, folder, expansions) for result in results]
+
+
+def get_expanded_texts(shaped_results):
+    if isinstance(shaped_results, InlineExpansion):
+        return shaped_results.text
+
+    return [get_expanded_texts(result) for result in shaped_results]
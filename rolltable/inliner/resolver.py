@@ -0,0 +1,250 @@
+import itertools
+import os
+from pathlib import Path
+from .. import stats
+from .inliner import TableInliner, create_table
+
+# Threads reading and parsing referenced tables at once, see `prefetch_tables`
+DEFAULT_PREFETCH_THREADS = 8
+
+
+class ReferenceGraph:
+    """Outcome of a static walk over the `[[...]]` references reachable from a
+    root table"""
+
+    def __init__(self):
+        self.tables = []
+        self.cycles = []
+        self.missing = dict()
+        self.invalid = dict()
+
+    def is_valid(self):
+        return not self.missing and not self.invalid
+
+    def depends_on(self, table_files):
+        """Whether any of `table_files` was loaded or looked for by the walk"""
+        return any(
+            table_file in table_files
+            for table_file in itertools.chain(self.tables, self.missing, self.invalid)
+        )
+
+    def describe(self):
+        lines = [f"Tables loaded: {len(self.tables)}"]
+        lines.extend(f"  {table_path}" for table_path in self.tables)
+
+        if self.cycles:
+            lines.append(f"Reference cycles: {len(self.cycles)}")
+            lines.extend(
+                "  " + " -> ".join(str(table_path) for table_path in cycle)
+                for cycle in self.cycles
+            )
+
+        if self.missing:
+            lines.append(f"Missing tables: {len(self.missing)}")
+            lines.extend(
+                f"  {table_path} (referenced from {referrer})"
+                for table_path, referrer in self.missing.items()
+            )
+
+        if self.invalid:
+            lines.append(f"Invalid tables or references: {len(self.invalid)}")
+            lines.extend(
+                f"  {table_path}: {error}" for table_path, error in self.invalid.items()
+            )
+
+        return lines
+
+
+def get_references(entries, table_folder: Path, graph, source):
+    references = []
+
+    # Entries are scanned as one string: "[]" can't be part of a marker, so
+    # no marker can span two entries
+    entries_text = "[]".join(entry for entry in entries if isinstance(entry, str))
+    elements = TableInliner.inline_element_re.findall(entries_text)
+
+    for element in dict.fromkeys(elements):
+        try:
+            if TableInliner.compile_inline_dice_roll(element) is None:
+                references.append(
+                    TableInliner.parse_inline_table_info(element, table_folder)
+                )
+        except ValueError as exc:
+            graph.invalid.setdefault(source, f"{str(exc)}")
+
+    return references
+
+
+def resolve_references(inliner: TableInliner, root_table, root_folder: Path, root_path):
+    """Loads every table reachable from `root_table` into the inliner's cache,
+    so rolling doesn't have to read files, and reports reference cycles and
+    tables that can't be loaded. Errors are reported rather than raised, as
+    references that are never rolled don't stop the generator from working.
+
+    The walk is iterative, so deep reference chains can't hit the recursion
+    limit"""
+    with stats.phase("resolve"):
+        with stats.phase("prefetch"):
+            prefetch_tables(inliner, root_table, root_folder, root_path)
+
+        return walk_references(inliner, root_table, root_folder, root_path)
+
+
+def get_prefetch_threads() -> int:
+    try:
+        return max(1, int(os.environ.get("ROLLTABLE_PREFETCH_THREADS", "")))
+    except ValueError:
+        return DEFAULT_PREFETCH_THREADS
+
+
+def prefetch_tables(inliner: TableInliner, root_table, root_folder: Path, root_path):
+    """Loads the tables reachable from `root_table` into the inliner's cache,
+    one level of references at a time, with the tables of a level read and
+    parsed concurrently. Reading files is then no longer serialized, which is
+    where the time goes on network folders and cold caches.
+
+    The threads only create the tables: the inliner's cache is filled from
+    this thread. Tables that can't be loaded are left out, `walk_references`
+    tries them again and reports them"""
+    scratch_graph = ReferenceGraph()
+    visited = {root_path}
+    level = get_references(
+        root_table.get_entries(), root_folder, scratch_graph, root_path
+    )
+    executor = None
+
+    try:
+        while level:
+            # Only the first reference to each table is loaded
+            tables = dict()
+            table_infos = dict()
+            for table_info in level:
+                table_path = table_info.table_path
+                if table_path in visited:
+                    continue
+
+                visited.add(table_path)
+                if table_path in inliner.loaded_tables:
+                    tables[table_path] = inliner.loaded_tables[table_path]
+                else:
+                    table_infos[table_path] = table_info
+
+            if len(table_infos) > 1 and executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+
+                executor = ThreadPoolExecutor(get_prefetch_threads())
+
+            tables.update(load_tables(inliner, table_infos, executor))
+
+            level = []
+            for table_path, table in tables.items():
+                level.extend(
+                    get_references(
+                        table.get_entries(),
+                        table_path.parent,
+                        scratch_graph,
+                        table_path,
+                    )
+                )
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def load_tables(inliner: TableInliner, table_infos: dict, executor):
+    """Loads the tables of `table_infos` by path into the inliner's cache, on
+    the threads of `executor` when there are several of them. Returns the
+    tables that could be loaded, by path"""
+    tables = dict()
+
+    if len(table_infos) < 2:
+        for table_path, table_info in table_infos.items():
+            try:
+                tables[table_path] = inliner.get_inlined_table(table_info)
+            except Exception:
+                continue
+
+        return tables
+
+    loads = []
+    for table_path, table_info in table_infos.items():
+        inliner.watch_table_file(table_path)
+        loads.append(
+            (table_path, executor.submit(stats.call_measured, create_table, table_info))
+        )
+
+    for table_path, load in loads:
+        try:
+            table, report = load.result()
+        except Exception:
+            continue
+
+        if report is not None:
+            stats.merge_report(report)
+
+        stats.count("inliner_cache_misses")
+        inliner.loaded_tables[table_path] = table
+        tables[table_path] = table
+
+    return tables
+
+
+def walk_references(inliner: TableInliner, root_table, root_folder: Path, root_path):
+    graph = ReferenceGraph()
+    resolved = set()
+
+    stack = [
+        (
+            root_path,
+            iter(
+                get_references(root_table.get_entries(), root_folder, graph, root_path)
+            ),
+        )
+    ]
+
+    while stack:
+        source, references = stack[-1]
+        table_info = next(references, None)
+
+        if table_info is None:
+            stack.pop()
+            resolved.add(source)
+            continue
+
+        table_path = table_info.table_path
+        if table_path in resolved:
+            continue
+
+        try:
+            table = inliner.get_inlined_table(table_info)
+        except FileNotFoundError:
+            graph.missing[table_path] = source
+            resolved.add(table_path)
+            continue
+        except Exception as exc:
+            graph.invalid[table_path] = f"{str(exc)}"
+            resolved.add(table_path)
+            continue
+
+        active_path = [path for path, _ in stack]
+        if table_path in active_path:
+            cycle = active_path[active_path.index(table_path) :] + [table_path]
+            graph.cycles.append(cycle)
+            continue
+
+        graph.tables.append(table_path)
+        stack.append(
+            (
+                table_path,
+                iter(
+                    get_references(
+                        table.get_entries(),
+                        table_path.parent,
+                        graph,
+                        table_path,
+                    )
+                ),
+            )
+        )
+
+    return graph
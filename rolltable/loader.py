@@ -1,12 +1,18 @@
+import os
 import sys
+from . import stats
+from . import tablecache
 from enum import Enum
 from pathlib import Path
-from table.numberedlist import NumberedListTable
-from table.chance import ChanceTable
-from table.random import RandomTable
-from table.template import OutputTemplate
-from table.hexflower.hexflower import Hexflower
-from table.weightedlist import WeightedListTable
+from .table.baseloader import MappedTableFile, ParsedTable
+
+# Formats whose tables can be memory-mapped, see `table.mappedfile`
+MAPPABLE_FORMATS = ("list", "weighted_list")
+
+DEFAULT_MAP_SIZE = 256 * 1024 * 1024
+
+# Set by `--mmap`: every table that can be is memory-mapped, whatever its size
+map_tables = False
 
 
 class TableFormat(Enum):
@@ -19,9 +25,72 @@ class TableFormat(Enum):
 
 
 def load_table(table_format: TableFormat, args):
-    table_data = read_table_file(args.table_filepath)
+    return load_cached_table(
+        args.table_filepath,
+        table_format.name,
+        lambda table_data: create_table(table_format, table_data, args),
+    )
+
+
+def load_cached_table(table_path, table_format: str, create_table):
+    """Creates a table through `create_table(table_data)`, where the table data
+    is either the file content or its parsed form from the on-disk cache"""
+    stats.count("tables_loaded")
+
+    with stats.time_file(table_path):
+        return load_table_file(table_path, table_format, create_table)
+
+
+def load_table_file(table_path, table_format: str, create_table):
+    if table_path == "-":
+        return create_table(read_table_file(table_path))
+
+    if type(table_path) is str:
+        table_file = get_absolute_file_path(table_path)
+    else:
+        table_file = table_path
+
+    if not table_file.is_file():
+        raise FileNotFoundError(f"Table file '{table_path}' not found.")
+
+    # Mapped tables are never parsed, so they have nothing to cache
+    if is_mapped(table_file, table_format):
+        stats.count("tables_mapped")
+        return create_table(MappedTableFile(table_file))
+
+    if not tablecache.is_active():
+        return create_table(read_table_file(table_file))
 
+    parsed_table = tablecache.load(table_file, table_format)
+    if parsed_table is not None:
+        return create_table(ParsedTable(parsed_table))
+
+    table = create_table(read_table_file(table_file))
+    tablecache.store(table_file, table_format, table.table)
+    return table
+
+
+def get_map_size() -> int:
+    try:
+        return int(os.environ.get("ROLLTABLE_MMAP_SIZE", DEFAULT_MAP_SIZE))
+    except ValueError:
+        return DEFAULT_MAP_SIZE
+
+
+def is_mapped(table_file: Path, table_format: str):
+    """Whether the table is memory-mapped instead of read: with `--mmap`, or
+    when the file is too big to hold every entry in memory"""
+    if table_format.lower().replace("-", "_") not in MAPPABLE_FORMATS:
+        return False
+
+    return map_tables or table_file.stat().st_size >= get_map_size()
+
+
+def create_table(table_format: TableFormat, table_data, args):
+    # Table formats are imported on first use, to keep the startup light
     if table_format == TableFormat.List:
+        from .table.random import RandomTable
+
         return RandomTable(
             table_data,
             args.count,
@@ -30,6 +99,8 @@ def load_table(table_format: TableFormat, args):
             args.dice_formula,
         )
     elif table_format == TableFormat.Chance:
+        from .table.chance import ChanceTable
+
         return ChanceTable(
             table_data,
             args.count,
@@ -38,6 +109,8 @@ def load_table(table_format: TableFormat, args):
             args.dice_formula,
         )
     elif table_format == TableFormat.Weighted_list:
+        from .table.weightedlist import WeightedListTable
+
         return WeightedListTable(
             table_data,
             args.count,
@@ -46,10 +119,23 @@ def load_table(table_format: TableFormat, args):
             args.dice_formula,
         )
     elif table_format == TableFormat.Hexflower:
-        return Hexflower(table_data, args.count, args.start)
+        from .table.hexflower.hexflower import Hexflower
+
+        return Hexflower(
+            table_data,
+            args.count,
+            args.start,
+            args.steps,
+            args.stationary,
+            args.walkers,
+        )
     elif table_format == TableFormat.Template:
+        from .table.template import OutputTemplate
+
         return OutputTemplate(table_data, args.count)
     elif table_format == TableFormat.NumberedList:
+        from .table.numberedlist import NumberedListTable
+
         return NumberedListTable(
             table_data,
             args.count,
@@ -62,6 +148,11 @@ def load_table(table_format: TableFormat, args):
 
 
 def read_table_file(table_path):
+    with stats.phase("read"):
+        return read_table_content(table_path)
+
+
+def read_table_content(table_path):
     if table_path == "-":
         return "\n".join([line.rstrip("\n") for line in sys.stdin.readlines()])
 
@@ -0,0 +1,108 @@
+import hashlib
+import multiprocessing
+import random
+from collections import deque
+from . import core
+from . import rng
+from . import stats
+from .inliner.inliner import TableInliner
+from .inliner.resolver import resolve_references
+from .table.baseloader import RESULT_CHUNK_SIZE
+
+# Rolled chunks waiting to be written, per worker process. Bounds the memory
+# used when the output is slower than the workers
+PENDING_CHUNKS_PER_JOB = 2
+
+# State of a worker process, set up once by `init_worker`
+worker_table = None
+worker_inliner = None
+worker_folder = None
+
+
+def derive_seed(master_seed: int, shard_index: int) -> int:
+    """Seed of the independent random stream used for one shard of results"""
+    digest = hashlib.sha256(f"{master_seed}:{shard_index}".encode()).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def init_worker(table, base_table_folder, root_table_path, rng_backend):
+    global worker_table, worker_inliner, worker_folder
+
+    # A forked worker starts with a copy of the measures of the main process,
+    # which would be sent back with its first report
+    stats.reset()
+
+    rng.use(rng_backend)
+    worker_table = table
+    worker_folder = base_table_folder
+    worker_inliner = TableInliner()
+    resolve_references(worker_inliner, table, base_table_folder, root_table_path)
+
+
+def roll_worker_shard(shard):
+    results = roll_shard(worker_table, worker_inliner, worker_folder, shard)
+
+    # Measures are sent along with the results, to be merged with the main
+    # process ones
+    return results, stats.take_report() if stats.enabled else None
+
+
+def roll_shard(table, inliner, base_table_folder, shard):
+    seed, count = shard
+
+    with rng.restored():
+        rng.use(seed=seed)
+
+        with stats.phase("roll"):
+            results = table.roll_results(count)
+
+        if not table.has_inline_markers():
+            return results
+
+        return core.process_inline_tables(results, inliner, base_table_folder)
+
+
+def get_shards(count: int, seed=None, chunk_size: int = RESULT_CHUNK_SIZE):
+    """Splits `count` results into shards of at most `chunk_size` results,
+    each with the seed of its own random stream derived from `seed`"""
+    master_seed = seed if seed is not None else random.getrandbits(64)
+
+    for shard_index, chunk_start in enumerate(range(0, count, chunk_size)):
+        yield derive_seed(master_seed, shard_index), min(
+            chunk_size, count - chunk_start
+        )
+
+
+def roll_shards(table, count: int, inliner, base_table_folder, seed=None):
+    """Rolls the shards of `count` results one after the other, in this
+    process. Gives the same results as `roll_in_parallel` for the same seed"""
+    for shard in get_shards(count, seed):
+        yield roll_shard(table, inliner, base_table_folder, shard)
+
+
+def roll_in_parallel(
+    table, count: int, jobs: int, base_table_folder, root_table_path, seed=None
+):
+    """Rolls the shards of `count` results over `jobs` processes, which each
+    load the referenced tables once. Chunks of results are yielded in order,
+    so a seed always gives the same results, whatever the number of jobs"""
+    with multiprocessing.Pool(
+        jobs, init_worker, (table, base_table_folder, root_table_path, rng.get().name)
+    ) as pool:
+        pending = deque()
+        for shard in get_shards(count, seed):
+            pending.append(pool.apply_async(roll_worker_shard, (shard,)))
+
+            if len(pending) >= jobs * PENDING_CHUNKS_PER_JOB:
+                yield get_shard_results(pending.popleft())
+
+        while pending:
+            yield get_shard_results(pending.popleft())
+
+
+def get_shard_results(pending_shard):
+    results, report = pending_shard.get()
+    if report is not None:
+        stats.merge_report(report)
+
+    return results
@@ -0,0 +1,171 @@
+from pathlib import Path
+from . import core
+from . import loader
+from . import rng
+from . import tablecache
+from .inliner.inliner import TableInliner
+from .inliner.resolver import resolve_references
+
+
+class LoadedTable:
+    """A table of a registry, with the outcome of the walk over its inline
+    references, or None when they have to be walked again"""
+
+    def __init__(self, table, table_path: Path, reference_graph):
+        self.table = table
+        self.table_path = table_path
+        self.reference_graph = reference_graph
+
+
+class Registry:
+    """Rolls on tables from Python instead of the command line. Each table is
+    loaded once for any number of rolls. The tables of a registry share its
+    inliner, so the tables they reference inline are loaded once too.
+
+    The files of the tables are watched: an edited table is loaded again, and
+    the inline references of the tables that depend on it are walked again,
+    but the other tables are kept as they are.
+
+    Rolls use the process-wide random generator (see `rng`), so a registry
+    isn't meant to be used from several threads at once. A seeded roll puts
+    the previous generator back when it's done"""
+
+    def __init__(self, rng_backend=None):
+        self.inliner = TableInliner()
+        self.inliner.watch_tables()
+        self.tables = dict()
+        self.rng_backend = rng_backend
+        tablecache.keep_in_memory()
+
+    def load(self, table_path, table_format="list"):
+        """Loads the table, along with every table it references inline, and
+        returns it. `table_format` is one of the `--format` options, or None
+        to get it from the file extension like `--ext`"""
+        return self.get_loaded_table(table_path, table_format).table
+
+    def get_loaded_table(self, table_path, table_format) -> LoadedTable:
+        changed_files = self.inliner.drop_changed_tables()
+        if changed_files:
+            self.drop_changed_tables(changed_files)
+
+        table_file = loader.get_absolute_file_path(str(table_path))
+        key = (table_file, table_format)
+
+        loaded_table = self.tables.get(key)
+        if loaded_table is None:
+            args = core.get_parameters([str(table_file)])
+            args.ext = table_format is None
+            if table_format is not None:
+                args.format = table_format
+
+            self.inliner.watcher.watch(table_file)
+            loaded_table = LoadedTable(core.load_root_table(args), table_file, None)
+            self.tables[key] = loaded_table
+
+        if loaded_table.reference_graph is None:
+            loaded_table.reference_graph = resolve_references(
+                self.inliner, loaded_table.table, table_file.parent, table_file
+            )
+
+        return loaded_table
+
+    def drop_changed_tables(self, changed_files):
+        """Drops the tables whose file changed, and the walks over the inline
+        references that went through a changed file"""
+        for key, loaded_table in list(self.tables.items()):
+            if loaded_table.table_path in changed_files:
+                del self.tables[key]
+            elif loaded_table.reference_graph is not None and (
+                loaded_table.reference_graph.depends_on(changed_files)
+            ):
+                loaded_table.reference_graph = None
+
+    def roll(
+        self,
+        table_path,
+        count=1,
+        exclusive=False,
+        formula=None,
+        clamp=False,
+        table_format="list",
+        seed=None,
+    ):
+        """Rolls `count` results on the table, which is loaded first if it
+        isn't yet. The options mean the same as on the command line, and
+        `count` can also be a dice formula. Returns the results as a list of
+        strings, or of lists of strings for the tables that roll sets of
+        results (chance tables, hex-flower walkers)"""
+        loaded_table = self.prepare_roll(
+            table_path, count, exclusive, formula, clamp, table_format
+        )
+
+        with rng.restored():
+            core.select_rng(self.rng_backend, seed)
+            return [
+                result
+                for result_chunk in core.roll_loaded_table_chunks(
+                    loaded_table.table,
+                    self.inliner,
+                    loaded_table.table_path,
+                    loaded_table.table_path.parent,
+                    seed=seed,
+                    prewarm=False,
+                )
+                for result in result_chunk
+            ]
+
+    def tally(
+        self,
+        table_path,
+        count=1,
+        exclusive=False,
+        formula=None,
+        clamp=False,
+        table_format="list",
+        seed=None,
+    ):
+        """Same as `roll`, but returns the number of times each distinct
+        result is rolled, by result, like `--tally`. Sets of results are
+        tuples. Huge counts are drawn at once where the table allows it, see
+        `core.tally_loaded_table`"""
+        loaded_table = self.prepare_roll(
+            table_path, count, exclusive, formula, clamp, table_format
+        )
+
+        with rng.restored():
+            core.select_rng(self.rng_backend, seed)
+            return dict(
+                core.tally_loaded_table(
+                    loaded_table.table,
+                    self.inliner,
+                    loaded_table.table_path,
+                    loaded_table.table_path.parent,
+                    seed=seed,
+                    prewarm=False,
+                )
+            )
+
+    def prepare_roll(self, table_path, count, exclusive, formula, clamp, table_format):
+        loaded_table = self.get_loaded_table(table_path, table_format)
+
+        table = loaded_table.table
+        table.set_flag("count", count)
+        table.set_flag("exclusive", exclusive)
+        table.set_flag("clamp", clamp)
+        table.set_flag("formula", formula)
+        return loaded_table
+
+    def get_distribution(
+        self, table_path, table_format="list", formula=None, clamp=False
+    ):
+        """Exact probability of each entry of the table, as (entry,
+        probability) pairs, like `--distribution`"""
+        table = self.get_loaded_table(table_path, table_format).table
+        table.set_flag("clamp", clamp)
+        table.set_flag("formula", formula)
+        return table.get_distribution()
+
+    def check(self, table_path, table_format="list"):
+        """Tables referenced inline from the table, recursively, with the
+        reference cycles and missing or invalid tables found, like `--check`"""
+        return self.get_loaded_table(table_path, table_format).reference_graph
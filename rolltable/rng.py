@@ -0,0 +1,127 @@
+import random
+from contextlib import contextmanager
+
+# Number of draws a NumPy-backed generator makes at once, then serves one by one
+NUMPY_BLOCK_SIZE = 1 << 14
+
+
+class PythonRng(random.Random):
+    """Draws from the Mersenne Twister of the `random` module, one at a time.
+    Needs nothing but the standard library"""
+
+    name = "python"
+
+    def __init__(self, seed=None):
+        super().__init__(seed)
+        self.numpy_generator = None
+
+    def randoms(self, k: int):
+        """`k` floats in [0, 1)"""
+        uniform = self.random
+        return [uniform() for _ in range(k)]
+
+    def get_numpy_generator(self):
+        """NumPy generator for the array rolls, seeded from this generator so
+        a seed covers both. None if NumPy isn't installed"""
+        if self.numpy_generator is None:
+            try:
+                import numpy
+            except ImportError:
+                return None
+
+            self.numpy_generator = numpy.random.default_rng(self.getrandbits(64))
+
+        return self.numpy_generator
+
+
+class NumpyRng:
+    """Draws from a NumPy `Generator`. Single draws are served from blocks of
+    NUMPY_BLOCK_SIZE floats generated at once, and bulk draws are made with
+    a single NumPy call"""
+
+    name = "numpy"
+
+    def __init__(self, seed=None, block_size: int = NUMPY_BLOCK_SIZE):
+        import numpy
+
+        self.generator = numpy.random.default_rng(seed)
+        self.block_size = block_size
+        self.block = []
+        self.block_index = 0
+
+    def random(self) -> float:
+        if self.block_index >= len(self.block):
+            self.block = self.generator.random(self.block_size).tolist()
+            self.block_index = 0
+
+        value = self.block[self.block_index]
+        self.block_index = self.block_index + 1
+        return value
+
+    def randoms(self, k: int):
+        return self.generator.random(k).tolist()
+
+    def randrange(self, stop: int) -> int:
+        return int(self.random() * stop)
+
+    def randint(self, low: int, high: int) -> int:
+        return low + int(self.random() * (high - low + 1))
+
+    def shuffle(self, items):
+        for index in range(len(items) - 1, 0, -1):
+            other_index = int(self.random() * (index + 1))
+            items[index], items[other_index] = items[other_index], items[index]
+
+    def choices(self, population, k: int = 1):
+        indices = self.generator.integers(0, len(population), size=k)
+        return [population[index] for index in indices.tolist()]
+
+    def sample(self, population, k: int):
+        indices = self.generator.choice(len(population), size=k, replace=False)
+        return [population[index] for index in indices.tolist()]
+
+    def get_numpy_generator(self):
+        return self.generator
+
+
+BACKENDS = {PythonRng.name: PythonRng, NumpyRng.name: NumpyRng}
+
+# Generator used by every roll: tables, dice formulae and the inliner
+current = PythonRng()
+
+
+def get():
+    return current
+
+
+def use(backend: str = None, seed: int = None):
+    """Replaces the generator used for rolling with a new one, of the given
+    backend (default: the current one). Without a seed, it's seeded from the
+    OS entropy"""
+    global current
+
+    if backend is not None and backend not in BACKENDS:
+        raise ValueError(f"Unknown random generator '{backend}'")
+
+    current = BACKENDS[backend or current.name](seed)
+
+    # A few `dice` operators, like exploding dice, ignore the generator they're
+    # given and draw from the `random` module
+    if seed is not None:
+        random.seed(seed)
+
+
+@contextmanager
+def restored():
+    """Puts the current generator, and the state of the `random` module, back
+    at the end of the block. Long-running processes roll in such blocks, so a
+    seeded roll doesn't make all the rolls that follow it predictable"""
+    global current
+
+    previous = current
+    random_state = random.getstate()
+    try:
+        yield
+    finally:
+        current = previous
+        random.setstate(random_state)
@@ -0,0 +1,265 @@
+import threading
+import time
+
+# Nothing is measured until `enable` is called, so the instrumented code only
+# pays for a flag check
+enabled = False
+
+phase_times = dict()
+counters = dict()
+hooks = []
+
+# Time spent loading each table file, by path
+file_times = dict()
+
+# Time of each phase in other processes, e.g. `--jobs` workers, summed over
+# them. Kept apart from `phase_times`, as it overlaps the wall time of the run
+worker_phase_times = dict()
+
+# Phases being timed, innermost last, each as [name, start of its current slice]
+phase_stack = []
+start_time = None
+
+# Number of table files listed in the report, slowest first
+REPORTED_FILE_COUNT = 10
+
+main_measures = (phase_times, counters, file_times, phase_stack)
+
+# Measures of a thread running `call_measured`, kept apart from the others
+thread_measures = threading.local()
+
+
+def get_measures():
+    return getattr(thread_measures, "current", main_measures)
+
+
+class PhaseTimer:
+    __slots__ = ("name", "times", "stack")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.times, _, _, self.stack = get_measures()
+
+    def __enter__(self):
+        now = time.perf_counter()
+
+        # Time spent in a nested phase is only counted for that phase
+        if self.stack:
+            parent = self.stack[-1]
+            self.times[parent[0]] = self.times.get(parent[0], 0) + now - parent[1]
+
+        self.stack.append([self.name, now])
+        return self
+
+    def __exit__(self, *exc_info):
+        now = time.perf_counter()
+        name, slice_start = self.stack.pop()
+        self.times[name] = self.times.get(name, 0) + now - slice_start
+
+        if self.stack:
+            self.stack[-1][1] = now
+
+        return False
+
+
+class FileTimer:
+    __slots__ = ("path", "start")
+
+    def __init__(self, path):
+        self.path = str(path)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        times = get_measures()[2]
+        times[self.path] = times.get(self.path, 0) + time.perf_counter() - self.start
+        return False
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+null_timer = NullTimer()
+
+
+def phase(name: str):
+    """Context manager timing a phase of the run, e.g. `with stats.phase("read")`.
+    Phases can be nested, the time of the inner phase is then only counted once"""
+    return PhaseTimer(name) if enabled else null_timer
+
+
+def time_file(path):
+    """Context manager timing the load of a table file"""
+    return FileTimer(path) if enabled else null_timer
+
+
+def count(name: str, amount: int = 1):
+    if enabled:
+        thread_counters = get_measures()[1]
+        thread_counters[name] = thread_counters.get(name, 0) + amount
+
+
+def record_max(name: str, value: int):
+    if enabled:
+        thread_counters = get_measures()[1]
+        if value > thread_counters.get(name, 0):
+            thread_counters[name] = value
+
+
+def enable():
+    global enabled, start_time
+
+    enabled = True
+    if start_time is None:
+        start_time = time.perf_counter()
+
+
+def register_hook(callback):
+    """Calls `callback(report)` at the end of each run, with the same report as
+    `get_report`. Registering a hook enables the measures"""
+    hooks.append(callback)
+    enable()
+
+
+def reset():
+    global start_time
+
+    phase_times.clear()
+    counters.clear()
+    file_times.clear()
+    worker_phase_times.clear()
+    phase_stack.clear()
+    start_time = time.perf_counter() if enabled else None
+
+
+def get_report():
+    """Wall time of each phase, time of each phase summed over the worker
+    processes, and the counters, since the measures were enabled or reset"""
+    phases = {name: seconds for name, seconds in phase_times.items()}
+    if start_time is not None:
+        total = time.perf_counter() - start_time
+        phases["other"] = max(0.0, total - sum(phases.values()))
+        phases["total"] = total
+
+    return {
+        "phases": phases,
+        "worker_phases": dict(worker_phase_times),
+        "counters": dict(counters),
+        "files": dict(file_times),
+    }
+
+
+def merge_report(report):
+    """Adds the measures of another process, e.g. a `--jobs` worker. Its
+    phases are added to the worker ones, not to the wall time of this process"""
+    for name, seconds in report["phases"].items():
+        if name not in ("other", "total"):
+            worker_phase_times[name] = worker_phase_times.get(name, 0) + seconds
+
+    for name, value in report["counters"].items():
+        if name.startswith("max_"):
+            record_max(name, value)
+        else:
+            count(name, value)
+
+    for path, seconds in report["files"].items():
+        file_times[path] = file_times.get(path, 0) + seconds
+
+
+def call_measured(function, *args):
+    """Calls `function(*args)` with the measures of this thread kept apart,
+    for threads other than the main one. Returns its result along with the
+    report of its measures (None when nothing is measured), to merge with
+    `merge_report` from the main thread. Phases are left out of the report,
+    as they overlap the time of the main thread"""
+    if not enabled:
+        return function(*args), None
+
+    measures = (dict(), dict(), dict(), [])
+    thread_measures.current = measures
+    try:
+        result = function(*args)
+    finally:
+        del thread_measures.current
+
+    _, thread_counters, thread_file_times, _ = measures
+    return result, {
+        "phases": {},
+        "counters": thread_counters,
+        "files": thread_file_times,
+    }
+
+
+def take_report():
+    """The report of the measures so far, which are then reset"""
+    report = get_report()
+    reset()
+    return report
+
+
+def finish():
+    """Ends a run: calls the registered hooks with its report"""
+    report = get_report()
+    for hook in hooks:
+        hook(report)
+
+    return report
+
+
+def format_report(report):
+    lines = ["Phase times:"]
+    lines.extend(
+        f"  {name:<24}{seconds * 1000:>12.2f} ms"
+        for name, seconds in report["phases"].items()
+    )
+
+    if report["worker_phases"]:
+        lines.append("Worker CPU times (summed over the jobs):")
+        lines.extend(
+            f"  {name:<24}{seconds * 1000:>12.2f} ms"
+            for name, seconds in report["worker_phases"].items()
+        )
+
+    lines.append("Counters:")
+    lines.extend(
+        f"  {name:<24}{value:>12}" for name, value in sorted(report["counters"].items())
+    )
+
+    if report["files"]:
+        lines.append("Slowest table files:")
+        slowest_files = sorted(
+            report["files"].items(), key=lambda file_time: file_time[1], reverse=True
+        )
+        lines.extend(
+            f"  {seconds * 1000:>10.2f} ms  {path}"
+            for path, seconds in slowest_files[:REPORTED_FILE_COUNT]
+        )
+
+    return lines
+
+
+def timed_iter(iterable, name: str):
+    """Times the production of each item of `iterable` as the phase `name`"""
+    if not enabled:
+        return iterable
+
+    return iter_timed(iter(iterable), name)
+
+
+def iter_timed(iterator, name: str):
+    while True:
+        with phase(name):
+            item = next(iterator, iter_timed)
+        if item is iter_timed:
+            return
+
+        yield item
@@ -1,7 +1,101 @@
+from array import array
+from collections.abc import Sequence
+from itertools import accumulate
 from pathlib import Path
-import re
 import types
-import dice
+from .. import diceformula
+from .. import rng
+from .. import stats
+from .sampler import sample_counts
+
+# Number of results rolled at once when results are streamed
+RESULT_CHUNK_SIZE = 1 << 16
+
+COMMENT_PREFIXES = ("#", "//", ";")
+
+# Start of an inline roll, see `inliner`
+INLINE_MARKER = "[["
+
+# Reading an entry of an EntryColumn costs about 4 times as much as splitting
+# one out of the whole column at once
+SPLIT_READ_RATIO = 4
+
+
+class ParsedTable:
+    """Table content that was already parsed, e.g. loaded from the table cache"""
+
+    def __init__(self, table):
+        self.table = table
+
+
+class EntryColumn(Sequence):
+    """Entries of a table stored as a single string, with the offset where
+    each entry starts in an array. Takes a fraction of the memory of a list of
+    strings, and is much faster to pickle. Entries only become `str` objects
+    when they're read, e.g. when they're rolled"""
+
+    def __init__(self, entries=()):
+        entries = list(entries)
+
+        # Entries are lines, so they're separated by a line break
+        self.text = "\n".join(entries)
+        self.starts = array(
+            "q",
+            accumulate(
+                (len(entry) + 1 for entry in entries),
+                initial=0,
+            ),
+        )
+
+    def __len__(self):
+        return len(self.starts) - 1
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return self.take(range(*position.indices(len(self))))
+
+        if position < 0:
+            position = position + len(self)
+
+        if not 0 <= position < len(self):
+            raise IndexError("Table entry index out of range")
+
+        return self.text[self.starts[position] : self.starts[position + 1] - 1]
+
+    def __iter__(self):
+        return iter(self.text.split("\n") if len(self) else ())
+
+    def get_population(self, count: int):
+        """Entries to draw `count` results from. When enough entries would be
+        read, splitting them all at once is cheaper"""
+        return list(self) if count * SPLIT_READ_RATIO >= len(self) else self
+
+    def has_marked_entries(self):
+        return INLINE_MARKER in self.text
+
+    def get_marked_entries(self):
+        """Entries with inline markers, only split when there are some"""
+        if INLINE_MARKER not in self.text:
+            return []
+
+        return [entry for entry in self if INLINE_MARKER in entry]
+
+    def take(self, indices):
+        """Entries at each of the (non-negative) indices, in the same order"""
+        if len(indices) * SPLIT_READ_RATIO >= len(self):
+            entries = list(self)
+            return [entries[index] for index in indices]
+
+        text = self.text
+        starts = self.starts
+        return [text[starts[index] : starts[index + 1] - 1] for index in indices]
+
+
+class MappedTableFile:
+    """Table file to memory-map instead of reading it, see `table.mappedfile`"""
+
+    def __init__(self, table_file: Path):
+        self.table_file = table_file
 
 
 class BaseTableLoader:
@@ -16,7 +110,16 @@ class BaseTableLoader:
         self.roll_config = types.SimpleNamespace()
         self.roll_config.count = count
         self.roll_config.exclusive = exclusive
-        self.table = self.load_table(table_data)
+        self.is_mapped = isinstance(table_data, MappedTableFile)
+        # Found on first use by `has_inline_markers`
+        self.inline_markers = None
+        if isinstance(table_data, ParsedTable):
+            self.table = table_data.table
+        elif self.is_mapped:
+            self.table = self.map_table(table_data.table_file)
+        else:
+            with stats.phase("parse"):
+                self.table = self.load_table(table_data)
 
         if not dice_formula:
             self.roll_config.formula = None
@@ -33,8 +136,9 @@ class BaseTableLoader:
         if self.roll_config.clamp:
             return
 
-        roll_max = int(dice.roll_max(self.roll_config.formula))
-        roll_min = int(dice.roll_min(self.roll_config.formula))
+        roll_min, roll_max = diceformula.compile_formula(
+            self.roll_config.formula
+        ).support()
         if roll_max > self.table_length() or roll_min < 0:
             raise IndexError(
                 f"""The supplied dice formula should not roll higher than the number of entries on the table or lower 
@@ -43,14 +147,88 @@ class BaseTableLoader:
             )
 
     def get_rolled_count(self):
-        return int(dice.roll(self.roll_config.count))
+        stats.count("dice_rolls")
+        return diceformula.roll(self.roll_config.count)
 
     def get_results(self):
+        return self.roll_results(self.get_rolled_count())
+
+    def iter_results(self, chunk_size: int = RESULT_CHUNK_SIZE):
+        """Same results as `get_results`, as lists of at most `chunk_size`
+        results, so a huge count never holds every result in memory.
+        The count is rolled right away, the results as the chunks are read"""
+        return self.iter_result_chunks(self.get_rolled_count(), chunk_size)
+
+    def iter_result_chunks(self, count: int, chunk_size: int):
+        if not self.has_independent_results():
+            yield self.roll_results(count)
+            return
+
+        for chunk_start in range(0, count, chunk_size):
+            yield self.roll_results(min(chunk_size, count - chunk_start))
+
+    def roll_results(self, count: int):
+        return []
+
+    def has_independent_results(self):
+        """Whether results can be rolled in separate batches, even in separate
+        processes. Exclusive results have to be drawn together to stay distinct"""
+        return not self.roll_config.exclusive
+
+    def get_outcome_weights(self):
+        """Entries drawn by the results of this table, as an EntryColumn, with
+        their weights (None when they all have the same chance), or None when
+        the results aren't independent draws of the entries"""
+        return None
+
+    def roll_tally(self):
+        """Number of times each entry comes up when rolling the table, by
+        entry, without rolling each result (see `sample_counts`). None when
+        the results aren't independent draws of the entries, or NumPy isn't
+        installed"""
+        outcomes = self.get_outcome_weights()
+        if outcomes is None or rng.get().get_numpy_generator() is None:
+            return None
+
+        entries, weights = outcomes
+        counts = sample_counts(len(entries), self.get_rolled_count(), weights)
+        if counts is None:
+            return None
+
+        indices = counts.nonzero()[0].tolist()
+        tally = dict()
+        for entry, times in zip(entries.take(indices), counts[indices].tolist()):
+            tally[entry] = tally.get(entry, 0) + times
+
+        return tally
+
+    def get_entries(self):
+        """Strings this table can roll, for static inspection of its inline
+        references. Only the ones with inline markers are needed"""
         return []
 
+    def has_inline_markers(self):
+        """Whether any of the results of this table has inline markers. Found
+        once, as the entries of a loaded table never change"""
+        if self.inline_markers is None:
+            self.inline_markers = self.find_inline_markers()
+
+        return self.inline_markers
+
+    def find_inline_markers(self):
+        return any(INLINE_MARKER in entry for entry in self.get_entries())
+
+    def get_distribution(self):
+        raise ValueError(
+            f"Distribution mode is not supported for {type(self).__name__} tables"
+        )
+
     def load_table(self, table_data: str):
         return []
 
+    def map_table(self, table_file: Path):
+        raise ValueError(f"{type(self).__name__} tables can't be memory-mapped")
+
     def set_flag(self, name, value):
         if name == "exclusive":
             self.roll_config.exclusive = not not value
@@ -71,13 +249,19 @@ class BaseTableLoader:
             return
 
 
-def get_table_lines(table_data: str, strip_lines: bool = True):
-    return [line.strip() if strip_lines else line for line in table_data.split("\n")]
+def merge_distribution(entry_probabilities):
+    """Sums the probabilities of identical entries, keeping first-seen order"""
+    merged = {}
+    for entry, probability in entry_probabilities:
+        merged[entry] = merged.get(entry, 0) + probability
+
+    return list(merged.items())
 
 
-def is_line_comment(line):
-    return (
-        not not re.match("^#", line)
-        or not not re.match("^//", line)
-        or not not re.match("^;", line)
-    )
+def iter_table_entries(table_data: str):
+    """Stripped lines of a table that are entries, i.e. not blank lines nor
+    comments. Every line-based table format is parsed in this single pass"""
+    for line in table_data.split("\n"):
+        line = line.strip()
+        if line and not line.startswith(COMMENT_PREFIXES):
+            yield line
@@ -1,5 +1,18 @@
-import dice
-import table.baseloader as table_loader
+from array import array
+from fractions import Fraction
+from types import SimpleNamespace
+from .. import diceformula
+from .. import rng
+from .. import stats
+from . import baseloader as table_loader
+
+# Below this many entry rolls, the per-entry loop is cheaper than setting up
+# the NumPy arrays
+BATCH_ROLL_THRESHOLD = 4096
+
+# Upper bound on the number of dice drawn in a single NumPy operation,
+# to keep memory flat for very large roll-set counts
+BATCH_CHUNK_DICE = 1 << 22
 
 
 class ChanceTable(table_loader.BaseTableLoader):
@@ -9,36 +22,108 @@ class ChanceTable(table_loader.BaseTableLoader):
         super().__init__(table_data, count, exclusive, clamp, dice_formula)
 
     def load_table(self, table_data: str):
-        lines = table_loader.get_table_lines(table_data, strip_lines=True)
-
         entries = []
+        chances = array("q")
 
-        for line in lines:
-            if not line or table_loader.is_line_comment(line):
-                continue
+        for line in table_loader.iter_table_entries(table_data):
+            entry, chance = get_line_chance(line)
+            entries.append(entry)
+            chances.append(chance)
 
-            entries.append(get_line_chance(line))
+        table = SimpleNamespace()
+        table.entries = table_loader.EntryColumn(entries)
+        table.chances = chances
+        return table
 
-        return entries
+    def table_length(self):
+        return len(self.table.chances)
 
-    def get_results(self):
+    def roll_results(self, count: int):
         dice_formula = self.roll_config.formula or "d100"
-        count = self.get_rolled_count()
+        roll_formula = diceformula.compile_formula(f"{dice_formula}t")
+        entry_count = len(self.table.chances)
+        stats.count("dice_rolls", count * entry_count)
 
+        if (
+            count * entry_count >= BATCH_ROLL_THRESHOLD
+            and rng.get().get_numpy_generator() is not None
+        ):
+            return self.get_batched_results(count, roll_formula)
+
+        entries = list(zip(self.table.entries, self.table.chances))
         results = [
             [
                 result
-                for entry, chance in self.table
-                if (result := roll_occurrence(entry, dice_formula, chance))
+                for entry, chance in entries
+                if (result := roll_occurrence(entry, roll_formula, chance))
             ]
             for _ in range(count)
         ]
 
         return results
 
+    def get_entries(self):
+        return self.table.entries.get_marked_entries()
+
+    def find_inline_markers(self):
+        return self.table.entries.has_marked_entries()
+
+    def get_distribution(self):
+        """Chance of each entry appearing in a set, followed by the chance of a
+        set containing each possible number of entries"""
+        dice_formula = self.roll_config.formula or "d100"
+        roll_distribution = diceformula.compile_formula(
+            f"{dice_formula}t"
+        ).distribution()
+
+        entry_chances = [
+            (entry, chance_at_most(roll_distribution, chance))
+            for entry, chance in zip(self.table.entries, self.table.chances)
+        ]
+
+        # Poisson-binomial distribution of the number of entries in a set
+        set_sizes = [Fraction(1)]
+        for _, entry_chance in entry_chances:
+            next_set_sizes = [size * (1 - entry_chance) for size in set_sizes]
+            next_set_sizes.append(Fraction(0))
+            for index, size in enumerate(set_sizes):
+                next_set_sizes[index + 1] += size * entry_chance
+            set_sizes = next_set_sizes
+
+        return entry_chances + [
+            (f"Sets with {size} results", probability)
+            for size, probability in enumerate(set_sizes)
+        ]
+
+    def get_batched_results(self, count: int, roll_formula):
+        import numpy
+
+        names = self.table.entries
+        chances = numpy.frombuffer(self.table.chances, dtype=numpy.int64)
+        entry_count = len(chances)
+
+        dice_per_set = entry_count * getattr(roll_formula, "amount", 1)
+        chunk_size = max(1, BATCH_CHUNK_DICE // max(1, dice_per_set))
+
+        results = []
+        for chunk_start in range(0, count, chunk_size):
+            chunk_count = min(chunk_size, count - chunk_start)
+            hits = roll_formula.roll_array((chunk_count, entry_count)) <= chances
+
+            results.extend(names.take(numpy.flatnonzero(row).tolist()) for row in hits)
+
+        return results
+
+
+def chance_at_most(distribution, chance):
+    return sum(
+        (probability for value, probability in distribution.items() if value <= chance),
+        Fraction(0),
+    )
+
 
-def roll_occurrence(name, formula, chance):
-    return name if dice.roll(f"{formula}t") <= chance else None
+def roll_occurrence(name, roll_formula, chance):
+    return name if roll_formula.roll() <= chance else None
 
 
 def get_line_chance(line):
@@ -1,19 +1,10 @@
-from table.hexflower.direction import Direction
+from .direction import Direction
 
 
 class Hexagon:
-    id = 0
-    content = ""
+    __slots__ = ("id", "content", "neighbours")
+
     verbose = False
-    neighbours = {
-        Direction.self: 0,
-        Direction.top: 1,
-        Direction.top_right: 2,
-        Direction.bottom_right: 3,
-        Direction.bottom_left: 4,
-        Direction.bottom: 5,
-        Direction.top_left: 6,
-    }
 
     def __init__(self, id: int, content: str, neighbours: dict) -> None:
         self.id = id
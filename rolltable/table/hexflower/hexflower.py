@@ -1,37 +1,140 @@
 from pathlib import Path
 import json
-import table.baseloader as table_loader
-import table.hexflower.parser as Parser
+from ... import rng
+from ... import stats
+from .. import baseloader as table_loader
+from . import parser as Parser
 
 
 class Hexflower(table_loader.BaseTableLoader):
-    def __init__(self, filepath: str, count: str = "1", start=None):
+    def __init__(
+        self,
+        filepath: str,
+        count: str = "1",
+        start=None,
+        steps=None,
+        stationary=False,
+        walkers=None,
+    ):
         super().__init__(filepath, count)
         self.roll_config.start = start
+        self.roll_config.walkers = walkers
+        self.roll_config.steps = steps
+        self.roll_config.stationary = stationary
 
-    def get_results(self):
-        count = self.get_rolled_count()
+    def get_start_index(self):
+        return (
+            self.roll_config.start
+            if self.roll_config.start
+            else self.table.navigator.start
+        )
 
+    def roll_results(self, count: int):
         if count < 1:
             return []
 
-        start_index = (
-            self.roll_config.start
-            if self.roll_config.start
-            else self.table.navigator.start
+        if self.roll_config.steps is not None:
+            return self.get_results_after_steps(count)
+
+        start_position = self.table.positions[self.get_start_index()]
+
+        if self.roll_config.walkers:
+            stats.count("dice_rolls", (count - 1) * self.roll_config.walkers)
+            paths = self.table.walk_many(
+                start_position, count - 1, self.roll_config.walkers
+            )
+            return [self.get_contents(path) for path in paths]
+
+        stats.count("dice_rolls", count - 1)
+        return self.get_contents(self.table.walk_positions(start_position, count - 1))
+
+    def iter_result_chunks(self, count: int, chunk_size: int):
+        # Each walker's path is a single result set
+        if self.roll_config.walkers:
+            yield self.roll_results(count)
+            return
+
+        if self.roll_config.steps is not None or count < 1:
+            yield from super().iter_result_chunks(count, chunk_size)
+            return
+
+        # A long walk is continued chunk by chunk from its last hex
+        positions = self.table.walk_positions(
+            self.table.positions[self.get_start_index()], min(chunk_size, count) - 1
         )
+        while True:
+            stats.count("dice_rolls", len(positions))
+            yield self.get_contents(positions)
+
+            count = count - len(positions)
+            if count <= 0:
+                return
+
+            positions = self.table.walk_positions(
+                positions[-1], min(chunk_size, count)
+            )[1:]
+
+    def has_independent_results(self):
+        # Walks go from hex to hex, only samples after N steps are independent
+        return self.roll_config.steps is not None and not self.roll_config.walkers
+
+    def get_contents(self, positions):
+        contents = [
+            str(self.table.get_hex_at(index))
+            for index in range(len(self.table.hex_ids))
+        ]
+        return [contents[position] for position in positions]
+
+    def get_results_after_steps(self, count: int):
+        """Samples `count` independent positions reached after walking
+        `steps` steps, without walking them. Without NumPy, each result is
+        walked step by step instead"""
+        steps = self.roll_config.steps
+        if rng.get().get_numpy_generator() is None:
+            start_position = self.table.positions[self.get_start_index()]
+            stats.count("dice_rolls", count * steps)
+            return self.get_contents(
+                [
+                    self.table.walk_positions(start_position, steps)[-1]
+                    for _ in range(count)
+                ]
+            )
+
+        transitions = self.table.get_transitions()
+        probabilities = transitions.distribution_after(self.get_start_index(), steps)
+
+        positions = (
+            rng.get()
+            .get_numpy_generator()
+            .choice(
+                len(transitions.hex_ids),
+                size=count,
+                p=probabilities / probabilities.sum(),
+            )
+        )
+
+        return self.get_contents(positions)
+
+    def get_entries(self):
+        return [str(hexagon) for hexagon in self.table.hex_list.values()]
 
-        current_hex = self.table.get_hex(start_index)
-        results = [str(current_hex)]
+    def get_distribution(self):
+        transitions = self.table.get_transitions()
 
-        for i in range(count - 1):
-            current_hex = self.table.navigate(current_hex)
-            results.append(str(current_hex))
+        if self.roll_config.steps is not None and not self.roll_config.stationary:
+            probabilities = transitions.distribution_after(
+                self.get_start_index(), self.roll_config.steps
+            )
+        else:
+            probabilities = transitions.long_run_distribution(self.get_start_index())
 
-        return results
+        return [
+            (str(self.table.get_hex(hex_id)), probability)
+            for hex_id, probability in zip(transitions.hex_ids, probabilities)
+        ]
 
     def load_table(self, table_data):
-        json_config = json.load(table_data)
+        json_config = json.loads(table_data)
         flower_config = Parser.parse_config(json_config)
 
         return flower_config
@@ -0,0 +1,73 @@
+from ... import diceformula
+from .direction import Direction
+
+# Long-run frequencies are approximated by squaring the lazy chain until it
+# stops moving, i.e. after at most 2^MAX_SQUARINGS steps
+MAX_SQUARINGS = 64
+CONVERGENCE_TOLERANCE = 1e-12
+
+
+class TransitionMatrix:
+    """Markov chain view of a hex flower: `matrix[i, j]` is the probability
+    of moving from the i-th hex to the j-th hex in a single navigation step"""
+
+    def __init__(self, flower):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(
+                "The probabilities of hex-flower steps (--distribution, "
+                "--stationary) require NumPy"
+            ) from None
+
+        self.hex_ids = flower.hex_ids
+        self.positions = flower.positions
+        self.matrix = numpy.zeros((len(self.hex_ids), len(self.hex_ids)))
+
+        roll_distribution = diceformula.compile_formula(
+            flower.navigator.formula
+        ).distribution()
+
+        for position in range(len(self.hex_ids)):
+            for value, probability in roll_distribution.items():
+                direction_value = flower.navigator.direction_values.get(
+                    value, Direction.self.value
+                )
+                target = flower.neighbour_table[
+                    position * len(Direction) + direction_value
+                ]
+                self.matrix[position, target] += float(probability)
+
+    def start_vector(self, start_id: int):
+        import numpy
+
+        vector = numpy.zeros(len(self.hex_ids))
+        vector[self.positions[start_id]] = 1.0
+        return vector
+
+    def distribution_after(self, start_id: int, steps: int):
+        """Probability of being on each hex after `steps` steps, computed with
+        O(log steps) matrix products"""
+        import numpy
+
+        return self.start_vector(start_id) @ numpy.linalg.matrix_power(
+            self.matrix, steps
+        )
+
+    def long_run_distribution(self, start_id: int):
+        """Long-run frequency of each hex when starting from `start_id`.
+
+        The lazy chain (I + P) / 2 has the same long-run behaviour as P but is
+        aperiodic, so its powers converge even for flowers that cycle"""
+        import numpy
+
+        power = (numpy.identity(len(self.hex_ids)) + self.matrix) / 2
+
+        for _ in range(MAX_SQUARINGS):
+            next_power = power @ power
+            if numpy.abs(next_power - power).max() < CONVERGENCE_TOLERANCE:
+                power = next_power
+                break
+            power = next_power
+
+        return self.start_vector(start_id) @ power
@@ -1,28 +1,53 @@
-from table.hexflower.direction import Direction
-import dice
+from .direction import Direction
+from ... import diceformula
 
 
 class Navigator:
-    formula = "2d6l"
-    start = 0
-    navigation = {
-        0: Direction.self,
-        1: Direction.bottom,
-        2: Direction.bottom_left,
-        3: Direction.bottom_right,
-        4: Direction.top_left,
-        5: Direction.top_right,
-        6: Direction.top,
-    }
+    __slots__ = (
+        "formula",
+        "roll_formula",
+        "start",
+        "navigation",
+        "direction_values",
+        "direction_lookup",
+        "lookup_offset",
+    )
 
     def __init__(self, formula: str, start: int, navigation: dict) -> None:
         self.formula = formula
+        self.roll_formula = diceformula.compile_formula(formula)
         self.start = start
         self.navigation = navigation
+        self.direction_values = {
+            result: direction.value for result, direction in navigation.items()
+        }
+        self.direction_lookup = None
+        self.lookup_offset = 0
         pass
 
     def next_direction(self) -> Direction:
-        result = int(dice.roll(self.formula))
+        result = self.roll_formula.roll()
         direction = self.navigation.get(result)
 
         return direction if direction is not None else Direction.self
+
+    def next_direction_value(self) -> int:
+        return self.direction_values.get(self.roll_formula.roll(), Direction.self.value)
+
+    def roll_direction_values(self, size: int):
+        """Draws `size` directions at once, as a NumPy array of direction values"""
+        if self.direction_lookup is None:
+            import numpy
+
+            roll_min, roll_max = self.roll_formula.support()
+            self.lookup_offset = roll_min
+            self.direction_lookup = numpy.array(
+                [
+                    self.direction_values.get(result, Direction.self.value)
+                    for result in range(roll_min, roll_max + 1)
+                ],
+                dtype=numpy.intp,
+            )
+
+        rolls = self.roll_formula.roll_array(size)
+        return self.direction_lookup[rolls - self.lookup_offset]
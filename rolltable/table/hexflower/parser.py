@@ -1,22 +1,102 @@
-from table.hexflower.direction import Direction
-from table.hexflower.navigator import Navigator
-from table.hexflower.hexagon import Hexagon
+from .direction import Direction
+from .navigator import Navigator
+from .hexagon import Hexagon
+from .markov import TransitionMatrix
+from array import array
 from typing import Dict
 
+DIRECTION_COUNT = len(Direction)
+
 
 class Flower:
+    __slots__ = (
+        "navigator",
+        "hex_list",
+        "description",
+        "transitions",
+        "hex_ids",
+        "positions",
+        "neighbour_table",
+    )
+
     def __init__(self, nav: Navigator, hex_list: Dict[int, Hexagon], desc: str):
         self.navigator = nav
         self.hex_list = hex_list
         self.description = desc
+        self.transitions = None
+
+        # Flat (hex position x direction) table of neighbour positions, so
+        # navigation is a single index lookup instead of dict and enum lookups
+        self.hex_ids = sorted(hex_list.keys())
+        self.positions = {hex_id: index for index, hex_id in enumerate(self.hex_ids)}
+        self.neighbour_table = array("l", [0] * len(self.hex_ids) * DIRECTION_COUNT)
+        for hex_id in self.hex_ids:
+            hexagon = hex_list[hex_id]
+            for direction in Direction:
+                neighbour_id = hexagon.get_neighbour(direction)
+                if neighbour_id not in self.positions:
+                    raise ValueError(
+                        f"Hex {hex_id} has a {direction.name} neighbour {neighbour_id}, "
+                        "which isn't in the hex list"
+                    )
+
+                self.neighbour_table[
+                    self.positions[hex_id] * DIRECTION_COUNT + direction.value
+                ] = self.positions[neighbour_id]
         pass
 
     def get_hex(self, hex_number: int) -> Hexagon:
         return self.hex_list[hex_number]
 
+    def get_hex_at(self, position: int) -> Hexagon:
+        return self.hex_list[self.hex_ids[position]]
+
     def navigate(self, current_hex: Hexagon) -> Hexagon:
-        next_direction = self.navigator.next_direction()
-        return self.get_hex(current_hex.get_neighbour(next_direction))
+        position = self.navigate_position(self.positions[current_hex.id])
+        return self.get_hex_at(position)
+
+    def navigate_position(self, position: int) -> int:
+        direction_value = self.navigator.next_direction_value()
+        return self.neighbour_table[position * DIRECTION_COUNT + direction_value]
+
+    def walk_positions(self, start_position: int, steps: int):
+        """Positions visited over `steps` steps, starting position included"""
+        neighbour_table = self.neighbour_table
+        next_direction_value = self.navigator.next_direction_value
+
+        position = start_position
+        positions = [position]
+        for _ in range(steps):
+            position = neighbour_table[
+                position * DIRECTION_COUNT + next_direction_value()
+            ]
+            positions.append(position)
+
+        return positions
+
+    def walk_many(self, start_position: int, steps: int, walker_count: int):
+        """Advances `walker_count` independent walkers in lockstep, drawing
+        every walker's direction for a step in one NumPy operation.
+        Returns a (walkers x steps + 1) array of positions"""
+        import numpy
+
+        neighbours = numpy.array(self.neighbour_table, dtype=numpy.intp).reshape(
+            len(self.hex_ids), DIRECTION_COUNT
+        )
+
+        paths = numpy.empty((walker_count, steps + 1), dtype=numpy.intp)
+        paths[:, 0] = start_position
+        for step in range(1, steps + 1):
+            directions = self.navigator.roll_direction_values(walker_count)
+            paths[:, step] = neighbours[paths[:, step - 1], directions]
+
+        return paths
+
+    def get_transitions(self) -> TransitionMatrix:
+        if self.transitions is None:
+            self.transitions = TransitionMatrix(self)
+
+        return self.transitions
 
 
 def parse_navigator(dct: dict):
@@ -0,0 +1,329 @@
+import locale
+import mmap
+import os
+import struct
+import tempfile
+from array import array
+from collections.abc import Sequence
+from .. import stats
+from .. import tablecache
+from .baseloader import COMMENT_PREFIXES, INLINE_MARKER
+from .sampler import CumulativeSampler
+
+# Changed whenever the layout of the index files changes
+INDEX_MAGIC = b"RTINDEX1"
+
+# Magic, table file stamp (mtime in ns, size), entry count, total weight,
+# number of entries with a positive weight and number of entries with inline
+# markers. The header is followed by the offsets of each entry, then by the
+# positions of the entries with inline markers
+INDEX_HEADER = struct.Struct("<8sqqqqqq")
+
+# Bytes of the table file scanned at once while indexing it
+INDEX_SCAN_SIZE = 1 << 24
+
+# Offsets buffered before being written to the index file
+INDEX_WRITE_SIZE = 1 << 16
+
+# Comment prefixes, for the undecoded lines
+BYTES_COMMENT_PREFIXES = tuple(prefix.encode() for prefix in COMMENT_PREFIXES)
+
+# Entries with inline markers are listed in the index, so finding the
+# references doesn't read the whole file
+BYTES_INLINE_MARKER = INLINE_MARKER.encode()
+
+ENCODING = locale.getpreferredencoding(False)
+
+
+class MappedTable(Sequence):
+    """Entries of a table file that is memory-mapped instead of read. The file
+    is paired with an index of the offsets of its entries, so only the entries
+    that are rolled are ever decoded, and memory use doesn't grow with the size
+    of the file. Indexes are built once and kept in the table cache folder"""
+
+    # Offsets stored per entry in the index
+    stride = 2
+
+    def __init__(self, table_file):
+        self.table_file = table_file
+
+        with stats.phase("map"):
+            self.content = map_file(table_file)
+            self.index = open_index(table_file, self.content, self)
+
+        (
+            _,
+            _,
+            _,
+            self.entry_count,
+            self.total_weight,
+            self.positive_count,
+            _,
+        ) = INDEX_HEADER.unpack_from(self.index)
+
+        index_values = memoryview(self.index)[INDEX_HEADER.size :].cast("q")
+        self.offsets = index_values[: self.entry_count * self.stride]
+        self.marked_positions = index_values[self.entry_count * self.stride :]
+        self.starts = self.offsets[0 :: self.stride]
+        self.ends = self.offsets[1 :: self.stride]
+
+        # Rolls jump all over the file, reading ahead would be wasted
+        if isinstance(self.content, mmap.mmap) and hasattr(mmap, "MADV_RANDOM"):
+            self.content.madvise(mmap.MADV_RANDOM)
+
+    def __reduce__(self):
+        # Mapped again from the file when sent to another process
+        return (type(self), (self.table_file,))
+
+    def __len__(self):
+        return self.entry_count
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [
+                self.get_entry(index) for index in range(*position.indices(len(self)))
+            ]
+
+        return self.get_entry(position)
+
+    def get_line(self, position: int) -> str:
+        line = self.content[self.starts[position] : self.ends[position]]
+        return line.decode(ENCODING).strip()
+
+    def get_entry(self, position: int) -> str:
+        return self.get_line(position)
+
+    def get_population(self, count: int):
+        return self
+
+    def take(self, indices):
+        """Entries at each of the indices, in the same order"""
+        get_entry = self.get_entry
+        return [get_entry(index) for index in indices]
+
+    def has_marked_entries(self):
+        return len(self.marked_positions) > 0
+
+    def get_marked_entries(self):
+        """Entries with inline markers, without decoding the others"""
+        return [self.get_entry(position) for position in self.marked_positions]
+
+    def parse_weight(self, line: bytes):
+        """Weight of a stripped, non-comment line, or None to skip the line"""
+        return 1
+
+
+class MappedList(MappedTable):
+    """Memory-mapped list table, see `RandomTable`"""
+
+
+class MappedWeightedList(MappedTable):
+    """Memory-mapped weighted list, see `WeightedListTable`. Its index also
+    holds the cumulative weights of the entries, to draw them by bisection"""
+
+    stride = 3
+
+    def __init__(self, table_file):
+        super().__init__(table_file)
+
+        self.cumulative_weights = self.offsets[2 :: self.stride]
+        self.items = self
+        self.weights = MappedWeights(self.cumulative_weights)
+        self.sampler = CumulativeSampler(
+            self.cumulative_weights, self.total_weight, self.positive_count
+        )
+
+    def get_entry(self, position: int) -> str:
+        line = self.get_line(position)
+        split_line = line.split("\t")
+
+        if split_line[0].isdecimal():
+            return " ".join(split_line[1:])
+
+        return line
+
+    def parse_weight(self, line: bytes):
+        split_line = line.split(b"\t")
+
+        first_column = split_line[0]
+        if not first_column.isascii():
+            first_column = first_column.decode(ENCODING)
+            if first_column.isdecimal():
+                return int(first_column)
+        elif first_column.isdigit():
+            return int(first_column)
+
+        return 1 if len(split_line) == 1 else None
+
+
+class MappedWeights(Sequence):
+    """Weight of each entry, from the cumulative weights"""
+
+    def __init__(self, cumulative_weights):
+        self.cumulative_weights = cumulative_weights
+
+    def __len__(self):
+        return len(self.cumulative_weights)
+
+    def __getitem__(self, position: int) -> int:
+        if position < 0:
+            position = position + len(self.cumulative_weights)
+
+        previous = self.cumulative_weights[position - 1] if position > 0 else 0
+        return self.cumulative_weights[position] - previous
+
+    def __array__(self, dtype=None, copy=None):
+        # NumPy reads the weights from the index, without a call per entry
+        import numpy
+
+        return numpy.diff(
+            numpy.asarray(self.cumulative_weights, dtype=dtype), prepend=0
+        )
+
+
+def map_file(table_file):
+    with table_file.open("rb") as table_content:
+        if os.fstat(table_content.fileno()).st_size == 0:
+            return b""
+
+        return mmap.mmap(table_content.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def open_index(table_file, content, mapped_table):
+    """Index of the table file, read from the cache folder, or built if the
+    table changed since it was indexed"""
+    file_stamp = tablecache.get_file_stamp(table_file)
+
+    if not tablecache.enabled:
+        return build_temporary_index(content, mapped_table, file_stamp)
+
+    index_file = tablecache.get_index_file(table_file, type(mapped_table).__name__)
+    index = read_index(index_file, file_stamp)
+    if index is not None:
+        return index
+
+    try:
+        index_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written to a temporary file first, so concurrent invocations never
+        # read a partial index
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=index_file.parent)
+    except OSError:
+        return build_temporary_index(content, mapped_table, file_stamp)
+
+    try:
+        with os.fdopen(file_descriptor, "w+b") as index_output:
+            write_index(content, mapped_table, file_stamp, index_output)
+            index = map_file_object(index_output)
+        os.replace(temporary_path, index_file)
+    except OSError:
+        os.unlink(temporary_path)
+        raise
+
+    return index
+
+
+def build_temporary_index(content, mapped_table, file_stamp):
+    """Index that only lasts as long as it's mapped, when there's no cache"""
+    with tempfile.TemporaryFile() as index_output:
+        write_index(content, mapped_table, file_stamp, index_output)
+        return map_file_object(index_output)
+
+
+def read_index(index_file, file_stamp):
+    try:
+        with index_file.open("rb") as index_content:
+            index = map_file_object(index_content)
+    except (OSError, ValueError):
+        return None
+
+    if len(index) < INDEX_HEADER.size:
+        return None
+
+    magic, mtime, size, *_ = INDEX_HEADER.unpack_from(index)
+    if magic != INDEX_MAGIC or (mtime, size) != tuple(file_stamp):
+        return None
+
+    stats.count("table_index_hits")
+    return index
+
+
+def map_file_object(file_object):
+    file_object.flush()
+    return mmap.mmap(file_object.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def write_index(content, mapped_table, file_stamp, index_output):
+    stats.count("table_indexes_built")
+
+    entry_count = 0
+    total_weight = 0
+    positive_count = 0
+    offsets = array("q")
+    marked_positions = array("q")
+
+    index_output.write(bytes(INDEX_HEADER.size))
+    for start, end, weight, is_marked in iter_entry_offsets(content, mapped_table):
+        if is_marked:
+            marked_positions.append(entry_count)
+
+        entry_count = entry_count + 1
+        total_weight = total_weight + weight
+        if weight > 0:
+            positive_count = positive_count + 1
+
+        offsets.append(start)
+        offsets.append(end)
+        if mapped_table.stride == 3:
+            offsets.append(total_weight)
+
+        if len(offsets) >= INDEX_WRITE_SIZE:
+            offsets.tofile(index_output)
+            offsets = array("q")
+
+    offsets.tofile(index_output)
+    marked_positions.tofile(index_output)
+
+    index_output.seek(0)
+    index_output.write(
+        INDEX_HEADER.pack(
+            INDEX_MAGIC,
+            *file_stamp,
+            entry_count,
+            total_weight,
+            positive_count,
+            len(marked_positions),
+        )
+    )
+
+
+def iter_entry_offsets(content, mapped_table):
+    """Start and end offsets of the stripped lines of the table that are
+    entries (not blank, not comments), along with their weight and whether
+    they have inline markers"""
+    content_size = len(content)
+    scan_start = 0
+
+    while scan_start < content_size:
+        scan_end = content.find(b"\n", min(scan_start + INDEX_SCAN_SIZE, content_size))
+        if scan_end == -1:
+            scan_end = content_size
+
+        line_start = scan_start
+        for line in content[scan_start:scan_end].split(b"\n"):
+            stripped_line = line.strip()
+
+            if stripped_line and not stripped_line.startswith(BYTES_COMMENT_PREFIXES):
+                weight = mapped_table.parse_weight(stripped_line)
+                if weight is not None:
+                    start = line_start + len(line) - len(line.lstrip())
+                    yield (
+                        start,
+                        start + len(stripped_line),
+                        weight,
+                        BYTES_INLINE_MARKER in stripped_line,
+                    )
+
+            line_start = line_start + len(line) + 1
+
+        scan_start = scan_end + 1
@@ -1,6 +1,8 @@
+from array import array
+from fractions import Fraction
 from types import SimpleNamespace
-import table.baseloader as table_loader
-import random
+from . import baseloader as table_loader
+from .sampler import AliasSampler, sample_without_replacement
 
 
 class NumberedListTable(table_loader.BaseTableLoader):
@@ -15,41 +17,50 @@ class NumberedListTable(table_loader.BaseTableLoader):
         super().__init__(table_data, count, exclusive, clamp, dice_formula)
 
     def load_table(self, table_data):
-        results = table_loader.get_table_lines(table_data, strip_lines=True)
-
         table_items = []
-        table_weights = []
-        for line in results:
-            if not line or table_loader.is_line_comment(line):
-                continue
-
+        table_weights = array("q")
+        for line in table_loader.iter_table_entries(table_data):
             line_weight, line_item = get_line_weight(line)
             table_weights.append(line_weight)
             table_items.append(line_item)
 
         table = SimpleNamespace()
         table.weights = table_weights
-        table.items = table_items
+        table.items = table_loader.EntryColumn(table_items)
+        table.sampler = AliasSampler(table_weights)
         return table
 
-    def get_results(self):
-        count = self.get_rolled_count()
-
+    def roll_results(self, count: int):
         if self.roll_config.exclusive:
-            return random.sample(
-                self.table.items,
-                counts=self.table.weights,
-                k=min(count, sum(self.table.weight)),
-            )
+            indices = sample_without_replacement(self.table.weights, count)
+            return self.table.items.take(indices)
         else:
-            return random.choices(
-                self.table.items,
-                weights=self.table.weights,
-                k=count,
-            )
+            return self.table.items.take(self.table.sampler.sample(count))
 
     def table_length(self):
-        return sum(self.table.weights)
+        return self.table.sampler.total_weight
+
+    def get_entries(self):
+        return self.table.items.get_marked_entries()
+
+    def find_inline_markers(self):
+        return self.table.items.has_marked_entries()
+
+    def get_outcome_weights(self):
+        if self.roll_config.exclusive:
+            return None
+
+        return self.table.items, self.table.weights
+
+    def get_distribution(self):
+        total_weight = self.table.sampler.total_weight
+        if total_weight <= 0:
+            return []
+
+        return table_loader.merge_distribution(
+            (item, Fraction(weight, total_weight))
+            for item, weight in zip(self.table.items, self.table.weights)
+        )
 
 
 def get_line_weight(line):
@@ -63,5 +74,11 @@ def get_line_weight(line):
 
     if len(line_numbers) == 1:
         return 1, split_line[1]
-    else:
-        return int(line_numbers[1]) - int(line_numbers[1]) + 1, split_line[1]
+
+    low, high = int(line_numbers[0]), int(line_numbers[1])
+
+    # Percentile tables write 100 as "00" (e.g. "98-00")
+    if high < low:
+        high = high + 10 ** len(line_numbers[1])
+
+    return high - low + 1, split_line[1]
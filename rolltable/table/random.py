@@ -1,6 +1,8 @@
-import random
-import dice
-import table.baseloader as table_loader
+from .. import rng
+from .. import stats
+from fractions import Fraction
+from .. import diceformula
+from . import baseloader as table_loader
 
 
 class RandomTable(table_loader.BaseTableLoader):
@@ -14,9 +16,7 @@ class RandomTable(table_loader.BaseTableLoader):
     ):
         super().__init__(table_data, count, exclusive, is_result_clamped, dice_formula)
 
-    def get_results(self):
-        count = self.get_rolled_count()
-
+    def roll_results(self, count: int):
         if self.roll_config.formula:
             return self.get_formula_result(count)
 
@@ -26,16 +26,20 @@ class RandomTable(table_loader.BaseTableLoader):
         return self.get_random_results(count)
 
     def get_exclusive_results(self, count: int):
-        return random.sample(self.table, k=min(count, len(self.table)))
+        entries = self.table.get_population(count)
+        return rng.get().sample(entries, k=min(count, len(entries)))
 
     def get_random_results(self, count: int):
-        return random.choices(self.table, k=count)
+        return rng.get().choices(self.table.get_population(count), k=count)
 
     def get_formula_result(self, count: int):
+        roll_formula = diceformula.compile_formula(f"{self.roll_config.formula}")
+        stats.count("dice_rolls", count)
+
         if self.roll_config.clamp:
             rolled_indices = [
                 clamp(
-                    int(dice.roll(f"{self.roll_config.formula}")) - 1,
+                    roll_formula.roll() - 1,
                     0,
                     len(self.table) - 1,
                 )
@@ -44,9 +48,7 @@ class RandomTable(table_loader.BaseTableLoader):
             if self.roll_config.exclusive:
                 rolled_indices = set(rolled_indices)
         else:
-            rolled_indices = [
-                int(dice.roll(f"{self.roll_config.formula}")) - 1 for _ in range(count)
-            ]
+            rolled_indices = [roll_formula.roll() - 1 for _ in range(count)]
 
             if self.roll_config.exclusive:
                 rolled_indices = set(rolled_indices)
@@ -55,14 +57,53 @@ class RandomTable(table_loader.BaseTableLoader):
 
         return results
 
+    def get_entries(self):
+        return self.table.get_marked_entries()
+
+    def find_inline_markers(self):
+        return self.table.has_marked_entries()
+
+    def get_outcome_weights(self):
+        if self.roll_config.exclusive:
+            return None
+
+        if not self.roll_config.formula:
+            return self.table, None
+
+        distribution = self.get_distribution()
+        return (
+            table_loader.EntryColumn(entry for entry, _ in distribution),
+            [float(probability) for _, probability in distribution],
+        )
+
+    def get_distribution(self):
+        if not self.table:
+            return []
+
+        if not self.roll_config.formula:
+            return table_loader.merge_distribution(
+                (line, Fraction(1, len(self.table))) for line in self.table
+            )
+
+        roll_formula = diceformula.compile_formula(f"{self.roll_config.formula}")
+
+        entry_probabilities = []
+        for value, probability in roll_formula.distribution().items():
+            index = value - 1
+            if self.roll_config.clamp:
+                index = clamp(index, 0, len(self.table) - 1)
+
+            entry_probabilities.append((self.table[index], probability))
+
+        return table_loader.merge_distribution(entry_probabilities)
+
     def load_table(self, table_data):
-        table_content = table_loader.get_table_lines(table_data, strip_lines=True)
-        table = [
-            line
-            for line in table_content
-            if line and not table_loader.is_line_comment(line)
-        ]
-        return table
+        return table_loader.EntryColumn(table_loader.iter_table_entries(table_data))
+
+    def map_table(self, table_file):
+        from .mappedfile import MappedList
+
+        return MappedList(table_file)
 
 
 def clamp(value, min_value, max_value):
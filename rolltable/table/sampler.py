@@ -0,0 +1,236 @@
+from .. import rng
+from array import array
+from bisect import bisect_right, insort
+
+
+class AliasSampler:
+    """Vose alias table over a list of weights: built once when the table is
+    loaded, then each draw is a constant-time lookup"""
+
+    def __init__(self, weights):
+        self.total_weight = sum(weights)
+        self.probabilities = array("d", [0.0]) * len(weights)
+        self.aliases = array("q", range(len(weights)))
+
+        if not weights or self.total_weight <= 0:
+            return
+
+        entry_count = len(weights)
+        scaled = [weight * entry_count / self.total_weight for weight in weights]
+
+        small = [index for index, value in enumerate(scaled) if value < 1]
+        large = [index for index, value in enumerate(scaled) if value >= 1]
+
+        while small and large:
+            small_index = small.pop()
+            large_index = large.pop()
+
+            self.probabilities[small_index] = scaled[small_index]
+            self.aliases[small_index] = large_index
+
+            scaled[large_index] = scaled[large_index] + scaled[small_index] - 1
+            if scaled[large_index] < 1:
+                small.append(large_index)
+            else:
+                large.append(large_index)
+
+        # Leftovers are only there because of float rounding, they're all ~1
+        for index in large + small:
+            self.probabilities[index] = 1.0
+
+    def __len__(self):
+        return len(self.probabilities)
+
+    def check_sampleable(self):
+        if not self.probabilities:
+            raise IndexError("Cannot choose from an empty table")
+
+        if self.total_weight <= 0:
+            raise ValueError("Total of weights must be greater than zero")
+
+    def draw(self) -> int:
+        self.check_sampleable()
+
+        scaled_roll = rng.get().random() * len(self.probabilities)
+        index = int(scaled_roll)
+
+        if scaled_roll - index < self.probabilities[index]:
+            return index
+
+        return self.aliases[index]
+
+    def sample(self, k: int):
+        self.check_sampleable()
+
+        entry_count = len(self.probabilities)
+        probabilities = self.probabilities
+        aliases = self.aliases
+
+        indices = []
+        for uniform_roll in rng.get().randoms(k):
+            scaled_roll = uniform_roll * entry_count
+            index = int(scaled_roll)
+            indices.append(
+                index if scaled_roll - index < probabilities[index] else aliases[index]
+            )
+
+        return indices
+
+
+class CumulativeSampler:
+    """Draws entries by bisection over their cumulative weights, which can be
+    any sequence, e.g. one read from a memory-mapped index: nothing is built
+    when the table is loaded, and each draw is O(log n)"""
+
+    # Over this many distinct draws, a WeightTree of every weight is cheaper
+    # than skipping the entries already drawn at each draw
+    DISTINCT_DRAW_LIMIT = 1024
+
+    def __init__(self, cumulative_weights, total_weight: int, positive_count: int):
+        self.cumulative_weights = cumulative_weights
+        self.total_weight = total_weight
+        self.positive_count = positive_count
+
+    def __len__(self):
+        return len(self.cumulative_weights)
+
+    def check_sampleable(self):
+        if not len(self.cumulative_weights):
+            raise IndexError("Cannot choose from an empty table")
+
+        if self.total_weight <= 0:
+            raise ValueError("Total of weights must be greater than zero")
+
+    def sample(self, k: int):
+        self.check_sampleable()
+
+        cumulative_weights = self.cumulative_weights
+        total_weight = self.total_weight
+
+        return [
+            bisect_right(cumulative_weights, int(uniform_roll * total_weight))
+            for uniform_roll in rng.get().randoms(k)
+        ]
+
+    def sample_distinct(self, k: int):
+        """Same draws as `sample_without_replacement`, without reading every
+        weight as long as few entries are drawn"""
+        draw_count = min(k, self.positive_count)
+        if draw_count > self.DISTINCT_DRAW_LIMIT:
+            return sample_without_replacement(self.get_weights(), k)
+
+        cumulative_weights = self.cumulative_weights
+        generator = rng.get()
+
+        # Cumulative weight before each drawn entry and its weight, in table
+        # order: a draw among the remaining entries skips over them
+        drawn = []
+        remaining_weight = self.total_weight
+
+        indices = []
+        for _ in range(draw_count):
+            target = generator.randrange(remaining_weight)
+            for weight_start, weight in drawn:
+                if weight_start > target:
+                    break
+                target = target + weight
+
+            index = bisect_right(cumulative_weights, target)
+            weight_start = cumulative_weights[index - 1] if index > 0 else 0
+            weight = cumulative_weights[index] - weight_start
+
+            insort(drawn, (weight_start, weight))
+            remaining_weight = remaining_weight - weight
+            indices.append(index)
+
+        return indices
+
+    def get_weights(self):
+        weights = []
+        previous = 0
+        for cumulative_weight in self.cumulative_weights:
+            weights.append(cumulative_weight - previous)
+            previous = cumulative_weight
+
+        return weights
+
+
+class WeightTree:
+    """Fenwick tree over integer weights, used to draw entries without
+    replacement: finding and removing an entry are both O(log n)"""
+
+    def __init__(self, weights):
+        self.size = len(weights)
+        self.total_weight = 0
+        self.tree = [0] * (self.size + 1)
+
+        for index, weight in enumerate(weights, start=1):
+            self.total_weight = self.total_weight + weight
+            self.tree[index] = self.tree[index] + weight
+
+            parent = index + (index & -index)
+            if parent <= self.size:
+                self.tree[parent] = self.tree[parent] + self.tree[index]
+
+    def add(self, index: int, delta: int):
+        self.total_weight = self.total_weight + delta
+
+        position = index + 1
+        while position <= self.size:
+            self.tree[position] = self.tree[position] + delta
+            position = position + (position & -position)
+
+    def find(self, target: int) -> int:
+        """Index of the entry covering `target`, a number in [0, total_weight)"""
+        position = 0
+        step = 1 << self.size.bit_length()
+
+        while step:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= target:
+                position = next_position
+                target = target - self.tree[next_position]
+            step = step >> 1
+
+        return position
+
+
+def sample_without_replacement(weights, k: int):
+    """Draws up to `k` distinct entry indices, each with a chance proportional
+    to its weight among the entries not drawn yet"""
+    tree = WeightTree(weights)
+    generator = rng.get()
+    draw_count = min(k, sum(1 for weight in weights if weight > 0))
+
+    indices = []
+    for _ in range(draw_count):
+        index = tree.find(generator.randrange(tree.total_weight))
+        tree.add(index, -weights[index])
+        indices.append(index)
+
+    return indices
+
+
+def sample_counts(entry_count: int, count: int, weights=None):
+    """Number of times each entry comes up in `count` independent draws, each
+    with a chance proportional to its weight (the same chance without
+    weights), drawn from their multinomial distribution at once: it takes
+    O(entries) time whatever the count. None if NumPy isn't installed or no
+    entry can be drawn"""
+    generator = rng.get().get_numpy_generator()
+    if generator is None or entry_count == 0:
+        return None
+
+    import numpy
+
+    if weights is None:
+        probabilities = numpy.full(entry_count, 1 / entry_count)
+    else:
+        probabilities = numpy.asarray(weights, dtype=numpy.float64)
+        total_weight = probabilities.sum()
+        if total_weight <= 0:
+            return None
+
+        probabilities = probabilities / total_weight
+
+    return generator.multinomial(count, probabilities)
@@ -1,6 +1,5 @@
 from pathlib import Path
-import table.baseloader as table_loader
-import dice
+from . import baseloader as table_loader
 
 
 class OutputTemplate(table_loader.BaseTableLoader):
@@ -10,7 +9,8 @@ class OutputTemplate(table_loader.BaseTableLoader):
     def load_table(self, table_data):
         return [table_data]
 
-    def get_results(self):
-        print_count = int(dice.roll(self.roll_config.count))
+    def get_entries(self):
+        return self.table
 
-        return [line for line in self.table for _ in range(print_count)]
+    def roll_results(self, count: int):
+        return [line for line in self.table for _ in range(count)]
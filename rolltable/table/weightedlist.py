@@ -1,6 +1,8 @@
-import random
+from array import array
+from fractions import Fraction
 from types import SimpleNamespace
-import table.baseloader as table_loader
+from . import baseloader as table_loader
+from .sampler import AliasSampler, sample_without_replacement
 
 
 class WeightedListTable(table_loader.BaseTableLoader):
@@ -9,34 +11,45 @@ class WeightedListTable(table_loader.BaseTableLoader):
     ):
         super().__init__(table_data, count, exclusive, clamp, dice_formula)
 
-    def get_results(self):
-        count = self.get_rolled_count()
-
+    def roll_results(self, count: int):
         if self.roll_config.exclusive:
-            return random.sample(
-                self.table.items,
-                counts=self.table.weights,
-                k=min(count, sum(self.table.weight)),
-            )
+            if self.is_mapped:
+                indices = self.table.sampler.sample_distinct(count)
+            else:
+                indices = sample_without_replacement(self.table.weights, count)
+            return self.table.items.take(indices)
         else:
-            return random.choices(
-                self.table.items,
-                weights=self.table.weights,
-                k=count,
-            )
+            return self.table.items.take(self.table.sampler.sample(count))
 
     def table_length(self):
-        return sum(self.table.weights)
+        return self.table.sampler.total_weight
 
-    def load_table(self, table_data):
-        table_content = table_loader.get_table_lines(table_data, strip_lines=True)
+    def get_entries(self):
+        return self.table.items.get_marked_entries()
 
-        table_items = []
-        table_weights = []
-        for line in table_content:
-            if not line or table_loader.is_line_comment(line):
-                continue
+    def find_inline_markers(self):
+        return self.table.items.has_marked_entries()
+
+    def get_outcome_weights(self):
+        if self.roll_config.exclusive:
+            return None
+
+        return self.table.items, self.table.weights
 
+    def get_distribution(self):
+        total_weight = self.table.sampler.total_weight
+        if total_weight <= 0:
+            return []
+
+        return table_loader.merge_distribution(
+            (item, Fraction(weight, total_weight))
+            for item, weight in zip(self.table.items, self.table.weights)
+        )
+
+    def load_table(self, table_data):
+        table_items = []
+        table_weights = array("q")
+        for line in table_loader.iter_table_entries(table_data):
             split_line = line.split("\t")
 
             potential_weight = split_line[0]
@@ -54,5 +67,11 @@ class WeightedListTable(table_loader.BaseTableLoader):
 
         table = SimpleNamespace()
         table.weights = table_weights
-        table.items = table_items
+        table.items = table_loader.EntryColumn(table_items)
+        table.sampler = AliasSampler(table_weights)
         return table
+
+    def map_table(self, table_file):
+        from .mappedfile import MappedWeightedList
+
+        return MappedWeightedList(table_file)
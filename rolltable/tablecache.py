@@ -0,0 +1,182 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+from .__version__ import __version__
+from . import stats
+
+# Bumped whenever the parsed form of a table changes shape
+CACHE_FORMAT_VERSION = 3
+
+DEFAULT_CACHE_SIZE = 64 * 1024 * 1024
+
+enabled = os.environ.get("ROLLTABLE_CACHE", "1") != "0"
+
+# Parsed tables kept in memory by long-running processes, keyed by path and
+# format along with the file stamp they were parsed from
+memory_cache = None
+# Tables may be parsed by the threads prefetching them
+memory_cache_lock = threading.Lock()
+
+
+def get_cache_folder() -> Path:
+    if "ROLLTABLE_CACHE_DIR" in os.environ:
+        return Path(os.environ["ROLLTABLE_CACHE_DIR"]).expanduser()
+
+    cache_home = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(cache_home) / "rolltable"
+
+
+def get_cache_size_limit() -> int:
+    try:
+        return int(os.environ.get("ROLLTABLE_CACHE_SIZE", DEFAULT_CACHE_SIZE))
+    except ValueError:
+        return DEFAULT_CACHE_SIZE
+
+
+def get_file_stamp(table_file: Path):
+    stat = table_file.stat()
+    return stat.st_mtime_ns, stat.st_size
+
+
+def get_cache_file(table_file: Path, table_format: str, file_stamp) -> Path:
+    """Cache entries are keyed by the table's identity and its content stamp,
+    so an edited table simply misses and its old entry ages out"""
+    key = "\0".join(
+        [
+            str(table_file),
+            *[str(stamp) for stamp in file_stamp],
+            table_format,
+            __version__,
+            str(CACHE_FORMAT_VERSION),
+        ]
+    )
+    return get_cache_folder() / f"{hashlib.sha1(key.encode()).hexdigest()}.pickle"
+
+
+def get_index_file(table_file: Path, index_kind: str) -> Path:
+    """Line indexes of memory-mapped tables hold the stamp of the file they
+    index, and are rebuilt in place when it changes. They aren't counted in
+    the cache size, as they can't be rebuilt as cheaply as a parsed table"""
+    key = "\0".join([str(table_file), index_kind])
+    return get_cache_folder() / f"{hashlib.sha1(key.encode()).hexdigest()}.index"
+
+
+def keep_in_memory():
+    """Also keeps parsed tables in this process, for long-running processes"""
+    global memory_cache
+
+    if memory_cache is None:
+        memory_cache = dict()
+
+
+def is_active():
+    return enabled or memory_cache is not None
+
+
+def remember(table_file: Path, table_format: str, file_stamp, parsed_table):
+    if memory_cache is not None:
+        with memory_cache_lock:
+            memory_cache[(table_file, table_format)] = (file_stamp, parsed_table)
+
+
+def load(table_file: Path, table_format: str):
+    """Parsed table content from the cache, or None on a miss"""
+    with stats.phase("cache"):
+        parsed_table = load_entry(table_file, table_format)
+
+    stats.count("table_cache_misses" if parsed_table is None else "table_cache_hits")
+    return parsed_table
+
+
+def load_entry(table_file: Path, table_format: str):
+    try:
+        file_stamp = get_file_stamp(table_file)
+    except OSError:
+        return None
+
+    if memory_cache is not None:
+        stamp, parsed_table = memory_cache.get((table_file, table_format), (None, None))
+        if stamp == file_stamp:
+            return parsed_table
+
+    if not enabled:
+        return None
+
+    try:
+        cache_file = get_cache_file(table_file, table_format, file_stamp)
+        with cache_file.open("rb") as cache_content:
+            parsed_table = pickle.load(cache_content)
+        os.utime(cache_file)
+    except OSError:
+        return None
+    except Exception:
+        # A corrupted entry can fail to load in about any way. It's removed,
+        # and the table parsed again
+        cache_file.unlink(missing_ok=True)
+        return None
+
+    remember(table_file, table_format, file_stamp, parsed_table)
+    return parsed_table
+
+
+def store(table_file: Path, table_format: str, parsed_table):
+    with stats.phase("cache"):
+        store_entry(table_file, table_format, parsed_table)
+
+
+def store_entry(table_file: Path, table_format: str, parsed_table):
+    try:
+        file_stamp = get_file_stamp(table_file)
+    except OSError:
+        return
+
+    remember(table_file, table_format, file_stamp, parsed_table)
+
+    if not enabled:
+        return
+
+    try:
+        cache_file = get_cache_file(table_file, table_format, file_stamp)
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+
+        # Written to a temporary file first, so concurrent invocations never
+        # read a partial entry
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=cache_file.parent)
+    except OSError:
+        return
+
+    try:
+        with os.fdopen(file_descriptor, "wb") as cache_content:
+            pickle.dump(parsed_table, cache_content, pickle.HIGHEST_PROTOCOL)
+        os.replace(temporary_path, cache_file)
+    except (OSError, pickle.PicklingError, TypeError, AttributeError):
+        Path(temporary_path).unlink(missing_ok=True)
+        return
+
+    evict(get_cache_size_limit())
+
+
+def evict(size_limit: int):
+    """Removes the least recently used entries until the cache fits"""
+    try:
+        entries = [
+            (entry.stat().st_mtime, entry.stat().st_size, entry)
+            for entry in get_cache_folder().glob("*.pickle")
+        ]
+    except OSError:
+        return
+
+    total_size = sum(size for _, size, _ in entries)
+
+    for _, size, entry in sorted(entries, key=lambda cached: cached[0]):
+        if total_size <= size_limit:
+            break
+
+        try:
+            entry.unlink()
+            total_size = total_size - size
+        except OSError:
+            continue
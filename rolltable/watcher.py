@@ -0,0 +1,185 @@
+import ctypes
+import ctypes.util
+import os
+import struct
+import weakref
+from pathlib import Path
+
+# Events of a watched folder that may change one of its table files. Editors
+# often save by writing another file and renaming it over the table, so the
+# folders are watched rather than the files themselves
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_ATTRIB
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+    | IN_MOVE_SELF
+    | IN_ONLYDIR
+)
+
+# Watch descriptor, mask, cookie and name length, followed by the name
+INOTIFY_EVENT = struct.Struct("iIII")
+
+INOTIFY_READ_SIZE = 1 << 16
+
+
+def get_file_identity(table_file: Path):
+    """Modification time, size and inode of the file, or None if it doesn't
+    exist. A table whose identity is the same hasn't been edited"""
+    try:
+        stat = table_file.stat()
+    except OSError:
+        return None
+
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+
+class StatWatcher:
+    """Tells which of the watched table files changed since they were
+    watched, by comparing their identity with the one they had then. Costs a
+    `stat` per watched file on each check"""
+
+    def __init__(self):
+        self.identities = dict()
+
+    def watch(self, table_file: Path):
+        """Records the identity of the file, before it's read"""
+        self.identities[table_file] = get_file_identity(table_file)
+
+    def get_changed_files(self):
+        return self.check_files(list(self.identities))
+
+    def check_files(self, table_files):
+        changed_files = set()
+
+        for table_file in table_files:
+            identity = get_file_identity(table_file)
+            if identity != self.identities.get(table_file):
+                self.identities[table_file] = identity
+                changed_files.add(table_file)
+
+        return changed_files
+
+
+class InotifyWatcher(StatWatcher):
+    """Same as `StatWatcher`, but only the files that inotify reported events
+    for are checked, so a check costs a single `read` when nothing changed.
+    The files of the folders that can't be watched are always checked, and
+    every file is checked when events were lost"""
+
+    def __init__(self):
+        super().__init__()
+
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.inotify_fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.inotify_fd < 0:
+            raise OSError(ctypes.get_errno(), "Can't initialize inotify")
+        weakref.finalize(self, os.close, self.inotify_fd)
+
+        self.watched_folders = dict()
+        self.folder_watches = dict()
+        self.unwatched_folders = set()
+        self.check_all = False
+
+    def watch(self, table_file: Path):
+        super().watch(table_file)
+
+        folder = table_file.parent
+        if folder in self.watched_folders:
+            return
+
+        watch_descriptor = self.libc.inotify_add_watch(
+            self.inotify_fd, os.fsencode(folder), WATCH_MASK
+        )
+        if watch_descriptor < 0:
+            # E.g. over the limit of watches, or a missing folder
+            self.unwatched_folders.add(folder)
+            return
+
+        self.unwatched_folders.discard(folder)
+        self.watched_folders[folder] = watch_descriptor
+        self.folder_watches[watch_descriptor] = folder
+
+    def get_changed_files(self):
+        touched_files = set()
+
+        for watch_descriptor, mask, name in self.read_events():
+            if mask & IN_Q_OVERFLOW:
+                self.check_all = True
+                continue
+
+            folder = self.folder_watches.get(watch_descriptor)
+            if folder is None:
+                continue
+
+            if mask & IN_IGNORED:
+                # The folder is gone, until a table in it is loaded again
+                del self.folder_watches[watch_descriptor]
+                del self.watched_folders[folder]
+                self.unwatched_folders.add(folder)
+            elif name:
+                touched_files.add(folder / os.fsdecode(name))
+
+        if self.check_all:
+            self.check_all = False
+            return self.check_files(list(self.identities))
+
+        if not touched_files and not self.unwatched_folders:
+            return set()
+
+        return self.check_files(
+            [
+                table_file
+                for table_file in self.identities
+                if table_file in touched_files
+                or table_file.parent in self.unwatched_folders
+            ]
+        )
+
+    def read_events(self):
+        while True:
+            try:
+                data = os.read(self.inotify_fd, INOTIFY_READ_SIZE)
+            except BlockingIOError:
+                return
+
+            position = 0
+            while position < len(data):
+                watch_descriptor, mask, _, name_length = INOTIFY_EVENT.unpack_from(
+                    data, position
+                )
+                position = position + INOTIFY_EVENT.size
+                name = data[position : position + name_length].rstrip(b"\0")
+                position = position + name_length
+
+                yield watch_descriptor, mask, name
+
+
+def create_watcher():
+    """Watcher through inotify where it's available, or through `stat`, which
+    also sees the edits made from other machines on network folders. Set
+    ROLLTABLE_WATCH=stat to always use `stat`"""
+    if os.environ.get("ROLLTABLE_WATCH", "inotify") != "stat":
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError, TypeError):
+            pass
+
+    return StatWatcher()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Measures the cold start of rolltable: wall-clock time of whole invocations,
+and the cumulative import time of the top-level modules from `-X importtime`.
+
+Usage: scripts/bench-startup.py [--runs N] [--output FILE] [COMMAND...]
+The command defaults to rolling the example list table with the sources."""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_FOLDER = Path(__file__).resolve().parent.parent
+DEFAULT_COMMAND = [
+    sys.executable,
+    str(ROOT_FOLDER / "rolltable" / "__main__.py"),
+    str(ROOT_FOLDER / "examples" / "example.table"),
+]
+
+
+def time_invocations(command, runs: int, environment):
+    durations = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, env=environment, stdout=subprocess.DEVNULL, check=True)
+        durations.append(time.perf_counter() - start)
+
+    return durations
+
+
+def get_import_times(command, environment):
+    """Cumulative import time in milliseconds of each top-level import"""
+    completed = subprocess.run(
+        command,
+        env={**environment, "PYTHONPROFILEIMPORTTIME": "1"},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+
+    import_times = dict()
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+
+        _, cumulative, module = line[len("import time:") :].split("|")
+        # Nested imports are indented under the module importing them
+        if module.startswith("  "):
+            continue
+
+        import_times[module.strip()] = int(cumulative) / 1000
+
+    return import_times
+
+
+def get_parameters():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "-r", "--runs", type=int, default=20, help="Number of timed invocations"
+    )
+    parser.add_argument("-o", "--output", help="Also write the JSON report there")
+    parser.add_argument(
+        "--keep-cache",
+        action="store_true",
+        help="Keep the on-disk table cache enabled during the runs",
+    )
+    parser.add_argument(
+        "command", nargs=argparse.REMAINDER, help="Command to benchmark instead"
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = get_parameters()
+    command = args.command or DEFAULT_COMMAND
+
+    environment = dict(os.environ)
+    if not args.keep_cache:
+        environment["ROLLTABLE_CACHE"] = "0"
+
+    # One untimed run, so every run reads the files from the page cache
+    time_invocations(command, 1, environment)
+    durations = time_invocations(command, args.runs, environment)
+    import_times = get_import_times(command, environment)
+
+    report = {
+        "command": command,
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "wall_clock_ms": {
+            "median": round(statistics.median(durations) * 1000, 2),
+            "min": round(min(durations) * 1000, 2),
+            "max": round(max(durations) * 1000, 2),
+        },
+        "import_time_ms": {
+            "total": round(sum(import_times.values()), 2),
+            "modules": dict(
+                sorted(import_times.items(), key=lambda item: item[1], reverse=True)
+            ),
+        },
+    }
+
+    report_text = json.dumps(report, indent=2)
+    print(report_text)
+
+    if args.output:
+        Path(args.output).write_text(report_text + "\n")
+
+
+if __name__ == "__main__":
+    main()
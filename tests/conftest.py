@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rolltable import stats as rolltable_stats  # noqa: E402
+
+
+@pytest.fixture
+def stats(monkeypatch):
+    """`rolltable.stats`, with the measures enabled and reset for the test"""
+    monkeypatch.setattr(rolltable_stats, "enabled", False)
+    rolltable_stats.enable()
+    rolltable_stats.reset()
+    yield rolltable_stats
+    rolltable_stats.reset()
+
+
+@pytest.fixture
+def write_table():
+    """Writes a table file, with a later modification time than it had, even
+    on file systems with a coarse timestamp resolution"""
+
+    def write(table_file, text):
+        modification_time = table_file.stat().st_mtime_ns if table_file.exists() else 0
+        table_file.write_text(text)
+        if table_file.stat().st_mtime_ns <= modification_time:
+            os.utime(table_file, ns=(modification_time + 1, modification_time + 1))
+
+    return write
@@ -0,0 +1,66 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from rolltable.batch import RollSession
+
+LIST_TABLE = str(
+    Path(__file__).resolve().parent.parent / "examples" / "example-list-table.table"
+)
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROLLTABLE_CACHE_DIR", str(tmp_path))
+    return RollSession()
+
+
+def answer(session, spec):
+    return session.answer(json.dumps(spec))
+
+
+@pytest.mark.parametrize("table_filepath", ["-h", "--help", "--bogus", "-v"])
+def test_option_like_paths_are_table_paths(session, table_filepath):
+    response = answer(session, {"table_filepath": table_filepath, "id": 4})
+
+    assert response["id"] == 4
+    assert response["code"] == 1
+    assert "not found" in response["error"]
+
+
+@pytest.mark.parametrize(
+    "spec",
+    [
+        {"jobs": "2"},
+        {"seed": 1.5},
+        {"exclusive": "yes"},
+        {"format": "nope"},
+        {"join": ["a"]},
+        {"help": True},
+        {"stats": True},
+        {"unknown": 1},
+        {"table_filepath": 3},
+    ],
+)
+def test_invalid_options_are_per_request_errors(session, spec):
+    response = answer(session, {"table_filepath": LIST_TABLE, **spec})
+    assert response["code"] == 1
+
+    # The session goes on answering
+    assert "results" in answer(session, {"table_filepath": LIST_TABLE})
+
+
+def test_spec_rolls_like_command_line(session):
+    response = answer(
+        session,
+        {"table_filepath": LIST_TABLE, "count": 3, "seed": 2, "exclusive": True},
+    )
+    again = answer(
+        session,
+        {"table_filepath": LIST_TABLE, "count": "3", "seed": 2, "exclusive": True},
+    )
+
+    assert len(response["results"]) == 3
+    assert len(set(response["results"])) == 3
+    assert response == again
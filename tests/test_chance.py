@@ -0,0 +1,42 @@
+from collections import Counter
+
+import pytest
+
+from rolltable import rng
+from rolltable.table import chance
+from rolltable.table.chance import ChanceTable
+
+CHANCE_TABLE = "Item 1\t75\nItem 2\t50\nItem 3\t25\nItem 4\t10\n"
+
+# Over the batch threshold, so the sets are rolled as a NumPy batch
+SET_COUNT = 6000
+
+
+@pytest.mark.parametrize("dice_formula", [None, "2d50"])
+def test_batched_sets_match_entry_chances(dice_formula):
+    table = ChanceTable(CHANCE_TABLE, clamp=True, dice_formula=dice_formula)
+    rng.use("numpy", seed=73)
+
+    results = table.roll_results(SET_COUNT)
+    assert len(results) == SET_COUNT
+    entry_counts = Counter(entry for result in results for entry in result)
+
+    for entry, entry_chance in table.get_distribution()[:4]:
+        entry_chance = float(entry_chance)
+        deviation = 5 * (SET_COUNT * entry_chance * (1 - entry_chance)) ** 0.5
+        assert abs(entry_counts[entry] - SET_COUNT * entry_chance) <= deviation
+
+
+def test_batched_sets_repeat_with_a_seed(monkeypatch):
+    table = ChanceTable(CHANCE_TABLE)
+
+    rng.use("numpy", seed=79)
+    results = table.roll_results(SET_COUNT)
+
+    # Chunks of sets are drawn one after the other from the same stream
+    monkeypatch.setattr(chance, "BATCH_CHUNK_DICE", 100)
+    rng.use("numpy", seed=79)
+    assert table.roll_results(SET_COUNT) == results
+
+    # Entries keep their table order in a set
+    assert all(result == sorted(result) for result in results)
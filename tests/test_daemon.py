@@ -0,0 +1,86 @@
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+from rolltable import daemon
+
+
+@pytest.fixture
+def temporary_folder(tmp_path, monkeypatch):
+    monkeypatch.delenv("ROLLTABLE_SOCKET", raising=False)
+    monkeypatch.delenv("XDG_RUNTIME_DIR", raising=False)
+    monkeypatch.setattr(daemon.tempfile, "gettempdir", lambda: str(tmp_path))
+    return tmp_path
+
+
+def test_socket_is_in_a_private_folder(temporary_folder):
+    socket_path = daemon.get_default_socket_path()
+    folder = temporary_folder / f"rolltable-{os.getuid()}"
+
+    assert socket_path.parent == folder
+    assert folder.stat().st_mode & 0o777 == 0o700
+    assert daemon.get_default_socket_path() == socket_path
+
+
+def test_open_folder_is_refused(temporary_folder):
+    folder = temporary_folder / f"rolltable-{os.getuid()}"
+    folder.mkdir(mode=0o755)
+    folder.chmod(0o755)
+
+    with pytest.raises(RuntimeError):
+        daemon.get_default_socket_path()
+
+
+def test_linked_folder_is_refused(temporary_folder):
+    target = temporary_folder / "elsewhere"
+    target.mkdir(mode=0o700)
+    (temporary_folder / f"rolltable-{os.getuid()}").symlink_to(target)
+
+    with pytest.raises(RuntimeError):
+        daemon.get_default_socket_path()
+
+
+def test_runtime_folder_is_used_first(temporary_folder, monkeypatch):
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(temporary_folder / "run"))
+    assert daemon.get_default_socket_path() == (
+        temporary_folder / "run" / f"rolltable-{os.getuid()}.sock"
+    )
+
+
+@pytest.fixture
+def roll_server(tmp_path, monkeypatch):
+    monkeypatch.setattr(daemon.RollRequestHandler, "timeout", 0.2)
+    server = daemon.RollServer(tmp_path / "rolltable.sock")
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield tmp_path / "rolltable.sock"
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def send(socket_path, request):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(5)
+        client.connect(str(socket_path))
+        client.sendall(json.dumps(request).encode() + b"\n")
+
+        with client.makefile("rb") as response_stream:
+            return json.loads(response_stream.readline())
+
+
+def test_idle_connection_doesnt_hold_up_others(roll_server, tmp_path, capsys):
+    (tmp_path / "table.txt").write_text("only\n")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as idle_client:
+        idle_client.connect(str(roll_server))
+
+        response = send(roll_server, {"table_filepath": str(tmp_path / "table.txt")})
+        assert response == {"results": ["only"]}
+
+        # The idle connection was closed, without an error
+        assert idle_client.recv(1) == b""
+        assert capsys.readouterr().err == ""
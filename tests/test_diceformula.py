@@ -0,0 +1,84 @@
+import itertools
+from fractions import Fraction
+
+import dice
+import pytest
+
+from rolltable import diceformula, rng
+from rolltable.diceformula import NativeFormula
+
+KEEP_FORMULAE = [
+    "4d6h",
+    "4d6l",
+    "3d8h",
+    "2d10l",
+    "1d6h",
+    "4d6h2",
+    "4d6l1",
+    "5d4h3",
+    "3d6h5",
+    "4d6h-2",
+    "3d6l+4",
+]
+
+
+def get_total(value):
+    # `dice` returns the kept dice as a list when there's no modifier
+    return sum(value) if isinstance(value, list) else int(value)
+
+
+def brute_force_distribution(formula: NativeFormula):
+    counts = dict()
+    for rolls in itertools.product(range(1, formula.sides + 1), repeat=formula.amount):
+        rolls = sorted(rolls)
+        if formula.keep == "h":
+            rolls = rolls[formula.amount - formula.keep_count :]
+        elif formula.keep == "l":
+            rolls = rolls[: formula.keep_count]
+        total = sum(rolls) + formula.modifier
+        counts[total] = counts.get(total, 0) + 1
+
+    outcome_count = formula.sides**formula.amount
+    return {
+        total: Fraction(ways, outcome_count) for total, ways in sorted(counts.items())
+    }
+
+
+@pytest.mark.parametrize("formula", KEEP_FORMULAE)
+def test_keep_formula_is_native(formula):
+    assert isinstance(diceformula.parse_formula(formula), NativeFormula)
+
+
+@pytest.mark.parametrize("formula", ["4d6h", "4d6l", "1d6h", "3d8l"])
+def test_bare_keep_drops_one_die_like_dice(formula):
+    native = diceformula.parse_formula(formula)
+    assert native.keep_count == len(dice.roll_max(formula))
+
+
+@pytest.mark.parametrize("formula", KEEP_FORMULAE)
+def test_keep_support_matches_dice(formula):
+    assert diceformula.parse_formula(formula).support() == (
+        get_total(dice.roll_min(formula)),
+        get_total(dice.roll_max(formula)),
+    )
+
+
+@pytest.mark.parametrize("formula", KEEP_FORMULAE)
+def test_keep_rolls_match_dice_totals(formula):
+    native = diceformula.parse_formula(formula)
+    through_dice = diceformula.DiceFormula(formula)
+
+    rng.use("python", seed=7)
+    native_rolls = {native.roll() for _ in range(3000)}
+    dice_rolls = {through_dice.roll() for _ in range(3000)}
+
+    # Every total of these formulae has a probability over 1/3000
+    assert native_rolls == dice_rolls == set(native.distribution())
+
+
+@pytest.mark.parametrize("formula", KEEP_FORMULAE)
+def test_keep_distribution_matches_brute_force(formula):
+    native = diceformula.parse_formula(formula)
+
+    assert native.distribution() == brute_force_distribution(native)
+    assert sum(native.distribution().values()) == 1
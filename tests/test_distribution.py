@@ -0,0 +1,110 @@
+import itertools
+from collections import Counter
+from fractions import Fraction
+
+import pytest
+
+from rolltable import rng
+from rolltable.diceformula import dice_sum_counts, kept_dice_sum_counts
+from rolltable.table.numberedlist import NumberedListTable
+from rolltable.table.random import RandomTable
+from rolltable.table.weightedlist import WeightedListTable
+
+DICE = [(amount, sides) for amount in range(1, 5) for sides in (2, 3, 4, 6)]
+
+
+def count_sums(amount, sides, keep=None):
+    """Number of ways to reach each total, over every roll of the dice"""
+    counts = Counter()
+    for rolls in itertools.product(range(1, sides + 1), repeat=amount):
+        counts[sum(keep(sorted(rolls)) if keep else rolls)] += 1
+
+    return dict(counts)
+
+
+def get_roll_chances(amount, sides):
+    return {
+        total: Fraction(ways, sides**amount)
+        for total, ways in count_sums(amount, sides).items()
+    }
+
+
+@pytest.mark.parametrize("amount, sides", DICE)
+def test_dice_sums_match_enumeration(amount, sides):
+    assert dice_sum_counts(amount, sides) == count_sums(amount, sides)
+
+
+@pytest.mark.parametrize("amount, sides", DICE)
+@pytest.mark.parametrize("highest", [True, False])
+def test_kept_dice_sums_match_enumeration(amount, sides, highest):
+    for keep_count in range(1, amount + 1):
+        if highest:
+            expected = count_sums(amount, sides, lambda rolls: rolls[-keep_count:])
+        else:
+            expected = count_sums(amount, sides, lambda rolls: rolls[:keep_count])
+
+        assert kept_dice_sum_counts(amount, sides, keep_count, highest) == expected
+
+
+def test_list_distribution_without_formula():
+    table = RandomTable("a\nb\nc\na\n")
+
+    assert table.get_distribution() == [
+        ("a", Fraction(1, 2)),
+        ("b", Fraction(1, 4)),
+        ("c", Fraction(1, 4)),
+    ]
+
+
+@pytest.mark.parametrize(
+    "formula, amount, sides, clamp",
+    [("2d6", 2, 6, False), ("3d6", 3, 6, True), ("1d4", 1, 4, False)],
+)
+def test_list_distribution_with_formula(formula, amount, sides, clamp):
+    entries = [f"entry {index}" for index in range(1, 13)]
+    table = RandomTable("\n".join(entries))
+    table.set_flag("clamp", clamp)
+    table.set_flag("formula", formula)
+
+    expected = Counter()
+    for total, chance in get_roll_chances(amount, sides).items():
+        expected[entries[min(total, len(entries)) - 1]] += chance
+
+    distribution = dict(table.get_distribution())
+    assert distribution == dict(expected)
+    assert sum(distribution.values()) == 1
+
+
+def test_list_distribution_matches_rolls():
+    entries = [f"entry {index}" for index in range(1, 13)]
+    table = RandomTable("\n".join(entries))
+    table.set_flag("clamp", False)
+    table.set_flag("formula", "2d6")
+
+    rng.use("python", seed=29)
+    counts = Counter(table.roll_results(20000))
+
+    for entry, chance in table.get_distribution():
+        chance = float(chance)
+        deviation = 5 * (20000 * chance * (1 - chance)) ** 0.5 + 1
+        assert abs(counts[entry] - 20000 * chance) <= deviation, entry
+
+
+def test_weighted_list_distribution():
+    table = WeightedListTable("3\ta\n1\tb\n0\tc\n4\ta\n")
+
+    assert dict(table.get_distribution()) == {
+        "a": Fraction(7, 8),
+        "b": Fraction(1, 8),
+        "c": Fraction(0),
+    }
+
+
+def test_numbered_list_distribution():
+    table = NumberedListTable("1-50\tcommon\n51-95\tuncommon\n96-00\trare\n")
+
+    assert dict(table.get_distribution()) == {
+        "common": Fraction(1, 2),
+        "uncommon": Fraction(45, 100),
+        "rare": Fraction(5, 100),
+    }
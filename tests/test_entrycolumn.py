@@ -0,0 +1,76 @@
+import pickle
+
+import pytest
+
+from rolltable.table.baseloader import EntryColumn, iter_table_entries
+
+ENTRIES = [
+    [],
+    ["only"],
+    ["a", "b", "c"],
+    ["entrée", "x [[other.table]]", "", "tab\tseparated", "y [[1d6]] z"],
+    [f"entry {index}" for index in range(500)],
+]
+
+
+@pytest.mark.parametrize("entries", ENTRIES)
+def test_column_reads_like_a_list(entries):
+    column = EntryColumn(entries)
+
+    assert len(column) == len(entries)
+    assert list(column) == entries
+    assert [column[index] for index in range(len(entries))] == entries
+    assert [column[-index] for index in range(1, len(entries) + 1)] == [
+        entries[-index] for index in range(1, len(entries) + 1)
+    ]
+    assert column[1:-1] == entries[1:-1]
+    assert column[::2] == entries[::2]
+
+
+@pytest.mark.parametrize("entries", ENTRIES)
+def test_column_out_of_range(entries):
+    column = EntryColumn(entries)
+
+    with pytest.raises(IndexError):
+        column[len(entries)]
+    with pytest.raises(IndexError):
+        column[-len(entries) - 1]
+
+
+@pytest.mark.parametrize("entries", ENTRIES)
+def test_column_takes_entries_in_order(entries):
+    column = EntryColumn(entries)
+    indices = [index for index in range(len(entries)) for _ in range(2)][::-3]
+
+    assert column.take(indices) == [entries[index] for index in indices]
+    # Few entries are read one by one, most are split at once
+    assert column.take(indices[:1]) == [entries[index] for index in indices[:1]]
+
+
+@pytest.mark.parametrize("entries", ENTRIES)
+def test_column_population(entries):
+    column = EntryColumn(entries)
+
+    for count in (1, 10, 1000):
+        assert list(column.get_population(count)) == entries
+
+
+@pytest.mark.parametrize("entries", ENTRIES)
+def test_column_marked_entries(entries):
+    column = EntryColumn(entries)
+    marked_entries = [entry for entry in entries if "[[" in entry]
+
+    assert column.get_marked_entries() == marked_entries
+    assert column.has_marked_entries() == bool(marked_entries)
+
+
+@pytest.mark.parametrize("entries", ENTRIES)
+def test_column_survives_pickling(entries):
+    column = pickle.loads(pickle.dumps(EntryColumn(entries)))
+    assert list(column) == entries
+
+
+def test_single_pass_parser_skips_blank_lines_and_comments():
+    table_data = "\n  first  \n# comment\n\n\tsecond\n// other comment\nthird"
+
+    assert list(iter_table_entries(table_data)) == ["first", "second", "third"]
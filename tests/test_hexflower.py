@@ -0,0 +1,97 @@
+from collections import Counter
+from pathlib import Path
+
+import pytest
+
+from rolltable import rng
+from rolltable.table.hexflower.direction import Direction
+from rolltable.table.hexflower.hexagon import Hexagon
+from rolltable.table.hexflower.hexflower import Hexflower
+from rolltable.table.hexflower.navigator import Navigator
+from rolltable.table.hexflower.parser import Flower
+
+EXAMPLE_FLOWER = (
+    Path(__file__).resolve().parent.parent
+    / "examples"
+    / "example-hexflower-config.json"
+)
+
+
+def create_column_flower():
+    """Three hexes on top of each other. On a d4, 1 goes up, 2 goes down and
+    3 or 4 stay, as do moves off the column"""
+    navigator = Navigator("1d4", 1, {1: Direction.top, 2: Direction.bottom})
+    hexes = {
+        1: Hexagon(1, "low", {Direction.top: 2}),
+        2: Hexagon(2, "middle", {Direction.top: 3, Direction.bottom: 1}),
+        3: Hexagon(3, "high", {Direction.bottom: 2}),
+    }
+    return Flower(navigator, hexes, "column")
+
+
+def test_transition_matrix_matches_hand_computed_steps():
+    transitions = create_column_flower().get_transitions()
+
+    assert transitions.matrix.tolist() == [
+        [0.75, 0.25, 0],
+        [0.25, 0.5, 0.25],
+        [0, 0.25, 0.75],
+    ]
+    assert transitions.distribution_after(1, 0).tolist() == [1, 0, 0]
+    assert transitions.distribution_after(1, 1).tolist() == [0.75, 0.25, 0]
+    assert transitions.distribution_after(1, 2).tolist() == [0.625, 0.3125, 0.0625]
+    assert transitions.distribution_after(2, 2).tolist() == [0.3125, 0.375, 0.3125]
+    assert transitions.long_run_distribution(1) == pytest.approx([1 / 3] * 3)
+
+
+def test_steps_are_walked_without_numpy(monkeypatch):
+    monkeypatch.setattr(rng.PythonRng, "get_numpy_generator", lambda self: None)
+    rng.use("python", seed=67)
+
+    flower = Hexflower(EXAMPLE_FLOWER.read_text(), steps=3)
+    draw_count = 4000
+    counts = Counter(flower.roll_results(draw_count))
+
+    # Hexes can have the same content
+    probabilities = Counter()
+    for result, probability in flower.get_distribution():
+        probabilities[result] += probability
+
+    for result, probability in probabilities.items():
+        deviation = 5 * (draw_count * probability * (1 - probability)) ** 0.5 + 1
+        assert abs(counts[result] - draw_count * probability) <= deviation, result
+
+
+def test_dangling_neighbour_names_the_hex():
+    navigator = Navigator("1d4", 1, {1: Direction.top})
+    hexes = {1: Hexagon(1, "low", {Direction.top: 7})}
+
+    with pytest.raises(ValueError, match="Hex 1 has a top neighbour 7"):
+        Flower(navigator, hexes, "dangling")
+
+
+def test_walkers_match_single_walks():
+    flower = create_column_flower()
+    steps = 4
+    walker_count = 4000
+    expected = flower.get_transitions().distribution_after(1, steps)
+
+    rng.use("python", seed=71)
+    paths = flower.walk_many(flower.positions[1], steps, walker_count)
+    rng.use("python", seed=71)
+    assert (flower.walk_many(flower.positions[1], steps, walker_count) == paths).all()
+
+    single_walks = [
+        flower.walk_positions(flower.positions[1], steps) for _ in range(walker_count)
+    ]
+
+    # Walkers only make the moves single walks can make
+    matrix = flower.get_transitions().matrix
+    for path in [*paths.tolist(), *single_walks]:
+        assert all(matrix[move] > 0 for move in zip(path, path[1:]))
+
+    for ends in (paths[:, -1].tolist(), [walk[-1] for walk in single_walks]):
+        counts = Counter(ends)
+        for position, probability in enumerate(expected):
+            deviation = 5 * (walker_count * probability * (1 - probability)) ** 0.5 + 1
+            assert abs(counts[position] - walker_count * probability) <= deviation
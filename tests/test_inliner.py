@@ -0,0 +1,162 @@
+from collections import Counter
+from fractions import Fraction
+
+import pytest
+
+from rolltable import rng, tablecache
+from rolltable.inliner.inliner import InlineDiceRoll, TableInliner
+
+INLINE_MARKER_TABLES = {
+    "a.table": "x [[b.table]]\ny\n",
+    "b.table": "1\n2 [[c.table:c2:j+]]\n",
+    "c.table": "p\nq\n",
+}
+
+
+@pytest.mark.parametrize(
+    "element", ["1d12", "d10", "2d6+3", "4d6h3", "d%", "1d4:c1d10", "d10:c20:s:j/"]
+)
+def test_dice_markers_are_dice_rolls(element):
+    assert isinstance(TableInliner.compile_inline_dice_roll(element), InlineDiceRoll)
+
+
+@pytest.mark.parametrize(
+    "element",
+    [
+        "other-table",
+        "../other-table",
+        "./example.table:c1d10",
+        "other-folder/other-table",
+        "mod.tsv",
+        "dark_woods",
+        "this-table:e:dd9",
+    ],
+)
+def test_table_markers_are_not_parsed_as_dice(element, monkeypatch):
+    def compile_formula(formula):
+        raise AssertionError(f"'{formula}' parsed as a dice formula")
+
+    monkeypatch.setattr(
+        "rolltable.inliner.inliner.diceformula.compile_formula", compile_formula
+    )
+    assert TableInliner.compile_inline_dice_roll.__wrapped__(element) is None
+
+
+@pytest.fixture
+def table_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(tablecache, "enabled", False)
+    for name, content in INLINE_MARKER_TABLES.items():
+        (tmp_path / name).write_text(content)
+
+    return tmp_path
+
+
+def expand_by_brute_force(text, folder):
+    """Chance of each expansion of `text`, every table being rolled on its own
+    for each marker, depth-first"""
+    start = text.find("[[")
+    if start == -1:
+        return {text: Fraction(1)}
+
+    end = text.index("]]", start)
+    element, *options = text[start + 2 : end].split(":")
+    count = int(options[0][1:]) if options else 1
+    joiner = options[1][1:] if len(options) > 1 else ", "
+
+    entries = (folder / element).read_text().splitlines()
+    chances = {"": Fraction(1)}
+    for position in range(count):
+        next_chances = Counter()
+        for prefix, prefix_chance in chances.items():
+            for entry in entries:
+                for result, chance in expand_by_brute_force(entry, folder).items():
+                    joined = result if position == 0 else prefix + joiner + result
+                    next_chances[joined] += prefix_chance * chance / len(entries)
+        chances = next_chances
+
+    expanded = Counter()
+    for result, chance in chances.items():
+        rest = expand_by_brute_force(text[end + 2 :], folder)
+        for rest_result, rest_chance in rest.items():
+            expanded[text[:start] + result + rest_result] += chance * rest_chance
+
+    return dict(expanded)
+
+
+def test_expansion_matches_brute_force(table_folder):
+    expected = expand_by_brute_force("[[a.table]]", table_folder)
+
+    rng.use("python", seed=43)
+    draw_count = 8000
+    results = TableInliner().roll_inline_results(
+        ["[[a.table]]"] * draw_count, table_folder
+    )
+    counts = Counter(results)
+
+    assert set(counts) <= set(expected)
+    for result, chance in expected.items():
+        chance = float(chance)
+        deviation = 5 * (draw_count * chance * (1 - chance)) ** 0.5 + 1
+        assert abs(counts[result] - draw_count * chance) <= deviation, result
+
+
+def test_expansion_keeps_the_shape_of_results(table_folder):
+    rng.use("python", seed=47)
+    results = TableInliner().roll_inline_results(
+        [["[[c.table]]", "plain"], "[[c.table:c3:j/]]", []], table_folder
+    )
+
+    assert results[0][0] in ("p", "q")
+    assert results[0][1] == "plain"
+    assert all(part in ("p", "q") for part in results[1].split("/"))
+    assert len(results[1].split("/")) == 3
+    assert results[2] == []
+
+
+def test_each_table_is_rolled_once_per_level(table_folder, stats):
+    rng.use("python", seed=53)
+    results = TableInliner().roll_inline_results(
+        ["[[a.table]] [[c.table]]"] * 500, table_folder
+    )
+    assert all("[[" not in result for result in results)
+
+    counters = stats.get_report()["counters"]
+    # a and c on the first level, b on the second, c on the third
+    assert counters["inline_table_rolls"] == 4
+    assert counters["max_inline_depth"] == 3
+
+
+def test_exclusive_references_are_rolled_per_result(table_folder):
+    rng.use("python", seed=59)
+    results = TableInliner().roll_inline_results(
+        ["[[c.table:e:c2]]"] * 200, table_folder
+    )
+
+    assert set(results) <= {"p, q", "q, p"}
+
+
+def test_reference_cycles_stop(tmp_path, monkeypatch):
+    monkeypatch.setattr(tablecache, "enabled", False)
+    (tmp_path / "loop.table").write_text("again [[loop.table]]\n")
+
+    with pytest.raises(RecursionError):
+        TableInliner().roll_inline_tables("[[loop.table]]", tmp_path)
+
+
+def test_inline_dice_rolls(table_folder):
+    rng.use("python", seed=61)
+
+    assert TableInliner().roll_inline_tables("[[1d1:c3:j-]]", table_folder) == "1-1-1"
+
+
+def test_compiled_templates_are_bounded(table_folder, monkeypatch):
+    monkeypatch.setattr("rolltable.inliner.inliner.COMPILED_TEMPLATE_CACHE_SIZE", 4)
+    inliner = TableInliner()
+
+    kept = inliner.get_compiled_template("kept [[c.table]]", table_folder)
+    for index in range(10):
+        inliner.get_compiled_template(f"{index} [[c.table]]", table_folder)
+        assert inliner.get_compiled_template("kept [[c.table]]", table_folder) is kept
+
+    assert len(inliner.compiled_templates) == 4
+    assert ("kept [[c.table]]", table_folder) in inliner.compiled_templates
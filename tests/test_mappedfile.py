@@ -0,0 +1,167 @@
+import random
+
+import pytest
+
+from rolltable import rng, tablecache
+from rolltable.table import mappedfile
+from rolltable.table.baseloader import MappedTableFile
+from rolltable.table.random import RandomTable
+from rolltable.table.sampler import CumulativeSampler, sample_without_replacement
+from rolltable.table.weightedlist import WeightedListTable
+
+
+def generate_list_table(line_count: int, seed: int):
+    generator = random.Random(seed)
+    lines = []
+    for index in range(line_count):
+        kind = generator.randrange(8)
+        if kind == 0:
+            lines.append("")
+        elif kind == 1:
+            lines.append(f"# comment {index}")
+        elif kind == 2:
+            lines.append(f"  entry {index} [[other.table]]  ")
+        elif kind == 3:
+            lines.append(f"\tentrée {index}")
+        else:
+            lines.append(f"entry {index}")
+
+    return "\n".join(lines) + "\n"
+
+
+def generate_weighted_table(line_count: int, seed: int):
+    generator = random.Random(seed)
+    lines = []
+    for index in range(line_count):
+        kind = generator.randrange(8)
+        if kind == 0:
+            lines.append(f"# comment {index}")
+        elif kind == 1:
+            lines.append(f"item {index}")
+        elif kind == 2:
+            lines.append(f"0\tnever {index}")
+        elif kind == 3:
+            lines.append(f"{generator.randrange(1, 9)}\titem {index}\t[[other.table]]")
+        else:
+            lines.append(f"{generator.randrange(1, 9)}\titem {index}")
+
+    return "\n".join(lines) + "\n"
+
+
+@pytest.fixture(autouse=True)
+def cache_folder(tmp_path, monkeypatch):
+    monkeypatch.setenv("ROLLTABLE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(tablecache, "enabled", True)
+    # Lines span the scanned blocks
+    monkeypatch.setattr(mappedfile, "INDEX_SCAN_SIZE", 64)
+
+
+def load_both(tmp_path, table_class, table_data: str):
+    table_file = tmp_path / "table.txt"
+    table_file.write_text(table_data, encoding=mappedfile.ENCODING)
+
+    return table_class(table_data), table_class(MappedTableFile(table_file))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_mapped_list_has_parsed_entries(tmp_path, seed):
+    parsed, mapped = load_both(tmp_path, RandomTable, generate_list_table(300, seed))
+
+    assert mapped.is_mapped
+    assert list(mapped.table) == list(parsed.table)
+    assert mapped.table.take([5, 0, 5]) == parsed.table.take([5, 0, 5])
+    assert mapped.get_entries() == parsed.get_entries()
+    assert mapped.has_inline_markers() == parsed.has_inline_markers()
+    assert mapped.get_distribution() == parsed.get_distribution()
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_mapped_weighted_list_has_parsed_entries(tmp_path, seed):
+    parsed, mapped = load_both(
+        tmp_path, WeightedListTable, generate_weighted_table(300, seed)
+    )
+
+    assert list(mapped.table.items) == list(parsed.table.items)
+    assert list(mapped.table.weights) == list(parsed.table.weights)
+    assert mapped.get_entries() == parsed.get_entries()
+    assert mapped.get_distribution() == parsed.get_distribution()
+
+
+def test_index_is_reused_then_rebuilt_when_table_changes(tmp_path):
+    table_file = tmp_path / "table.txt"
+    table_file.write_text("a\nb\n")
+    assert list(RandomTable(MappedTableFile(table_file)).table) == ["a", "b"]
+    assert list(RandomTable(MappedTableFile(table_file)).table) == ["a", "b"]
+
+    table_file.write_text("a\nb\nc [[x]]\n")
+    table = RandomTable(MappedTableFile(table_file))
+    assert list(table.table) == ["a", "b", "c [[x]]"]
+    assert table.get_entries() == ["c [[x]]"]
+
+
+def test_empty_mapped_table(tmp_path):
+    parsed, mapped = load_both(tmp_path, RandomTable, "")
+
+    assert len(mapped.table) == len(parsed.table) == 0
+    assert not mapped.has_inline_markers()
+
+
+def get_cumulative_sampler(weights):
+    cumulative_weights = []
+    total_weight = 0
+    for weight in weights:
+        total_weight = total_weight + weight
+        cumulative_weights.append(total_weight)
+
+    positive_count = sum(1 for weight in weights if weight > 0)
+    return CumulativeSampler(cumulative_weights, total_weight, positive_count)
+
+
+def generate_weights(entry_count: int, seed: int):
+    generator = random.Random(seed)
+    return [generator.randrange(0, 6) for _ in range(entry_count)]
+
+
+WEIGHTS = [[1, 2, 3], [4, 0, 1, 0, 2, 0], [0, 0, 5], generate_weights(3000, 31)]
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+@pytest.mark.parametrize("k", [1, 2, 3, 10, 2000])
+def test_distinct_draws_match_fenwick_draws(weights, k):
+    """Both draw the entry covering the same target among the weights left,
+    so a seed gives the same entries"""
+    sampler = get_cumulative_sampler(weights)
+
+    rng.use("python", seed=k)
+    distinct = sampler.sample_distinct(k)
+    rng.use("python", seed=k)
+    assert distinct == sample_without_replacement(weights, k)
+
+
+def test_distinct_draws_over_the_limit(monkeypatch):
+    monkeypatch.setattr(CumulativeSampler, "DISTINCT_DRAW_LIMIT", 4)
+    weights = WEIGHTS[-1]
+    sampler = get_cumulative_sampler(weights)
+
+    rng.use("python", seed=37)
+    distinct = sampler.sample_distinct(100)
+    rng.use("python", seed=37)
+    assert distinct == sample_without_replacement(weights, 100)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_cumulative_draws_match_weights(weights):
+    sampler = get_cumulative_sampler(weights)
+    rng.use("python", seed=41)
+    draw_count = 20000
+    indices = sampler.sample(draw_count)
+
+    counts = [0] * len(weights)
+    for index in indices:
+        counts[index] = counts[index] + 1
+
+    total_weight = sum(weights)
+    for index, weight in enumerate(weights):
+        chance = weight / total_weight
+        deviation = 5 * (draw_count * chance * (1 - chance)) ** 0.5 + 1
+        assert abs(counts[index] - draw_count * chance) <= deviation, index
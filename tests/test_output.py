@@ -0,0 +1,78 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rolltable import core, tablecache
+from rolltable.inliner.inliner import TableInliner
+from rolltable.table.baseloader import RESULT_CHUNK_SIZE
+
+ROOT_FOLDER = Path(__file__).resolve().parent.parent
+EXAMPLES_FOLDER = ROOT_FOLDER / "examples"
+
+RESULTS = [f"result {index}" for index in range(10)]
+RESULT_SETS = [[f"a{index}", f"b{index}"] if index % 3 else [] for index in range(10)]
+
+
+def split(results, sizes):
+    chunks = []
+    for size in sizes:
+        chunks.append(results[:size])
+        results = results[size:]
+
+    return chunks + [results]
+
+
+@pytest.mark.parametrize("results", [RESULTS, RESULT_SETS])
+@pytest.mark.parametrize("joiner", [None, ", "])
+@pytest.mark.parametrize("sizes", [[], [1], [3, 0, 3], [0, 10]])
+def test_chunks_are_written_like_one_list(tmp_path, results, joiner, sizes):
+    streamed_file = tmp_path / "streamed.txt"
+    whole_file = tmp_path / "whole.txt"
+
+    core.write_results(split(results, sizes), str(streamed_file), joiner=joiner)
+    core.open_writing_device(results, str(whole_file), joiner=joiner)
+    assert streamed_file.read_bytes() == whole_file.read_bytes()
+
+    core.write_results(split(results, sizes), str(streamed_file), True, joiner)
+    core.open_writing_device(results, str(whole_file), True, joiner)
+    assert streamed_file.read_bytes() == whole_file.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ("example-list-table.table",),
+        ("example-list-table.table", "-j", " / "),
+        ("example-inlined-table.table",),
+        ("example-occurence-table.tsv", "--format", "chance"),
+    ],
+)
+def test_streamed_rolls_match_the_rolled_list(tmp_path, monkeypatch, options):
+    table_name, *options = options
+    arguments = [
+        str(EXAMPLES_FOLDER / table_name),
+        "-c",
+        str(RESULT_CHUNK_SIZE + 100),
+        "--seed",
+        "83",
+        *options,
+    ]
+
+    streamed_file = tmp_path / "streamed.txt"
+    subprocess.run(
+        [sys.executable, "-m", "rolltable", *arguments, "-o", str(streamed_file)],
+        cwd=ROOT_FOLDER,
+        env={**os.environ, "ROLLTABLE_CACHE_DIR": str(tmp_path / "cache")},
+        check=True,
+    )
+
+    monkeypatch.setattr(tablecache, "enabled", False)
+    args = core.get_parameters(arguments)
+    whole_file = tmp_path / "whole.txt"
+    results = core.roll_table(args, TableInliner())
+    core.open_writing_device(results, str(whole_file), joiner=args.join)
+
+    assert streamed_file.read_bytes() == whole_file.read_bytes()
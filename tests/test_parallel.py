@@ -0,0 +1,143 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rolltable import parallel
+from rolltable.table.baseloader import RESULT_CHUNK_SIZE
+
+ROOT_FOLDER = Path(__file__).resolve().parent.parent
+EXAMPLES_FOLDER = ROOT_FOLDER / "examples"
+
+# Over a shard of results, so several shards are rolled
+COUNT = RESULT_CHUNK_SIZE + 1000
+
+
+def run_rolltable(tmp_path, *arguments, stdin=None):
+    return subprocess.run(
+        [sys.executable, "-m", "rolltable", *arguments],
+        cwd=ROOT_FOLDER,
+        env={**os.environ, "ROLLTABLE_CACHE_DIR": str(tmp_path)},
+        input=stdin,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def roll(tmp_path, *arguments, stdin=None):
+    return run_rolltable(tmp_path, *arguments, stdin=stdin).stdout
+
+
+def get_counters(stats_report):
+    counter_lines = stats_report.split("Counters:\n")[1].split("Slowest")[0]
+    return {
+        name: int(value)
+        for name, value in (line.split() for line in counter_lines.splitlines())
+    }
+
+
+def test_shards_cover_the_count_with_derived_seeds():
+    shards = list(parallel.get_shards(3 * RESULT_CHUNK_SIZE + 5, seed=1))
+
+    assert [count for _, count in shards] == [RESULT_CHUNK_SIZE] * 3 + [5]
+    assert shards == list(parallel.get_shards(3 * RESULT_CHUNK_SIZE + 5, seed=1))
+    assert len({seed for seed, _ in shards}) == len(shards)
+    assert shards != list(parallel.get_shards(3 * RESULT_CHUNK_SIZE + 5, seed=2))
+
+
+@pytest.mark.parametrize(
+    "table_arguments",
+    [
+        ["example-list-table.table"],
+        ["example.weighted_list", "--format", "weighted-list"],
+        ["example-list-table.table", "--dice-formula", "2d20", "--clamp"],
+    ],
+)
+def test_seed_gives_same_results_with_any_number_of_jobs(tmp_path, table_arguments):
+    table_path, *options = table_arguments
+    arguments = [str(EXAMPLES_FOLDER / table_path), *options, "-c", str(COUNT)]
+
+    single_process = roll(tmp_path, *arguments, "--seed", "42")
+    assert len(single_process.splitlines()) == COUNT
+
+    for jobs in ("2", "3"):
+        assert roll(tmp_path, *arguments, "--seed", "42", "--jobs", jobs) == (
+            single_process
+        )
+
+    assert roll(tmp_path, *arguments, "--seed", "43", "--jobs", "2") != (single_process)
+
+
+def test_seed_gives_same_inline_results_with_any_number_of_jobs(tmp_path):
+    arguments = [str(EXAMPLES_FOLDER / "example-inlined-table.table"), "-c", "3000"]
+
+    single_process = roll(tmp_path, *arguments, "--seed", "7")
+    assert roll(tmp_path, *arguments, "--seed", "7", "--jobs", "2") == single_process
+
+
+REGISTRY_SCRIPT = """
+import sys
+from rolltable import Registry
+
+registry = Registry()
+registry.roll(sys.argv[1], count=5, seed=5)
+print(registry.roll(sys.argv[1], count=20))
+"""
+
+
+def run_script(tmp_path, script, *arguments):
+    completed = subprocess.run(
+        [sys.executable, "-c", script, *arguments],
+        cwd=ROOT_FOLDER,
+        env={**os.environ, "ROLLTABLE_CACHE_DIR": str(tmp_path)},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return completed.stdout
+
+
+def test_seeded_registry_roll_leaves_later_rolls_random(tmp_path):
+    table_path = str(EXAMPLES_FOLDER / "example-list-table.table")
+
+    assert run_script(tmp_path, REGISTRY_SCRIPT, table_path) != run_script(
+        tmp_path, REGISTRY_SCRIPT, table_path
+    )
+
+
+@pytest.mark.parametrize("options", [{}, {"exclusive": True}])
+def test_seeded_batch_spec_leaves_later_specs_random(tmp_path, options):
+    table_path = str(EXAMPLES_FOLDER / "example-list-table.table")
+    specs = [
+        {"table_filepath": table_path, "count": 5, "seed": 5, **options},
+        {"table_filepath": table_path, "count": 20, **options},
+    ]
+    batch = "".join(json.dumps(spec) + "\n" for spec in specs)
+
+    first_run = roll(tmp_path, "--batch", "-", stdin=batch).splitlines()
+    second_run = roll(tmp_path, "--batch", "-", stdin=batch).splitlines()
+    assert first_run[0] == second_run[0]
+    assert first_run[1] != second_run[1]
+
+
+@pytest.mark.parametrize("jobs", ["1", "2", "4"])
+def test_stats_count_the_table_once_with_any_number_of_jobs(tmp_path, jobs):
+    table_path = str(EXAMPLES_FOLDER / "example-list-table.table")
+    arguments = (table_path, "--count", str(COUNT), "--jobs", jobs, "--stats")
+
+    stats_report = run_rolltable(tmp_path, *arguments).stderr
+    assert get_counters(stats_report)["tables_loaded"] == 1
+
+
+def test_stats_keep_worker_phases_out_of_the_wall_times(tmp_path):
+    table_path = str(EXAMPLES_FOLDER / "example-list-table.table")
+    arguments = (table_path, "--count", str(COUNT), "--jobs", "2", "--stats")
+
+    stats_report = run_rolltable(tmp_path, *arguments).stderr
+    wall_times, _, worker_times = stats_report.partition("Worker CPU times")
+    assert "  roll " not in wall_times
+    assert "  roll " in worker_times.split("Counters:")[0]
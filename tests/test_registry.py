@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+from rolltable import Registry, stats, tablecache
+
+
+@pytest.fixture(params=["inotify", "stat"])
+def registry(request, tmp_path, monkeypatch, stats, write_table):
+    monkeypatch.setenv("ROLLTABLE_WATCH", request.param)
+    monkeypatch.setattr(tablecache, "enabled", False)
+    monkeypatch.setattr(tablecache, "memory_cache", None)
+
+    (tmp_path / "sub").mkdir()
+    write_table(tmp_path / "a.table", "A [[b.table]] [[c.table]]\n")
+    write_table(tmp_path / "b.table", "B [[sub/d.table]]\n")
+    write_table(tmp_path / "c.table", "C\n")
+    write_table(tmp_path / "sub" / "d.table", "D1\n")
+
+    return Registry()
+
+
+def replace(table_file, text):
+    """Writes the table like editors that save to another file first"""
+    temporary_file = table_file.with_suffix(".tmp")
+    temporary_file.write_text(text)
+    os.replace(temporary_file, table_file)
+
+
+def roll(registry, table_file):
+    stats.reset()
+    results = registry.roll(table_file)
+    counters = stats.get_report()["counters"]
+    return results, counters.get("tables_loaded", 0)
+
+
+def test_unchanged_tables_are_kept(registry, tmp_path):
+    assert roll(registry, tmp_path / "a.table") == (["A B D1 C"], 4)
+    assert roll(registry, tmp_path / "a.table") == (["A B D1 C"], 0)
+
+
+def test_edited_table_is_loaded_again(registry, tmp_path, write_table):
+    roll(registry, tmp_path / "a.table")
+
+    write_table(tmp_path / "sub" / "d.table", "D2\n")
+    assert roll(registry, tmp_path / "a.table") == (["A B D2 C"], 1)
+    assert roll(registry, tmp_path / "a.table") == (["A B D2 C"], 0)
+
+
+def test_replaced_table_references_are_walked_again(registry, tmp_path, write_table):
+    roll(registry, tmp_path / "a.table")
+
+    replace(tmp_path / "c.table", "C2 [[e.table]]\n")
+    assert [path.name for path in registry.check(tmp_path / "a.table").missing] == [
+        "e.table"
+    ]
+
+    write_table(tmp_path / "e.table", "E\n")
+    assert registry.check(tmp_path / "a.table").is_valid()
+    assert roll(registry, tmp_path / "a.table") == (["A B D1 C2 E"], 0)
+
+
+def test_edited_root_table_is_loaded_again(registry, tmp_path, write_table):
+    roll(registry, tmp_path / "a.table")
+
+    write_table(tmp_path / "a.table", "A2 [[c.table]]\n")
+    assert roll(registry, tmp_path / "a.table") == (["A2 C"], 1)
+
+
+def test_seeded_rolls_repeat(registry, tmp_path, write_table):
+    write_table(
+        tmp_path / "list.table", "\n".join(f"entry {index}" for index in range(50))
+    )
+
+    first = registry.roll(tmp_path / "list.table", count=20, seed=3)
+    assert registry.roll(tmp_path / "list.table", count=20, seed=3) == first
+    assert (
+        len(set(registry.roll(tmp_path / "list.table", count=50, exclusive=True))) == 50
+    )
+    assert sum(registry.tally(tmp_path / "list.table", count=1000).values()) == 1000
+
+
+def test_edited_table_templates_are_dropped(registry, tmp_path, write_table):
+    roll(registry, tmp_path / "a.table")
+    compiled_folders = {folder for _, folder in registry.inliner.compiled_templates}
+    assert tmp_path / "sub" not in compiled_folders
+
+    write_table(tmp_path / "sub" / "d.table", "D2 [[1d1]]\n")
+    roll(registry, tmp_path / "a.table")
+    assert ("D2 [[1d1]]", tmp_path / "sub") in registry.inliner.compiled_templates
+
+    write_table(tmp_path / "sub" / "d.table", "D3\n")
+    registry.inliner.drop_changed_tables()
+    compiled_folders = {folder for _, folder in registry.inliner.compiled_templates}
+    assert tmp_path / "sub" not in compiled_folders
+    assert tmp_path in compiled_folders
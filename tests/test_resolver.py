@@ -0,0 +1,166 @@
+import os
+from collections import Counter
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from rolltable import core, tablecache
+from rolltable.inliner.inliner import TableInliner, create_table
+from rolltable.inliner.resolver import resolve_references, walk_references
+
+ROOT_FOLDER = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def table_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(tablecache, "enabled", False)
+    (tmp_path / "root.table").write_text("R [[a.table]]\nR [[gone.table]]\n")
+    (tmp_path / "a.table").write_text("A [[b.table]]\n")
+    (tmp_path / "b.table").write_text("B [[a.table]]\nB\n")
+    return tmp_path
+
+
+def check(table_file):
+    args = core.get_parameters([str(table_file), "--check"])
+    return core.check_references(args, TableInliner())
+
+
+def test_check_reports_missing_tables_and_cycles(table_folder):
+    graph = check(table_folder / "root.table")
+
+    assert graph.tables == [table_folder / "a.table", table_folder / "b.table"]
+    assert graph.cycles == [
+        [table_folder / "a.table", table_folder / "b.table", table_folder / "a.table"]
+    ]
+    assert graph.missing == {table_folder / "gone.table": table_folder / "root.table"}
+    assert not graph.is_valid()
+
+    lines = graph.describe()
+    assert "Reference cycles: 1" in lines
+    assert "Missing tables: 1" in lines
+    assert (
+        f"  {table_folder / 'gone.table'} (referenced from "
+        f"{table_folder / 'root.table'})"
+    ) in lines
+
+
+def test_check_exits_with_an_error_on_missing_tables(table_folder):
+    completed = subprocess.run(
+        [sys.executable, "-m", "rolltable", "--check", "--no-cache"]
+        + [str(table_folder / "root.table")],
+        cwd=ROOT_FOLDER,
+        env={**os.environ, "ROLLTABLE_CACHE_DIR": str(table_folder / "cache")},
+        capture_output=True,
+        text=True,
+    )
+
+    assert completed.returncode == 1
+    assert "Missing tables: 1" in completed.stdout.splitlines()
+
+
+def test_cycles_alone_pass_the_check(table_folder):
+    (table_folder / "root.table").write_text("R [[a.table]]\n")
+
+    graph = check(table_folder / "root.table")
+    assert len(graph.cycles) == 1
+    assert graph.is_valid()
+
+
+def test_deep_reference_chain_is_walked_without_recursion(tmp_path, monkeypatch):
+    monkeypatch.setattr(tablecache, "enabled", False)
+    depth = sys.getrecursionlimit() + 200
+    for index in range(depth):
+        (tmp_path / f"{index}.table").write_text(f"{index} [[{index + 1}.table]]\n")
+    (tmp_path / f"{depth}.table").write_text("end\n")
+
+    inliner = TableInliner()
+    root_table = inliner.get_inlined_table(
+        TableInliner.parse_inline_table_info("0.table", tmp_path)
+    )
+    graph = resolve_references(inliner, root_table, tmp_path, tmp_path / "0.table")
+
+    assert len(graph.tables) == depth
+    assert graph.is_valid() and not graph.cycles
+
+
+@pytest.fixture
+def diamond_folder(tmp_path, monkeypatch):
+    """Two levels of two tables, both referencing the same table, and a table
+    that's missing"""
+    monkeypatch.setattr(tablecache, "enabled", False)
+    monkeypatch.setenv("ROLLTABLE_PREFETCH_THREADS", "4")
+    (tmp_path / "root.table").write_text("[[a.table]]\n[[b.table]]\n")
+    (tmp_path / "a.table").write_text("A [[c.table]]\n")
+    (tmp_path / "b.table").write_text("B [[c.table]]\nB [[gone.table]]\n")
+    (tmp_path / "c.table").write_text("C [[d.table]]\n")
+    (tmp_path / "d.table").write_text("D\n")
+    return tmp_path
+
+
+def load_root(inliner, table_folder):
+    return inliner.get_inlined_table(
+        TableInliner.parse_inline_table_info("root.table", table_folder)
+    )
+
+
+def test_prefetch_loads_each_table_once(diamond_folder, monkeypatch):
+    created = Counter()
+
+    def count_creation(table_info):
+        created[table_info.table_path.name] += 1
+        return create_table(table_info)
+
+    monkeypatch.setattr("rolltable.inliner.inliner.create_table", count_creation)
+    monkeypatch.setattr("rolltable.inliner.resolver.create_table", count_creation)
+
+    inliner = TableInliner()
+    graph = resolve_references(
+        inliner,
+        load_root(inliner, diamond_folder),
+        diamond_folder,
+        diamond_folder / "root.table",
+    )
+
+    names = ("a.table", "b.table", "c.table", "d.table")
+    assert sorted(graph.tables) == sorted(diamond_folder / name for name in names)
+    assert {name: created[name] for name in names} == dict.fromkeys(names, 1)
+    assert created["root.table"] == 1
+
+    # Nothing is loaded again when rolling
+    created.clear()
+    inliner.roll_inline_results(["[[a.table]] [[c.table]]"] * 50, diamond_folder)
+    assert not created
+
+
+def test_prefetch_reports_missing_tables_like_the_serial_walk(diamond_folder):
+    inliner = TableInliner()
+    graph = resolve_references(
+        inliner,
+        load_root(inliner, diamond_folder),
+        diamond_folder,
+        diamond_folder / "root.table",
+    )
+
+    serial_inliner = TableInliner()
+    serial_graph = walk_references(
+        serial_inliner,
+        load_root(serial_inliner, diamond_folder),
+        diamond_folder,
+        diamond_folder / "root.table",
+    )
+
+    assert graph.missing == serial_graph.missing
+    assert list(graph.missing) == [diamond_folder / "gone.table"]
+    assert graph.tables == serial_graph.tables
+    assert graph.cycles == serial_graph.cycles
+
+    # Rolling the missing table fails the same way
+    errors = []
+    for rolling_inliner in (inliner, TableInliner()):
+        with pytest.raises(FileNotFoundError) as error:
+            rolling_inliner.roll_inline_tables("[[gone.table]]", diamond_folder)
+        errors.append(str(error.value))
+
+    assert errors[0] == errors[1]
@@ -0,0 +1,66 @@
+import random
+
+import numpy
+import pytest
+
+from rolltable import rng
+
+
+def draw_all(generator):
+    population = list(range(20))
+    shuffled = list(population)
+    generator.shuffle(shuffled)
+
+    return (
+        [generator.random() for _ in range(50)],
+        generator.randoms(10),
+        [generator.randrange(6) for _ in range(50)],
+        [generator.randint(1, 6) for _ in range(50)],
+        generator.choices(population, k=10),
+        generator.sample(population, 10),
+        shuffled,
+    )
+
+
+@pytest.mark.parametrize("backend", ["python", "numpy"])
+def test_seeded_generator_repeats(backend):
+    rng.use(backend, seed=89)
+    draws = draw_all(rng.get())
+
+    rng.use(backend, seed=89)
+    assert rng.get().name == backend
+    assert draw_all(rng.get()) == draws
+
+    rng.use(backend, seed=97)
+    assert draw_all(rng.get()) != draws
+
+
+def test_numpy_draws_stay_in_range_across_blocks():
+    generator = rng.NumpyRng(seed=101, block_size=7)
+
+    values = [generator.random() for _ in range(7 * 20 + 3)]
+    assert all(0 <= value < 1 for value in values)
+    assert (
+        values == numpy.random.default_rng(101).random(7 * 21)[: len(values)].tolist()
+    )
+
+    assert {generator.randrange(6) for _ in range(500)} == set(range(6))
+    assert {generator.randint(1, 6) for _ in range(500)} == set(range(1, 7))
+
+
+def test_unknown_backend_is_refused():
+    with pytest.raises(ValueError):
+        rng.use("dice-bag")
+
+
+def test_restored_generator_is_used_again():
+    rng.use("python")
+    previous = rng.get()
+    random_state = random.getstate()
+
+    with rng.restored():
+        rng.use("numpy", seed=103)
+        assert rng.get().name == "numpy"
+
+    assert rng.get() is previous
+    assert random.getstate() == random_state
@@ -0,0 +1,191 @@
+import itertools
+import random
+from collections import Counter
+from fractions import Fraction
+
+import pytest
+
+from rolltable import rng
+from rolltable.table.sampler import (
+    AliasSampler,
+    WeightTree,
+    sample_without_replacement,
+)
+
+WEIGHTS = [
+    [1],
+    [1, 1, 1, 1],
+    [5, 1, 3, 1],
+    [1, 0, 2, 0, 7],
+    [100, 1, 1, 1, 1, 1, 1, 1],
+    [0.5, 1.25, 2.25],
+    list(range(1, 33)),
+]
+
+
+def get_expected_frequencies(weights):
+    total_weight = sum(weights)
+    return [weight / total_weight for weight in weights]
+
+
+def assert_close_to_weights(indices, weights):
+    """Each entry is drawn within 5 standard deviations of its chance"""
+    counts = Counter(indices)
+    draw_count = len(indices)
+
+    for index, chance in enumerate(get_expected_frequencies(weights)):
+        deviation = 5 * (draw_count * chance * (1 - chance)) ** 0.5 + 1
+        assert abs(counts[index] - draw_count * chance) <= deviation, index
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_alias_table_covers_each_weight_exactly(weights):
+    """The chance of each entry, rebuilt from the alias table, is its weight
+    over the total weight"""
+    sampler = AliasSampler(weights)
+    entry_count = len(weights)
+    chances = [Fraction(0)] * entry_count
+
+    for index in range(entry_count):
+        probability = Fraction(sampler.probabilities[index])
+        chances[index] = chances[index] + probability / entry_count
+        chances[sampler.aliases[index]] = (
+            chances[sampler.aliases[index]] + (1 - probability) / entry_count
+        )
+
+    for chance, expected in zip(chances, get_expected_frequencies(weights)):
+        assert float(chance) == pytest.approx(expected, abs=1e-12)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_alias_draws_match_weights(weights):
+    rng.use("python", seed=3)
+    sampler = AliasSampler(weights)
+
+    indices = sampler.sample(20000)
+    assert_close_to_weights(indices, weights)
+    assert all(weights[index] > 0 for index in indices)
+
+
+@pytest.mark.parametrize("weights", WEIGHTS)
+def test_alias_draws_match_random_choices(weights):
+    """Same frequencies as the standard library's weighted draws"""
+    rng.use("python", seed=5)
+    sampler = AliasSampler(weights)
+    alias_counts = Counter(sampler.draw() for _ in range(20000))
+
+    generator = random.Random(5)
+    baseline_counts = Counter(
+        generator.choices(range(len(weights)), weights=weights, k=20000)
+    )
+
+    for index, chance in enumerate(get_expected_frequencies(weights)):
+        deviation = 7 * (20000 * chance * (1 - chance)) ** 0.5 + 1
+        assert abs(alias_counts[index] - baseline_counts[index]) <= deviation
+
+
+def test_alias_seeded_draws_repeat():
+    sampler = AliasSampler([5, 1, 3, 1])
+
+    rng.use("python", seed=11)
+    first = sampler.sample(100)
+    rng.use("python", seed=11)
+    assert sampler.sample(100) == first
+
+
+@pytest.mark.parametrize("weights", [[], [0, 0]])
+def test_alias_refuses_tables_without_weight(weights):
+    sampler = AliasSampler(weights)
+
+    with pytest.raises((IndexError, ValueError)):
+        sampler.draw()
+    with pytest.raises((IndexError, ValueError)):
+        sampler.sample(1)
+
+
+def find_by_scan(weights, target):
+    """Entry covering `target` among the cumulative weights, found one entry
+    at a time"""
+    for index, weight in enumerate(weights):
+        if target < weight:
+            return index
+        target = target - weight
+
+
+def get_ordered_draw_chances(weights, k):
+    """Exact chance of each ordered sequence of `k` distinct entries"""
+    chances = dict()
+    drawable = [index for index, weight in enumerate(weights) if weight > 0]
+
+    for indices in itertools.permutations(drawable, k):
+        chance = Fraction(1)
+        remaining_weight = sum(weights)
+        for index in indices:
+            chance = chance * Fraction(weights[index], remaining_weight)
+            remaining_weight = remaining_weight - weights[index]
+        chances[indices] = chance
+
+    return chances
+
+
+@pytest.mark.parametrize(
+    "weights", [[3], [1, 2, 3], [4, 0, 1, 0, 2], [1] * 9, list(range(17))]
+)
+def test_tree_finds_same_entries_as_scan(weights):
+    tree = WeightTree(weights)
+    weights = list(weights)
+
+    # Entries are removed one by one, like exclusive draws do
+    for removed in [index for index, weight in enumerate(weights) if weight]:
+        assert tree.total_weight == sum(weights)
+        for target in range(tree.total_weight):
+            assert tree.find(target) == find_by_scan(weights, target)
+
+        tree.add(removed, -weights[removed])
+        weights[removed] = 0
+
+
+@pytest.mark.parametrize("weights", [[1, 2, 3], [4, 0, 1, 0, 2], [5, 1, 1, 1]])
+@pytest.mark.parametrize("k", [1, 2, 3])
+def test_exclusive_draws_match_exact_chances(weights, k):
+    rng.use("python", seed=17)
+    draw_count = 12000
+    counts = Counter(
+        tuple(sample_without_replacement(weights, k)) for _ in range(draw_count)
+    )
+
+    chances = get_ordered_draw_chances(weights, k)
+    assert set(counts) <= set(chances)
+    for indices, chance in chances.items():
+        chance = float(chance)
+        deviation = 5 * (draw_count * chance * (1 - chance)) ** 0.5 + 1
+        assert abs(counts[indices] - draw_count * chance) <= deviation, indices
+
+
+def test_exclusive_draws_match_random_sample():
+    """Without weights, same frequencies as the standard library's draws
+    without replacement"""
+    rng.use("python", seed=19)
+    generator = random.Random(19)
+    weights = [1] * 6
+
+    tree_counts = Counter(
+        tuple(sample_without_replacement(weights, 2)) for _ in range(12000)
+    )
+    baseline_counts = Counter(
+        tuple(generator.sample(range(6), 2)) for _ in range(12000)
+    )
+
+    for indices in itertools.permutations(range(6), 2):
+        assert abs(tree_counts[indices] - baseline_counts[indices]) <= 100
+
+
+@pytest.mark.parametrize("k", [0, 3, 5, 10])
+def test_exclusive_draws_are_distinct_and_drawable(k):
+    rng.use("python", seed=23)
+    weights = [2, 0, 1, 0, 3, 1, 0]
+    indices = sample_without_replacement(weights, k)
+
+    assert len(indices) == min(k, 4)
+    assert len(set(indices)) == len(indices)
+    assert all(weights[index] > 0 for index in indices)
@@ -0,0 +1,149 @@
+import pytest
+
+from rolltable import loader, stats, tablecache
+from rolltable.table.random import RandomTable
+from rolltable.table.weightedlist import WeightedListTable
+
+
+@pytest.fixture
+def cache_folder(tmp_path, monkeypatch, stats):
+    monkeypatch.setenv("ROLLTABLE_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(tablecache, "enabled", True)
+    monkeypatch.setattr(tablecache, "memory_cache", None)
+    return tmp_path / "cache"
+
+
+def load(table_file, table_class=RandomTable, table_format="list"):
+    stats.reset()
+    table = loader.load_cached_table(table_file, table_format, table_class)
+    return table, stats.get_report()["counters"]
+
+
+def test_parsed_table_is_read_from_cache(cache_folder, tmp_path, write_table):
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "a\n# comment\nb [[other.table]]\n")
+
+    parsed, counters = load(table_file)
+    assert counters["table_cache_misses"] == 1
+
+    cached, counters = load(table_file)
+    assert counters["table_cache_hits"] == 1
+    assert list(cached.table) == list(parsed.table) == ["a", "b [[other.table]]"]
+    assert cached.get_entries() == parsed.get_entries()
+
+
+def test_weighted_table_is_read_from_cache(cache_folder, tmp_path, write_table):
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "3\ta\n1\tb\nc\n")
+
+    parsed, _ = load(table_file, WeightedListTable, "weighted-list")
+    cached, counters = load(table_file, WeightedListTable, "weighted-list")
+
+    assert counters["table_cache_hits"] == 1
+    assert cached.get_distribution() == parsed.get_distribution()
+
+
+def test_edited_table_misses(cache_folder, tmp_path, write_table):
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "a\n")
+    load(table_file)
+
+    write_table(table_file, "a\nb\n")
+    table, counters = load(table_file)
+    assert counters["table_cache_misses"] == 1
+    assert list(table.table) == ["a", "b"]
+
+
+def test_formats_are_cached_apart(cache_folder, tmp_path, write_table):
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "2\ta\n")
+    load(table_file)
+
+    table, counters = load(table_file, WeightedListTable, "weighted-list")
+    assert counters["table_cache_misses"] == 1
+    assert list(table.table.items) == ["a"]
+
+
+def test_damaged_entry_misses(cache_folder, tmp_path, write_table):
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "a\n")
+    load(table_file)
+
+    for cache_file in cache_folder.glob("*.pickle"):
+        cache_file.write_bytes(b"not a pickle")
+
+    table, counters = load(table_file)
+    assert counters["table_cache_misses"] == 1
+    assert list(table.table) == ["a"]
+
+
+# Entries failing to load in different ways: cut short, an invalid literal, a
+# call on something else than a callable, missing keys and indexes
+@pytest.mark.parametrize(
+    "corrupt",
+    [
+        lambda content: content[: len(content) // 2],
+        lambda content: b"",
+        lambda content: b"I12x\n.",
+        lambda content: b"\x80\x05K\x01)R.",
+        lambda content: b"c_operator\ngetitem\n}X\x01\x00\x00\x00x\x86R.",
+        lambda content: b"c_operator\ngetitem\n]K\x00\x86R.",
+    ],
+    ids=["truncated", "empty", "ValueError", "TypeError", "KeyError", "IndexError"],
+)
+def test_corrupted_cache_entry_misses_and_is_replaced(
+    cache_folder, tmp_path, corrupt, write_table
+):
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "3\ta\n1\tb\nc\n")
+    load(table_file, WeightedListTable, "weighted-list")
+
+    (cache_file,) = cache_folder.glob("*.pickle")
+    cache_file.write_bytes(corrupt(cache_file.read_bytes()))
+
+    table, counters = load(table_file, WeightedListTable, "weighted-list")
+    assert counters["table_cache_misses"] == 1
+    assert list(table.table.items) == ["a", "b", "c"]
+
+    table, counters = load(table_file, WeightedListTable, "weighted-list")
+    assert counters["table_cache_hits"] == 1
+
+
+def test_cache_is_kept_under_its_size_limit(
+    cache_folder, tmp_path, monkeypatch, write_table
+):
+    monkeypatch.setenv("ROLLTABLE_CACHE_SIZE", "2000")
+
+    for index in range(20):
+        table_file = tmp_path / f"table{index}.txt"
+        write_table(
+            table_file, "\n".join(f"entry {index} {line}" for line in range(20))
+        )
+        load(table_file)
+
+    cache_files = list(cache_folder.glob("*.pickle"))
+    assert 0 < len(cache_files) < 20
+    assert sum(cache_file.stat().st_size for cache_file in cache_files) <= 2000
+
+    # The last table stored is the most recently used
+    _, counters = load(tmp_path / "table19.txt")
+    assert counters["table_cache_hits"] == 1
+
+
+def test_memory_cache_follows_file_stamps(
+    cache_folder, tmp_path, monkeypatch, write_table
+):
+    monkeypatch.setattr(tablecache, "enabled", False)
+    tablecache.keep_in_memory()
+
+    table_file = tmp_path / "table.txt"
+    write_table(table_file, "a\n")
+    load(table_file)
+    _, counters = load(table_file)
+    assert counters["table_cache_hits"] == 1
+    assert not cache_folder.exists()
+
+    write_table(table_file, "b\n")
+    table, counters = load(table_file)
+    assert counters["table_cache_misses"] == 1
+    assert list(table.table) == ["b"]
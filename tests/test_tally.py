@@ -0,0 +1,107 @@
+from collections import Counter
+
+import pytest
+
+from rolltable import core, tablecache
+from rolltable.inliner.inliner import TableInliner
+
+CHANCE_TABLE = "Item 1\t75\nItem 2\t50\nItem 3\t25\nItem 4\t10\n"
+CHANCES = {"Item 1": 0.75, "Item 2": 0.5, "Item 3": 0.25, "Item 4": 0.1}
+
+
+@pytest.fixture
+def table_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(tablecache, "enabled", False)
+    (tmp_path / "list.table").write_text("".join(f"{name}\n" for name in CHANCES))
+    (tmp_path / "chance.table").write_text(CHANCE_TABLE)
+    return tmp_path
+
+
+def roll(table_file, *options):
+    args = core.get_parameters([str(table_file), *options])
+    return core.roll_table(args, TableInliner())
+
+
+def parse_tally(lines):
+    tally = dict()
+    for line in lines:
+        times, result = line.split("\t")
+        tally[result] = int(times)
+
+    return tally
+
+
+def test_tally_lines_are_most_rolled_first():
+    tally = Counter({"b": 1, "a10": 3, "a2": 2, ("x", "y"): 4})
+
+    assert core.format_tally(tally) == ["4\tx, y", "3\ta10", "2\ta2", "1\tb"]
+    assert core.format_tally(tally, joiner=" / ")[0] == "4\tx / y"
+
+
+def test_sorted_tally_lines_are_in_result_order():
+    tally = Counter({"b": 1, "a10": 3, "a2": 2})
+
+    assert core.format_tally(tally, sort=True) == ["2\ta2", "3\ta10", "1\tb"]
+
+
+def test_sampled_tally_counts_every_result(table_folder):
+    lines = roll(table_folder / "list.table", "-c", "4000", "--seed", "3", "--tally")
+    tally = parse_tally(lines)
+
+    assert sum(tally.values()) == 4000
+    assert set(tally) == set(CHANCES)
+    assert lines == sorted(lines, key=lambda line: -int(line.split("\t")[0]))
+    for times in tally.values():
+        assert abs(times - 1000) <= 5 * (4000 * 0.25 * 0.75) ** 0.5
+
+
+def test_exclusive_tally_counts_each_entry_once(table_folder):
+    lines = roll(table_folder / "list.table", "-c", "4", "-e", "--tally")
+
+    assert parse_tally(lines) == dict.fromkeys(CHANCES, 1)
+
+
+@pytest.mark.parametrize(
+    "table_name, options",
+    [
+        ("list.table", ("-c", "3", "-e")),
+        ("chance.table", ("--format", "chance", "-c", "500")),
+        ("chance.table", ("--format", "chance", "-c", "500", "-j", "+")),
+    ],
+)
+def test_tally_counts_the_rolled_results(table_folder, table_name, options):
+    table_file = table_folder / table_name
+    tally = parse_tally(roll(table_file, *options, "--seed", "5", "--tally"))
+
+    joiner = options[-1] if "-j" in options else ", "
+    results = roll(table_file, *options, "--seed", "5")
+    rolled = Counter(
+        joiner.join(result) if isinstance(result, list) else result
+        for result in results
+    )
+    assert tally == dict(rolled)
+
+
+def test_chance_tally_counts_sets(table_folder):
+    draw_count = 4000
+    lines = roll(
+        table_folder / "chance.table",
+        "--format",
+        "chance",
+        "-c",
+        str(draw_count),
+        "--seed",
+        "7",
+        "--tally",
+    )
+    tally = parse_tally(lines)
+    assert sum(tally.values()) == draw_count
+
+    entry_counts = Counter()
+    for result, times in tally.items():
+        for entry in filter(None, result.split(", ")):
+            entry_counts[entry] += times
+
+    for entry, chance in CHANCES.items():
+        deviation = 5 * (draw_count * chance * (1 - chance)) ** 0.5
+        assert abs(entry_counts[entry] - draw_count * chance) <= deviation, entry